@@ -1,15 +1,42 @@
 import csv
+import datetime
 import json
 import glob
+import hashlib
+import multiprocessing
 import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import utils
+import normalized_tables
 
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
 
-def generate_legislator_csv():
+# Records, for each output file, the hashes of the YAML files (and of the
+# scripts) it was built from so that unchanged outputs can be skipped.
+# It is committed to gh-pages alongside the outputs.
+MANIFEST_FILE = "build-manifest.json"
 
-	#yaml filenames
-	yamls = ["legislators-current.yaml","legislators-historical.yaml"]
+# The normalized tables in a single database file.
+SQLITE_FILE = "congress-legislators.sqlite"
+
+# YAML files loaded by this process, shared by every output built from them.
+# Worker processes are forked after the inputs are loaded so they see the
+# same copy.
+_data = {}
+
+def load(filename):
+	if filename not in _data:
+		_data[filename] = utils.load_data(filename)
+	return _data[filename]
+
+
+def generate_legislator_csv(filename):
 	yaml_social = "legislators-social-media.yaml"
 
 
@@ -67,17 +94,25 @@ def generate_legislator_csv():
 	("mastodon", "mastodon")
 	]
 
+	social = load(yaml_social)
 
-	print("Loading %s..." %yaml_social)
-	social = utils.load_data(yaml_social)
+	# Index the social media entries by each ID type we match on, keeping
+	# the position of the first entry with each ID so that the earliest
+	# matching entry wins, as when scanning the list in order.
+	social_match_ids = ("bioguide", "thomas", "govtrack")
+	social_index = { id_type: {} for id_type in social_match_ids }
+	for i, social_legislator in enumerate(social):
+		for id_type in social_match_ids:
+			if id_type in social_legislator['id']:
+				social_index[id_type].setdefault(social_legislator['id'][id_type], i)
 
-	for filename in yamls:
-		print("Converting %s to CSV..." % filename)
+	print("Converting %s to CSV..." % filename)
 
-		legislators = utils.load_data(filename)
+	legislators = load(filename)
 
-		#convert yaml to csv
-		csv_output = csv.writer(open("../" + filename.replace(".yaml", ".csv"),"w"))
+	#convert yaml to csv
+	with open("../" + filename.replace(".yaml", ".csv"),"w") as f:
+		csv_output = csv.writer(f)
 
 		head = []
 		for pair in bio_fields:
@@ -107,17 +142,10 @@ def generate_legislator_csv():
 				else:
 					legislator_row.append(None)
 
-			social_match = None
-			for social_legislator in social:
-				if 'bioguide' in legislator['id'] and 'bioguide' in social_legislator['id'] and legislator['id']['bioguide'] == social_legislator['id']['bioguide']:
-					social_match = social_legislator
-					break
-				elif 'thomas' in legislator['id'] and 'thomas' in social_legislator['id'] and legislator['id']['thomas'] == social_legislator['id']['thomas']:
-					social_match = social_legislator
-					break
-				elif 'govtrack' in legislator['id'] and 'govtrack' in social_legislator['id'] and legislator['id']['govtrack'] == social_legislator['id']['govtrack']:
-					social_match = social_legislator
-					break
+			social_matches = [social_index[id_type].get(legislator['id'][id_type])
+				for id_type in social_match_ids if id_type in legislator['id']]
+			social_matches = [i for i in social_matches if i is not None]
+			social_match = social[min(social_matches)] if social_matches else None
 			for pair in social_media_fields:
 				if social_match != None:
 					if pair[0] in social_match['social']:
@@ -143,81 +171,291 @@ def generate_legislator_csv():
 def generate_district_office_csv():
 	filename = "legislators-district-offices.yaml"
 	print("Converting %s to CSV..." % filename)
-	legislators_offices = utils.load_data(filename)
+	legislators_offices = load(filename)
 	fields = [
 		"bioguide", "thomas", "govtrack", "id", "address", "building",
 		"city", "fax", "hours", "phone", "state", "suite", "zip",
 		"latitude", "longitude"]
 
-	f = open("../" + filename.replace(".yaml", ".csv"), "w")
-	csv_output = csv.DictWriter(f, fieldnames=fields)
-	csv_output.writeheader()
+	with open("../" + filename.replace(".yaml", ".csv"), "w") as f:
+		csv_output = csv.DictWriter(f, fieldnames=fields)
+		csv_output.writeheader()
+
+		for legislator_offices in legislators_offices:
+			legislator_ids = legislator_offices['id']
+			for office in legislator_offices['offices']:
+				# copy the office so the shared YAML data isn't modified
+				row = dict(office)
+				row.update(legislator_ids)
+				csv_output.writerow(row)
+
+
+def json_data(filename):
+	data = load(filename)
+	'''handle edge case of incorrect coercion for twitter ids in social media data
+		json/js can only handle maximum of 53-bit integers, so 64-bit integer twitter ids *must* be stringified
+		to consistently preserve value in json. otherwise they may be rounded and malformed
+	'''
+	if 'legislators-social-media' in filename:
+		data = [
+			dict(social_legislator, social=dict(social_legislator['social'], twitter_id=str(social_legislator['social']['twitter_id'])))
+			if 'twitter_id' in social_legislator['social'] else social_legislator
+			for social_legislator in data
+		]
+	return data
 
-	for legislator_offices in legislators_offices:
-		legislator_ids = legislator_offices['id']
-		for office in legislator_offices['offices']:
-			office.update(legislator_ids)
-			csv_output.writerow(office)
 
+def generate_legislator_json(filename):
+	print("Converting %s to JSON..." % filename)
 
-def generate_legislator_json():
-	#yaml filenames
-    yamls = list(map(os.path.basename, glob.glob("../*.yaml")))
+	#convert yaml to json
+	utils.write_json(
+		json_data(filename),
+		"../" + filename.replace(".yaml", ".json"),
+		indent=2)
 
-    for filename in yamls:
-        print("Converting %s to JSON..." % filename)
-        data = utils.load_data(filename)
-        '''handle edge case of incorrect coercion for twitter ids in social media data
-    		json/js can only handle maximum of 53-bit integers, so 64-bit integer twitter ids *must* be stringified
-    		to consistently preserve value in json. otherwise they may be rounded and malformed
-    	'''
-        if 'legislators-social-media' in filename:
-        	for social_legislator in data:
-        		if 'twitter_id' in social_legislator['social']:
-        			social_legislator['social']['twitter_id'] = str(social_legislator['social']['twitter_id'])
 
-		#convert yaml to json
-        utils.write(
-            json.dumps(data, default=utils.format_datetime, indent=2),
-            "../" + filename.replace(".yaml", ".json"))
+def generate_ndjson(filename):
+	print("Converting %s to NDJSON..." % filename)
+	utils.write_ndjson(
+		json_data(filename),
+		"../" + filename.replace(".yaml", ".ndjson"),
+		utils.record_key)
 
 
 def generate_committee_membership_csv():
 	filename = "committee-membership-current.yaml"
 	print("Converting %s to CSV..." % filename)
-	committee_membership = utils.load_data(filename)
+	committee_membership = load(filename)
 	fields = [
 		"bioguide", "name",
 		"committee_id", "committee_type", "committee_name", "committee_subcommittee_name",
 		"party", "title", "rank", "chamber",
 		]
 
-	committes = utils.load_data("committees-current.yaml")
-	committes = { committee["thomas_id"]: committee
-	              for committee in committes }
-	for committee in list(committes.values()):
-		committee["id"] = committee["thomas_id"]
+	committees = { }
+	for committee in load("committees-current.yaml"):
+		committees[committee["thomas_id"]] = {
+			"id": committee["thomas_id"],
+			"type": committee.get("type", ""),
+			"name": committee.get("name", ""),
+			"subcommittee_name": "",
+		}
 		for subcommittee in committee.get("subcommittees", []):
-			subcommittee["id"] = committee["thomas_id"] + subcommittee["thomas_id"]
-			subcommittee["type"] = committee["type"] + " subcommittee"
-			subcommittee["subcommittee_name"] = subcommittee["name"]
-			subcommittee["name"] = committee["name"]
-			committes[subcommittee["id"]] = subcommittee
+			subcommittee_id = committee["thomas_id"] + subcommittee["thomas_id"]
+			committees[subcommittee_id] = {
+				"id": subcommittee_id,
+				"type": committee["type"] + " subcommittee",
+				"name": committee["name"],
+				"subcommittee_name": subcommittee.get("name", ""),
+			}
 	committee_keys = ["id", "type", "name", "subcommittee_name"]
 
-	f = open("../" + filename.replace(".yaml", ".csv"), "w")
-	csv_output = csv.DictWriter(f, fieldnames=fields)
-	csv_output.writeheader()
-
-	for committee_id, members in committee_membership.items():
-		for member in members:
-			for key in committee_keys:
-				member["committee_" + key] = committes[committee_id].get(key, "")
-			csv_output.writerow(member)
+	with open("../" + filename.replace(".yaml", ".csv"), "w") as f:
+		csv_output = csv.DictWriter(f, fieldnames=fields)
+		csv_output.writeheader()
+
+		for committee_id, members in committee_membership.items():
+			for member in members:
+				row = dict(member)
+				for key in committee_keys:
+					row["committee_" + key] = committees[committee_id][key]
+				csv_output.writerow(row)
+
+
+def generate_parquet_table(table_name):
+	table = normalized_tables.get_table(table_name)
+	print("Writing %s table to Parquet..." % table_name)
+	rows = list(table["rows"](load))
+
+	arrow_types = {
+		"str": pyarrow.string(),
+		"int": pyarrow.int64(),
+		"float": pyarrow.float64(),
+		"bool": pyarrow.bool_(),
+		"date": pyarrow.date32(),
+		"category": pyarrow.string(),
+	}
+	columns = []
+	for i, (column, column_type) in enumerate(table["columns"]):
+		array = pyarrow.array([row[i] for row in rows], type=arrow_types[column_type])
+		if column_type == "category":
+			array = array.dictionary_encode()
+		columns.append(array)
+
+	utils.mkdir_p("../tables")
+	pyarrow.parquet.write_table(
+		pyarrow.Table.from_arrays(columns, names=[column for column, column_type in table["columns"]]),
+		"../tables/%s.parquet" % table_name,
+		compression="zstd")
+
+
+def generate_sqlite():
+	print("Writing %s..." % SQLITE_FILE)
+
+	sqlite_types = {
+		"str": "TEXT",
+		"int": "INTEGER",
+		"float": "REAL",
+		"bool": "INTEGER",
+		"date": "TEXT",
+		"category": "TEXT",
+	}
+
+	def quote(columns):
+		return ", ".join('"%s"' % column for column in columns)
+
+	# Build the database in a new file and move it into place when
+	# it's done. It's a new file, so there's no need for a journal.
+	path = "../" + SQLITE_FILE
+	if os.path.exists(path + ".tmp"):
+		os.unlink(path + ".tmp")
+	db = sqlite3.connect(path + ".tmp", isolation_level=None)
+	db.execute("PRAGMA journal_mode = OFF")
+	db.execute("PRAGMA synchronous = OFF")
+
+	# Create and fill all of the tables in a single transaction.
+	db.execute("BEGIN")
+	for table in normalized_tables.TABLES:
+		columns = ['"%s" %s' % (column, sqlite_types[column_type]) for column, column_type in table["columns"]]
+		if "primary_key" in table:
+			columns.append("PRIMARY KEY (%s)" % quote(table["primary_key"]))
+		for from_columns, to_table, to_columns in table.get("foreign_keys", []):
+			columns.append("FOREIGN KEY (%s) REFERENCES %s (%s)" % (quote(from_columns), to_table, quote(to_columns)))
+		db.execute("CREATE TABLE %s (%s)" % (table["name"], ", ".join(columns)))
+
+		# Dates are stored as ISO-format strings.
+		db.executemany(
+			"INSERT INTO %s VALUES (%s)" % (table["name"], ", ".join("?" for _ in table["columns"])),
+			(tuple(value.isoformat() if isinstance(value, datetime.date) else value for value in row)
+			 for row in table["rows"](load)))
+
+		# Create indexes after inserting, which is faster than updating them
+		# on each insert.
+		for index in table.get("indexes", []):
+			db.execute("CREATE INDEX %s_%s ON %s (%s)" % (table["name"], "_".join(index), table["name"], quote(index)))
+
+	# Full-text search over names.
+	db.execute("CREATE VIRTUAL TABLE names USING fts5(person_id UNINDEXED, first, middle, last, nickname, official_full)")
+	db.execute("INSERT INTO names SELECT person_id, first, middle, last, nickname, official_full FROM people")
+	db.execute("COMMIT")
+
+	# Gather statistics for the query planner.
+	db.execute("ANALYZE")
+	db.close()
+	os.replace(path + ".tmp", path)
+
+
+##### Incremental build
+
+def artifacts():
+	# Returns a list of (output filename, input YAML filenames, function, args)
+	# tuples, one for each file this script generates. The outputs are
+	# independent of each other so they can be built in any order.
+	ret = []
+	for filename in ["legislators-current.yaml", "legislators-historical.yaml"]:
+		ret.append((filename.replace(".yaml", ".csv"), [filename, "legislators-social-media.yaml"],
+			generate_legislator_csv, (filename,)))
+	ret.append(("legislators-district-offices.csv", ["legislators-district-offices.yaml"],
+		generate_district_office_csv, ()))
+	for filename in sorted(map(os.path.basename, glob.glob("../*.yaml"))):
+		ret.append((filename.replace(".yaml", ".json"), [filename],
+			generate_legislator_json, (filename,)))
+		ret.append((filename.replace(".yaml", ".ndjson"), [filename],
+			generate_ndjson, (filename,)))
+	ret.append(("committee-membership-current.csv", ["committee-membership-current.yaml", "committees-current.yaml"],
+		generate_committee_membership_csv, ()))
+	if pyarrow:
+		for table in normalized_tables.TABLES:
+			ret.append(("tables/%s.parquet" % table["name"], table["inputs"],
+				generate_parquet_table, (table["name"],)))
+	else:
+		print("pyarrow is not installed, so Parquet tables will not be generated.")
+	ret.append((SQLITE_FILE, sorted(set(filename for table in normalized_tables.TABLES for filename in table["inputs"])),
+		generate_sqlite, ()))
+	return ret
+
+def file_hash(path):
+	with open(path, 'rb') as f:
+		return hashlib.sha1(f.read()).hexdigest()
+
+def generator_hash():
+	# Outputs must also be rebuilt when the code that generates them changes.
+	h = hashlib.sha1()
+	for path in (__file__, utils.__file__, normalized_tables.__file__):
+		with open(path, 'rb') as f:
+			h.update(f.read())
+	return h.hexdigest()
+
+def load_manifest():
+	path = os.path.join(utils.data_dir(), MANIFEST_FILE)
+	if not os.path.exists(path):
+		return { }
+	with open(path) as f:
+		return json.load(f)
+
+def save_manifest(manifest):
+	utils.write(
+		json.dumps(manifest, indent=2, sort_keys=True),
+		os.path.join(utils.data_dir(), MANIFEST_FILE))
+
+def build(force=False, jobs=None):
+	manifest = load_manifest()
+	generator = generator_hash()
+
+	# Determine which outputs are stale, i.e. are missing or were built
+	# from different inputs or by different code.
+	todo = []
+	for output, inputs, func, args in artifacts():
+		entry = {
+			"generator": generator,
+			"inputs": { filename: file_hash(os.path.join(utils.data_dir(), filename)) for filename in inputs },
+		}
+		if not force and manifest.get(output) == entry and os.path.exists(os.path.join(utils.data_dir(), output)):
+			print("%s is up to date." % output)
+			continue
+		todo.append((output, inputs, func, args, entry))
+
+	if not todo:
+		return
+
+	# Load each needed YAML file once. Parsing YAML is slow, so files that
+	# aren't already in utils's pickle cache are parsed in parallel.
+	filenames = sorted(set(filename for _, inputs, _, _, _ in todo for filename in inputs))
+	print("Loading %s..." % ", ".join(filenames))
+	if jobs == 1:
+		for filename in filenames:
+			load(filename)
+	else:
+		with ProcessPoolExecutor(max_workers=jobs) as pool:
+			for filename, data in zip(filenames, pool.map(utils.load_data, filenames)):
+				_data[filename] = data
+
+	try:
+		if jobs == 1:
+			for output, inputs, func, args, entry in todo:
+				func(*args)
+				manifest[output] = entry
+		else:
+			# Fork the workers (where the platform allows it) so they share the
+			# YAML data loaded above rather than loading it again.
+			if "fork" in multiprocessing.get_all_start_methods():
+				mp_context = multiprocessing.get_context("fork")
+			else:
+				mp_context = None
+			with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context) as pool:
+				futures = { pool.submit(func, *args): (output, entry) for output, inputs, func, args, entry in todo }
+				for future in as_completed(futures):
+					future.result()
+					output, entry = futures[future]
+					manifest[output] = entry
+	finally:
+		# Record whatever was built, even if another output failed.
+		save_manifest(manifest)
 
 
 if __name__ == '__main__':
-	generate_legislator_csv()
-	generate_district_office_csv()
-	generate_legislator_json()
-	generate_committee_membership_csv()
+	flags = utils.flags()
+	build(
+		force=flags.get('force', False),
+		jobs=int(flags['jobs']) if 'jobs' in flags else None)
@@ -1,180 +1,126 @@
 #!/usr/bin/env python
 
 # gets fundamental information for every member with a bioguide ID:
-# first name, nickname, middle name, last name, name suffix
 # birthday
+# familial relationships to other members of congress (optional)
+#
+# The information comes from the bulk BioguideProfiles.zip published by
+# bioguide.congress.gov. Its profiles are parsed in parallel, and members
+# who aren't in it fall back to their individual bioguide pages.
 
 # options:
 #  --cache: load from cache if present on disk (default: true)
-#  --current: do *only* current legislators (default: true)
-#  --historical: do *only* historical legislators (default: false)
+#  --current: do *only* current legislators (default: both current and historical)
+#  --historical: do *only* historical legislators
 #  --bioguide: do *only* a single legislator
 #  --relationships: Get familial relationships to other members of congress past and present, when applicable
+#  --zip: use a BioguideProfiles.zip already on disk instead of downloading it
 
 import lxml.html, io
+import concurrent.futures
 import datetime
+import json
+import multiprocessing
+import os
 import re
+import zipfile
 import utils
-from utils import download, load_data, save_data
+from utils import download, download_many, load_data, save_data
 
-def run():
+BULK_DATA_URL = "https://bioguide.congress.gov/bioguide/data/BioguideProfiles.zip"
+PAGE_URL = "http://bioguide.congress.gov/scripts/biodisplay.pl?index=%s"
 
-  def update_birthday(bioguide, person, main):
+# The number of profiles sent to a worker process at a time.
+PROFILES_PER_TASK = 250
 
-    birthday = birthday_for(main)
-    if not birthday:
-      print("[%s] NO BIRTHDAY :(\n\n%s" % (bioguide, main))
-      warnings.append(bioguide)
-      return
-    if birthday == "UNKNOWN":
-      return
-
-    try:
-      birthday = datetime.datetime.strptime(birthday.replace(",", ""), "%B %d %Y")
-    except ValueError:
-      print("[%s] BAD BIRTHDAY :(\n\n%s" % (bioguide, main))
-      warnings.append(bioguide)
-      return
-
-    birthday = "%04d-%02d-%02d" % (birthday.year, birthday.month, birthday.day)
-    person.setdefault("bio", {})["birthday"] = birthday
-
-
-  def birthday_for(string):
-    # exceptions for not-nicely-placed semicolons
-    string = string.replace("born in Cresskill, Bergen County, N. J.; April", "born April")
-    string = string.replace("FOSTER, A. Lawrence, a Representative from New York; September 17, 1802;", "born September 17, 1802")
-    string = string.replace("CAO, Anh (Joseph), a Representative from Louisiana; born in Ho Chi Minh City, Vietnam; March 13, 1967", "born March 13, 1967")
-    string = string.replace("CRITZ, Mark S., a Representative from Pennsylvania; born in Irwin, Westmoreland County, Pa.; January 5, 1962;", "born January 5, 1962")
-    string = string.replace("SCHIFF, Steven Harvey, a Representative from New Mexico; born in Chicago, Ill.; March 18, 1947", "born March 18, 1947")
-    string = string.replace('KRATOVIL, Frank, M. Jr., a Representative from Maryland; born in Lanham, Prince George\u2019s County, Md.; May 29, 1968', "born May 29, 1968")
-
-    # look for a date
-    pattern = r"born [^;]*?((?:January|February|March|April|May|June|July|August|September|October|November|December),? \d{1,2},? \d{4})"
-    match = re.search(pattern, string, re.I)
-    if not match or not match.group(1):
-      # specifically detect cases that we can't handle to avoid unnecessary warnings
-      if re.search("birth dates? unknown|date of birth is unknown", string, re.I): return "UNKNOWN"
-      if re.search("born [^;]*?(?:in|about|before )?(?:(?:January|February|March|April|May|June|July|August|September|October|November|December) )?\d{4}", string, re.I): return "UNKNOWN"
-      return None
-    return match.group(1).strip()
-
-  def relationships_of(string):
-    # relationship data is stored in a parenthetical immediately after the end of the </font> tag in the bio
-    # e.g. "(son of Joseph Patrick Kennedy, II, and great-nephew of Edward Moore Kennedy and John Fitzgerald Kennedy)"
-    pattern = "^\((.*?)\)"
-    match = re.search(pattern, string, re.I)
-
-    relationships = []
-
-    if match and len(match.groups()) > 0:
-      relationship_text = match.group(1).encode("ascii", "replace")
-
-      # since some relationships refer to multiple people--great-nephew of Edward Moore Kennedy AND John Fitzgerald Kennedy--we need a special grammar
-      from nltk import tree, pos_tag, RegexpParser
-      tokens = re.split("[ ,;]+|-(?![0-9])", relationship_text)
-      pos = pos_tag(tokens)
-
-      grammar = r"""
-        NAME: {<NNP>+}
-        NAMES: { <IN><NAME>(?:<CC><NAME>)* }
-        RELATIONSHIP: { <JJ|NN|RB|VB|VBD|VBN|IN|PRP\$>+ }
-        MATCH: { <RELATIONSHIP><NAMES> }
-        """
-      cp = RegexpParser(grammar)
-      chunks = cp.parse(pos)
-
-      # iterate through the Relationship/Names pairs
-      for n in chunks:
-        if isinstance(n, tree.Tree) and n.node == "MATCH":
-          people = []
-          relationship = None
-          for piece in n:
-            if piece.node == "RELATIONSHIP":
-              relationship = " ".join([x[0] for x in piece])
-            elif piece.node == "NAMES":
-              for name in [x for x in piece if isinstance(x, tree.Tree)]:
-                people.append(" ".join([x[0] for x in name]))
-          for person in people:
-            relationships.append({ "relation": relationship, "name": person})
-    return relationships
+def run(zip_file=None):
 
   # default to caching
   cache = utils.flags().get('cache', True)
   force = not cache
+  relationships = utils.flags().get("relationships", False)
 
-  # pick either current or historical
-  # order is important here, since current defaults to true
-  if utils.flags().get('historical', False):
-    filename = "legislators-historical.yaml"
-  elif utils.flags().get('current', True):
-    filename = "legislators-current.yaml"
+  # pick current, historical, or both
+  if utils.flags().get('current', False):
+    filenames = ["legislators-current.yaml"]
+  elif utils.flags().get('historical', False):
+    filenames = ["legislators-historical.yaml"]
   else:
-    print("No legislators selected.")
-    exit(0)
-
-  print("Loading %s..." % filename)
-  legislators = load_data(filename)
-
+    filenames = ["legislators-current.yaml", "legislators-historical.yaml"]
 
   # reoriented cache to access by bioguide ID
+  legislators = { }
   by_bioguide = { }
-  for m in legislators:
-    if "bioguide" in m["id"]:
-      by_bioguide[m["id"]["bioguide"]] = m
+  for filename in filenames:
+    print("Loading %s..." % filename)
+    legislators[filename] = load_data(filename)
+    for m in legislators[filename]:
+      if "bioguide" in m["id"]:
+        by_bioguide[m["id"]["bioguide"]] = m
 
 
   # optionally focus on one legislator
 
   bioguide = utils.flags().get('bioguide', None)
   if bioguide:
-    bioguides = [bioguide]
+    bioguides = { bioguide }
   else:
-    bioguides = list(by_bioguide.keys())
+    bioguides = set(by_bioguide)
 
   warnings = []
-  missing = []
   count = 0
   families = 0
 
-  for bioguide in bioguides:
-    # Download & parse the HTML of the bioguide page.
-    try:
-    	dom = fetch_bioguide_page(bioguide, force)
-    except Exception as e:
-    	print(e)
-    	missing.append(bioguide)
-    	continue
-
-    # Extract the member's name and the biography paragraph (main).
-
-    try:
-      name = dom.cssselect("p font")[0]
-      main = dom.cssselect("p")[0]
-    except IndexError:
-      print("[%s] Missing name or content!" % bioguide)
-      exit(0)
-
-    name = name.text_content().strip()
-    main = main.text_content().strip().replace("\n", " ").replace("\r", " ")
-    main = re.sub("\s+", " ", main)
-
-    # Extract the member's birthday.
-
-    update_birthday(bioguide, by_bioguide[bioguide], main)
+  def update(bioguide, birthday, family, problem):
+    nonlocal count, families
+    if problem:
+      print("[%s] %s" % (bioguide, problem))
+      warnings.append(bioguide)
+    if birthday and birthday != "UNKNOWN":
+      by_bioguide[bioguide].setdefault("bio", {})["birthday"] = birthday
+    if family:
+      families = families + 1
+      by_bioguide[bioguide]["family"] = family
+    count = count + 1
 
-    # Extract relationships with other Members of Congress.
+  # Parse the profiles in the bulk data.
+
+  # A ZIP file given with --zip is read from disk. A downloaded one is
+  # held in memory, since the cache stores it compressed.
+  zip_file = zip_file or utils.flags().get('zip')
+  if not zip_file:
+    print("Downloading %s..." % BULK_DATA_URL)
+    data = download(BULK_DATA_URL, "legislators/bioguide/BioguideProfiles.zip", force, { "binary": True })
+    zip_file = io.BytesIO(data) if data else None
+
+  remaining = set(bioguides)
+  if zip_file:
+    print("Parsing profiles...")
+    for results in parse_all_profiles(read_profiles(zip_file, bioguides), relationships):
+      for result in results:
+        update(*result)
+        remaining.discard(result[0])
+  else:
+    print("Couldn't download the bulk data.")
 
-    if utils.flags().get("relationships", False):
-      #relationship information, if present, is in a parenthetical immediately after the name.
-      #should always be present if we passed the IndexError catch above
-      after_name = dom.cssselect("p font")[0].tail.strip()
-      relationships = relationships_of(after_name)
-      if len(relationships):
-        families = families + 1
-        by_bioguide[bioguide]["family"] = relationships
+  # Fall back to the bioguide pages of members who aren't in the bulk data.
 
-    count = count + 1
+  missing = []
+  if remaining:
+    print("Fetching %d bioguide pages..." % len(remaining))
+    remaining = sorted(remaining)
+    bodies = download_many([(PAGE_URL % bioguide, "legislators/bioguide/%s.html" % bioguide) for bioguide in remaining], force)
+    for bioguide, body in zip(remaining, bodies):
+      try:
+        if body is None:
+          raise Exception("No page for bioguide %s!" % bioguide)
+        dom = parse_bioguide_page(bioguide, body)
+        result = parse_page(bioguide, dom, relationships)
+      except Exception as e:
+        print(e)
+        missing.append(bioguide)
+        continue
+      update(*result)
 
 
   print()
@@ -184,12 +130,13 @@ def run():
   if missing:
     print("Missing a page for %d bioguides: %s" % (len(missing), str.join(", ", missing)))
 
-  print("Saving data to %s..." % filename)
-  save_data(legislators, filename)
+  for filename in filenames:
+    print("Saving data to %s..." % filename)
+    save_data(legislators[filename], filename)
 
-  print("Saved %d legislators to %s" % (count, filename))
+  print("Updated %d legislators" % count)
 
-  if utils.flags().get("relationships", False):
+  if relationships:
     print("Found family members for %d of those legislators" % families)
 
   # Some testing code to help isolate and fix issued:
@@ -206,12 +153,185 @@ def run():
   # control = "PEARSON, Richmond, a Representative from North Carolina; born at Richmond Hill, Yadkin County, N.C., January 26, 1852; attended Horner's School, Oxford, N.C., and was graduated from Princeton College in 1872; studied law; was admitted to the bar in 1874; in the same year was appointed United States consul to Verviers and Liege, Belgium; resigned in 1877; member of the State house of representatives 1884-1886; elected as a Republican to the Fifty-fourth and Fifty-fifth Congresses (March 4, 1895-March 3, 1899); successfully contested the election of William T. Crawford to the Fifty-sixth Congress and served from May 10, 1900, to March 3, 1901; appointed by President Theodore Roosevelt as United States consul to Genoa, Italy, December 11, 1901, as Envoy Extraordinary and Minister Plenipotentiary to Persia in 1902, and as Minister to Greece and Montenegro in 1907; resigned from the diplomatic service in 1909; died at Richmond Hill, Asheville, N.C., September 12, 1923; interment in Riverside Cemetery."
   # print "\nControl (January 26, 1852): %s" % birthday_for(control)
 
-def fetch_bioguide_page(bioguide, force):
-  url = "http://bioguide.congress.gov/scripts/biodisplay.pl?index=%s" % bioguide
-  cache = "legislators/bioguide/%s.html" % bioguide
+##### Bulk data
+
+def read_profiles(zip_file, bioguides):
+  # Yields lists of up to PROFILES_PER_TASK pairs of a bioguide ID and
+  # its profile (as JSON bytes) for the given members, reading the ZIP file (a path or file object) one
+  # profile at a time.
+  chunk = []
+  with zipfile.ZipFile(zip_file) as zf:
+    for info in zf.infolist():
+      match = re.match(r"^([A-Z]\d+)\.json$", os.path.basename(info.filename))
+      if not match or match.group(1) not in bioguides:
+        continue
+      chunk.append((match.group(1), zf.read(info)))
+      if len(chunk) == PROFILES_PER_TASK:
+        yield chunk
+        chunk = []
+  if chunk:
+    yield chunk
+
+def parse_all_profiles(chunks, relationships):
+  # Parses lists of profiles (from read_profiles) in worker processes and
+  # yields the results of each list as it is done, in any order. Only a
+  # few lists per worker are read ahead, so the profiles aren't all read
+  # into memory before they are parsed.
+  workers = multiprocessing.cpu_count()
+  context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+  with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+    pending = set()
+    for chunk in chunks:
+      if len(pending) >= 2 * workers:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+          yield future.result()
+      pending.add(executor.submit(parse_profiles, chunk, relationships))
+    for future in concurrent.futures.as_completed(pending):
+      yield future.result()
+
+def parse_profiles(profiles, relationships):
+  # Runs in a worker process. Returns the bioguide ID, birthday, family
+  # (if relationships is True) and any problem with the birthday for
+  # each profile that has a biography.
+  results = []
+  for bioguide, profile in profiles:
+    profile = json.loads(profile)
+    if "profileText" not in profile:
+      continue
+    text = re.sub(r"\s+", " ", profile["profileText"]).strip()
+
+    # The birthDate metadata is not as reliable as the text, but the
+    # text is checked against it. Since the metadata may only have a
+    # year, only as much of the date as it has is compared.
+    metadata = profile.get("birthDate") if not profile.get("birthCirca") else None
+    birthday, problem = parse_birthday(text, metadata)
+
+    family = family_of(profile) if relationships else None
+    results.append((bioguide, birthday, family, problem))
+  return results
+
+def family_of(profile):
+  # Returns the relationships listed in a profile, e.g. { "name": "Edward
+  # Moore Kennedy", "relation": "great-nephew" }.
+  family = []
+  for relationship in profile.get("relationship", []):
+    related = relationship.get("relatedTo", {})
+    name = " ".join(related[field] for field in ("givenName", "middleName", "familyName", "honorificSuffix") if related.get(field))
+    if name and relationship.get("relationshipType"):
+      family.append({ "name": name, "relation": relationship["relationshipType"].lower() })
+  return family
+
+##### Biographies
+
+def parse_birthday(text, metadata=None):
+  # Returns the birthday in a biography as YYYY-MM-DD, or "UNKNOWN" if
+  # the biography doesn't give a full date, and a description of the
+  # problem if it couldn't be found.
+  birthday = birthday_for(text)
+  if not birthday:
+    return None, "NO BIRTHDAY :(\n\n%s" % text
+  if birthday == "UNKNOWN":
+    return birthday, None
+
+  try:
+    date = datetime.datetime.strptime(birthday.replace(",", ""), "%B %d %Y")
+  except ValueError:
+    return None, "BAD BIRTHDAY :(\n\n%s" % text
+
+  date = "%04d-%02d-%02d" % (date.year, date.month, date.day)
+  if metadata and metadata != date[0:len(metadata)]:
+    return None, "metadata %r doesn't match profile text %r" % (metadata, birthday)
+  return date, None
+
+def birthday_for(string):
+  # exceptions for not-nicely-placed semicolons
+  string = string.replace("born in Cresskill, Bergen County, N. J.; April", "born April")
+  string = string.replace("FOSTER, A. Lawrence, a Representative from New York; September 17, 1802;", "born September 17, 1802")
+  string = string.replace("CAO, Anh (Joseph), a Representative from Louisiana; born in Ho Chi Minh City, Vietnam; March 13, 1967", "born March 13, 1967")
+  string = string.replace("CRITZ, Mark S., a Representative from Pennsylvania; born in Irwin, Westmoreland County, Pa.; January 5, 1962;", "born January 5, 1962")
+  string = string.replace("SCHIFF, Steven Harvey, a Representative from New Mexico; born in Chicago, Ill.; March 18, 1947", "born March 18, 1947")
+  string = string.replace('KRATOVIL, Frank, M. Jr., a Representative from Maryland; born in Lanham, Prince George\u2019s County, Md.; May 29, 1968', "born May 29, 1968")
+
+  # look for a date
+  pattern = r"born [^;]*?((?:January|February|March|April|May|June|July|August|September|October|November|December),? \d{1,2},? \d{4})"
+  match = re.search(pattern, string, re.I)
+  if not match or not match.group(1):
+    # specifically detect cases that we can't handle to avoid unnecessary warnings
+    if re.search("birth dates? unknown|date of birth is unknown", string, re.I): return "UNKNOWN"
+    if re.search(r"born [^;]*?(?:in|about|before )?(?:(?:January|February|March|April|May|June|July|August|September|October|November|December) )?\d{4}", string, re.I): return "UNKNOWN"
+    return None
+  return match.group(1).strip()
+
+def relationships_of(string):
+  # relationship data is stored in a parenthetical immediately after the end of the </font> tag in the bio
+  # e.g. "(son of Joseph Patrick Kennedy, II, and great-nephew of Edward Moore Kennedy and John Fitzgerald Kennedy)"
+  pattern = r"^\((.*?)\)"
+  match = re.search(pattern, string, re.I)
+
+  relationships = []
+
+  if match and len(match.groups()) > 0:
+    relationship_text = match.group(1).encode("ascii", "replace").decode("ascii")
+
+    # since some relationships refer to multiple people--great-nephew of Edward Moore Kennedy AND John Fitzgerald Kennedy--we need a special grammar
+    from nltk import tree, pos_tag, RegexpParser
+    tokens = re.split("[ ,;]+|-(?![0-9])", relationship_text)
+    pos = pos_tag(tokens)
+
+    grammar = r"""
+      NAME: {<NNP>+}
+      NAMES: { <IN><NAME>(?:<CC><NAME>)* }
+      RELATIONSHIP: { <JJ|NN|RB|VB|VBD|VBN|IN|PRP\$>+ }
+      MATCH: { <RELATIONSHIP><NAMES> }
+      """
+    cp = RegexpParser(grammar)
+    chunks = cp.parse(pos)
+
+    # iterate through the Relationship/Names pairs
+    for n in chunks:
+      if isinstance(n, tree.Tree) and n.label() == "MATCH":
+        people = []
+        relationship = None
+        for piece in n:
+          if piece.label() == "RELATIONSHIP":
+            relationship = " ".join([x[0] for x in piece])
+          elif piece.label() == "NAMES":
+            for name in [x for x in piece if isinstance(x, tree.Tree)]:
+              people.append(" ".join([x[0] for x in name]))
+        for person in people:
+          relationships.append({ "name": person, "relation": relationship })
+  return relationships
+
+##### Bioguide pages
+
+def parse_page(bioguide, dom, relationships):
+  # Returns the same things as parse_profiles does for a profile, for a
+  # member's bioguide page.
+
+  # Extract the member's name and the biography paragraph (main).
   try:
-    body = download(url, cache, force)
+    name = dom.cssselect("p font")[0]
+    main = dom.cssselect("p")[0]
+  except IndexError:
+    raise Exception("[%s] Missing name or content!" % bioguide)
 
+  main = main.text_content().strip().replace("\n", " ").replace("\r", " ")
+  main = re.sub(r"\s+", " ", main)
+  birthday, problem = parse_birthday(main)
+
+  # relationship information, if present, is in a parenthetical immediately after the name.
+  family = relationships_of(name.tail.strip()) if relationships else None
+  return bioguide, birthday, family, problem
+
+def fetch_bioguide_page(bioguide, force):
+  body = download(PAGE_URL % bioguide, "legislators/bioguide/%s.html" % bioguide, force)
+  if body is None:
+    raise Exception("No page for bioguide %s!" % bioguide)
+  return parse_bioguide_page(bioguide, body)
+
+def parse_bioguide_page(bioguide, body):
+  try:
     # Fix a problem?
     body = body.replace("&Aacute;\xc2\x81", "&Aacute;")
 
@@ -223,7 +343,7 @@ def fetch_bioguide_page(bioguide, force):
 
     dom = lxml.html.parse(io.StringIO(body)).getroot()
   except lxml.etree.XMLSyntaxError:
-    raise Exception("Error parsing: " + url)
+    raise Exception("Error parsing: " + PAGE_URL % bioguide)
 
   # Sanity check.
 
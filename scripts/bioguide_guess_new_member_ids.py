@@ -1,31 +1,133 @@
-import rtyaml
+# Finds bioguide IDs that are newer than any in our data, by probing
+# bioguide pages past the highest known ID for each letter.
+#
+# Each letter's last ID is found by probing windows of PROBE_WINDOW IDs
+# past its highest known ID, doubling the distance until a window has
+# no pages, and then binary searching between the last window with
+# pages and that one, so short gaps in the IDs are skipped over. Then
+# the rest of the IDs up to there are probed. The letters are searched
+# together, and each round's IDs are fetched concurrently. A request
+# that fails stops the search rather than being taken as a missing page.
+#
+# options:
+#  --requests_per_minute=N: probe bioguide.congress.gov faster than the
+#    default of PROBE_REQUESTS_PER_MINUTE, about the rate of the serial
+#    crawl this replaced
 
-from bioguide import fetch_bioguide_page
+import concurrent.futures
+import itertools
+import os
+import string
+
+import utils
+from utils import load_data
+from bioguide import PAGE_URL, parse_bioguide_page
+
+# A run of this many IDs without pages is taken to mean there are no
+# more pages after it.
+PROBE_WINDOW = 5
+PROBE_CONCURRENCY = 8
+PROBE_REQUESTS_PER_MINUTE = 60
 
 def run():
 
   print("Finding highest bioguide numbers we know of...")
-  highest_num_by_letter = { }
+  highest_num_by_letter = { letter: 0 for letter in string.ascii_uppercase }
   for fn in ('legislators-current', 'legislators-historical'):
-    P = rtyaml.load(open('../%s.yaml' % fn))
-    for p in P:
+    for p in load_data('%s.yaml' % fn):
       if not p['id'].get('bioguide'): continue
       if p['id']['bioguide'] == "TODO": continue # 114th Congress staging
       letter = p['id']['bioguide'][0]
-      num = p['id']['bioguide'][1:]
-      highest_num_by_letter[letter] = max(highest_num_by_letter.get(letter, ''), num)
+      num = int(p['id']['bioguide'][1:])
+      highest_num_by_letter[letter] = max(highest_num_by_letter.get(letter, 0), num)
+
+  requests_per_minute = int(utils.flags().get("requests_per_minute", PROBE_REQUESTS_PER_MINUTE))
 
   print("Checking for new bioguide pages...")
-  for letter in sorted(highest_num_by_letter):
-    num = int(highest_num_by_letter[letter])
-    while True:
-      num += 1
-      bioguide = "%s%06d" % (letter, num)
-      try:
-        dom = fetch_bioguide_page(bioguide, True)
-      except Exception:
-        break
-      print(bioguide, dom.cssselect("title")[0].text)
+  for bioguide, dom in sorted(find_new_pages(highest_num_by_letter, requests_per_minute).items()):
+    print(bioguide, dom.cssselect("title")[0].text)
+
+def find_new_pages(highest_num_by_letter, requests_per_minute=None):
+  # Returns the pages (as parsed by parse_bioguide_page) of the IDs past
+  # the highest known number for each letter. requests_per_minute
+  # defaults to PROBE_REQUESTS_PER_MINUTE.
+  if requests_per_minute is None:
+    requests_per_minute = PROBE_REQUESTS_PER_MINUTE
+  searches = { letter: frontier_search(letter, num) for letter, num in highest_num_by_letter.items() }
+  probes = { letter: next(search) for letter, search in searches.items() }
+  pages = { }
+  with concurrent.futures.ThreadPoolExecutor(max_workers=PROBE_CONCURRENCY) as executor:
+    while probes:
+      bioguides = [bioguide for letter in sorted(probes) for bioguide in probes[letter]]
+      found = { bioguide: dom for bioguide, dom in zip(bioguides, executor.map(probe_bioguide_page, bioguides, itertools.repeat(requests_per_minute))) if dom is not None }
+      pages.update(found)
+
+      for letter in list(probes):
+        try:
+          probes[letter] = searches[letter].send({ bioguide for bioguide in probes[letter] if bioguide in found })
+        except StopIteration:
+          del probes[letter]
+  return pages
+
+def probe_bioguide_page(bioguide, requests_per_minute):
+  # Returns the parsed page for the ID, or None if there is no page: a
+  # 404, or a page without a title. Any other error status (such as a
+  # 429 or 5xx that outlasted http_get's retries) raises an exception,
+  # since taking it as a missing page could end the search too early.
+  # Pages are cached for bioguide.py.
+  url = PAGE_URL % bioguide
+  r = utils.http_get(url, requests_per_minute=requests_per_minute)
+  if r.status_code == 404:
+    return None
+  r.raise_for_status()
+  try:
+    dom = parse_bioguide_page(bioguide, r.text)
+  except Exception:
+    return None
+  utils.save_cache(os.path.join(utils.cache_dir(), "legislators/bioguide/%s.html" % bioguide), url, r.text, r.status_code, r.headers)
+  return dom
+
+def frontier_search(letter, start):
+  # A generator that yields lists of bioguide IDs to probe, and is sent
+  # the set of those that have pages, until it has probed every ID up to
+  # the last one with a page. start is the highest known number.
+  probed = set()
+  found = set()
+
+  def bioguide(num):
+    return "%s%06d" % (letter, num)
+
+  def window(n):
+    # Windows are numbered from 0 for the one just after start.
+    return [start + 1 + n * PROBE_WINDOW + i for i in range(PROBE_WINDOW)]
+
+  def has_pages(n):
+    nums = window(n)
+    unprobed = [num for num in nums if num not in probed]
+    if unprobed:
+      result = yield [bioguide(num) for num in unprobed]
+      probed.update(unprobed)
+      found.update(num for num in unprobed if bioguide(num) in result)
+    return any(num in found for num in nums)
+
+  # Gallop: find a window with pages (lo) and a later window without
+  # any (hi). lo is -1 if the first window has no pages.
+  lo, hi = -1, 0
+  while (yield from has_pages(hi)):
+    lo, hi = hi, max(1, hi * 2)
+
+  # Binary search for the last window with pages.
+  while hi - lo > 1:
+    mid = (lo + hi) // 2
+    if (yield from has_pages(mid)):
+      lo = mid
+    else:
+      hi = mid
+
+  # Probe the rest of the IDs up to the last window with pages.
+  rest = [num for num in range(start + 1, window(lo)[-1] + 1) if num not in probed] if lo >= 0 else []
+  if rest:
+    yield [bioguide(num) for num in rest]
 
 if __name__ == '__main__':
   run()
@@ -13,7 +13,6 @@ options:
 '''
 
 import yaml
-from urllib.request import urlopen
 
 import utils
 from utils import load_data, save_data
@@ -60,10 +59,11 @@ def run():
 
 def contact_steps_for(bioguide):
     base_url = "https://raw.githubusercontent.com/unitedstates/contact-congress/main/members/{bioguide}.yaml"
-    response = urlopen(base_url.format(bioguide=bioguide))
-    if response.code == 404:
+    response = utils.http_get(base_url.format(bioguide=bioguide))
+    if response.status_code == 404:
         raise LegislatorNotFoundError("%s not found in unitedstates/contact-congress!" % bioguide)
-    return yaml.load(response.read())
+    response.raise_for_status()
+    return yaml.load(response.text)
 
 
 class LegislatorNotFoundError(Exception):
@@ -2,7 +2,8 @@
 
 # Update current cspan IDs using NYT Congress API.
 
-import json, urllib.request, urllib.parse, urllib.error
+import json
+import utils
 from utils import load_data, save_data
 
 def run():
@@ -10,9 +11,11 @@ def run():
     y = load_data("legislators-current.yaml")
     for m in y:
         # retrieve C-SPAN id, if available, from ProPublica API
-        # TODO: use utils.download here
-        response = urllib.request.urlopen("https://projects.propublica.org/represent/api/v1/members/%s.json" % m['id']['bioguide']).read()
-        j = json.loads(response.decode("utf8"))
+        response = utils.download("https://projects.propublica.org/represent/api/v1/members/%s.json" % m['id']['bioguide'],
+                                  "cspan/%s.json" % m['id']['bioguide'], True)
+        if not response:
+            continue
+        j = json.loads(response)
         cspan = j['results'][0]['cspan_id']
         if not cspan == '':
             m['id']['cspan'] = int(cspan)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+# Manages the cache of downloaded files in scripts/cache (see
+# utils.download).
+#
+# python download_cache.py pack [--output=FILE]
+# ... writes every downloaded file in the cache to one zip file, by
+# default cache/pack.zip. Copying the file to cache/pack.zip on another
+# machine (or in a CI job) warms its cache.
+#
+# python download_cache.py prune [--max_bytes=N] [--max_age=DAYS]
+# ... deletes the least recently used downloaded files until the cache
+# is at most N bytes, and files that haven't been used for DAYS days.
+# This is also done when a script that downloaded something exits, with
+# the limits in utils, if the cache hasn't been pruned for a day.
+
+import os
+import sys
+
+import utils
+
+def run():
+  command = utils.args()[0] if utils.args() else None
+  flags = utils.flags()
+
+  if command == "pack":
+    count = utils.pack_cache(flags.get("output"))
+    print("Packed %d files." % count)
+  elif command == "prune":
+    max_bytes = int(flags["max_bytes"]) if "max_bytes" in flags else None
+    max_age = float(flags["max_age"]) * 24 * 60 * 60 if "max_age" in flags else None
+    count = utils.prune_cache(max_bytes, max_age)
+    utils.write("", os.path.join(utils.cache_dir(), utils.CACHE_PRUNED))
+    print("Deleted %d files." % count)
+  else:
+    print("Usage: python download_cache.py pack [--output=FILE] | prune [--max_bytes=N] [--max_age=DAYS]")
+    sys.exit(1)
+
+if __name__ == '__main__':
+  run()
@@ -2,88 +2,116 @@
 # (on standard output).
 #
 # python export_csv.py ../legislators-current.yaml
+#
+# With --stream, the file is read twice, one record at a time, instead
+# of being loaded into memory all at once, which is slower but uses
+# little memory even for legislators-historical.yaml.
 
-import sys, csv
-from collections import OrderedDict
+import sys, csv, heapq
 
-from utils import yaml_load
+from utils import yaml_load, yaml_iter, args, flags
 
-def run():
+def flatten_object(obj, path, ret):
+	"""Takes an object obj and flattens it into a dictionary ret.
 
-	if len(sys.argv) < 2:
-		print("Usage: python export_csv.py ../legislators-current.yaml > legislators-current.csv")
-		sys.exit(0)
+	For instance { "x": { "y": 123 } } is turned into { "x__y": 123 }.
+	"""
+	for k, v in list(obj.items()):
+		if isinstance(v, dict):
+			flatten_object(v, (path + "__" if path else "") + k + "__", ret)
+		elif isinstance(v, list):
+			# don't peek inside lists
+			pass
+		else:
+			ret[path + k] = v
+	return ret
 
-	data = yaml_load(sys.argv[1])
-
-	###############################################
-
-	def flatten_object(obj, path, ret):
-		"""Takes an object obj and flattens it into a dictionary ret.
-
-		For instance { "x": { "y": 123 } } is turned into { "x__y": 123 }.
-		"""
-		for k, v in list(obj.items()):
-			if isinstance(v, dict):
-				flatten_object(v, (path + "__" if path else "") + k + "__", ret)
-			elif isinstance(v, list):
-				# don't peek inside lists
-				pass
-			else:
-				ret[path + k] = v
-		return ret
-
-	# Scan through the records recursively to get a list of column names.
-	# Attempt to preserve the field order as found in the YAML file. Since
-	# any field may be absent, no one record can provide the complete field
-	# order. Build the best field order by looking at what each field tends
-	# to be preceded by.
-	fields = set()
+def get_field_order(records):
+	"""Returns the column names in the flattened records in a good order.
+
+	Attempt to preserve the field order as found in the YAML file. Since
+	any field may be absent, no one record can provide the complete field
+	order. Build the best field order by looking at what each field tends
+	to be preceded by.
+	"""
+	fields = { } # maps keys to the order in which they were first seen
 	preceding_keys = dict() # maps keys to a dict of *previous* keys and how often they occurred
-	for record in data:
+	for record in records:
 		prev_key = None
-		for key in flatten_object(record, "", OrderedDict()):
-			fields.add(key)
+		for key in record:
+			fields.setdefault(key, len(fields))
 
 			preceding_keys.setdefault(key, {}).setdefault(prev_key, 0)
 			preceding_keys[key][prev_key] += 1
 			prev_key = key
 
-	# Convert to relative frequencies.
-	for k, v in list(preceding_keys.items()):
+	# Convert to relative frequencies, and invert the mapping so that we
+	# have, for each key, the keys that follow it and how likely it is
+	# to be the preceding key of each.
+	following_keys = { }
+	for k, v in preceding_keys.items():
 		s = float(sum(v.values()))
-		for k2 in v:
-			v[k2] /= s
+		for k2, count in v.items():
+			following_keys.setdefault(k2, []).append((k, count / s))
 
 	# Get a good order for the fields. Greedily add keys from left to right
-	# maximizing the conditional probability that the preceding key would
-	# precede the key on the right.
-	field_order = [None]
-	prev_key = None
-	while len(field_order) < len(fields):
-		# Which key is such that prev_key is its most likely precedessor?
-		# We do it this way (and not what is prev_key's most likely follower)
-		# because we should be using a probability (of sorts) that is
-		# conditional on the key being present. Otherwise we lost infrequent
-		# keys.
-		next_key = max([f for f in fields if f not in field_order], key =
-			lambda k :
-				max(preceding_keys[k].get(pk, 0) for pk in field_order))
-		field_order.append(next_key)
-		prev_key = next_key
-	field_order = field_order[1:] # remove the None at the start
+	# choosing the key that maximizes the conditional probability that a
+	# key already placed would precede it. We do it this way (and not what
+	# is the previous key's most likely follower) because we should be
+	# using a probability (of sorts) that is conditional on the key being
+	# present. Otherwise we lose infrequent keys.
+	#
+	# This is like Prim's algorithm for a maximum spanning tree: each
+	# key's best probability so far is kept in a heap and updated as keys
+	# are placed, instead of being recomputed over all placed keys at each
+	# step. Ties go to the key seen first in the file.
+	field_order = []
+	best = { } # maps unplaced keys to their best probability so far
+	heap = []
+	def place(key):
+		for k, p in following_keys.get(key, []):
+			if k not in placed and p > best.get(k, -1):
+				best[k] = p
+				heapq.heappush(heap, (-p, fields[k], k))
+	placed = set()
+	place(None)
+	while heap:
+		p, _, key = heapq.heappop(heap)
+		if key in placed or -p != best[key]:
+			continue # an outdated entry
+		placed.add(key)
+		field_order.append(key)
+		place(key)
+	return field_order
+
+def run():
+
+	if len(args()) < 1:
+		print("Usage: python export_csv.py [--stream] ../legislators-current.yaml > legislators-current.csv")
+		sys.exit(0)
+
+	fn = args()[0]
+	if flags().get("stream"):
+		# Read the file once to get the field order and then again to write
+		# the rows.
+		records = lambda : (flatten_object(record, "", {}) for record in yaml_iter(fn))
+	else:
+		# Flatten each record once.
+		data = [flatten_object(record, "", {}) for record in yaml_load(fn)]
+		records = lambda : data
+
+	field_order = get_field_order(records())
 
 	# Write CSV header.
 	w = csv.writer(sys.stdout)
 	w.writerow(field_order)
 
 	# Write the objects.
-	for record in data:
-		obj = flatten_object(record, "", {})
+	for obj in records():
 		w.writerow([
 			obj.get(f, "")
 			for f in field_order
 			])
 
 if __name__ == '__main__':
-  run()
\ No newline at end of file
+  run()
@@ -12,7 +12,6 @@
 # this key is enabled for the Geocoding API in the
 # Google APIs Console.
 
-import requests
 import utils
 
 class GeocodeException(Exception):
@@ -60,7 +59,8 @@ def geocode(address):
 		'address': address,
 		'key': _get_api_key(),
 		}
-	response = requests.get('https://maps.googleapis.com/maps/api/geocode/json', params=params)
+	# The Geocoding API allows far more than the default rate limit.
+	response = utils.http_get('https://maps.googleapis.com/maps/api/geocode/json', requests_per_minute=600, params=params)
 	js = response.json()
 	if js.get('status') != 'OK':
 		raise GeocodeException('Non-success response from geocoder: %s' % js.get('status'))
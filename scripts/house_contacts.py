@@ -2,11 +2,11 @@
 
 # Update current congressmember's contact info from clerk XML feed
 
-import requests
 import lxml
 import re
 from datetime import datetime
 
+import utils
 from utils import load_data, save_data, parse_date
 
 def run():
@@ -14,10 +14,13 @@ def run():
 
 	y = load_data("legislators-current.yaml")
 
-	# TODO use download util?
-	xml = requests.get("http://clerk.house.gov/xml/lists/MemberData.xml")
-	#xml = requests.get("https://clerk.house.gov/xml/lists/unofficial-118-member-elect-data.xml")
-	root=lxml.etree.fromstring(xml.content)
+	# committee_membership.py caches the same file.
+	xml = utils.download("http://clerk.house.gov/xml/lists/MemberData.xml", "clerk_xml", True, { "binary": True })
+	#xml = utils.download("https://clerk.house.gov/xml/lists/unofficial-118-member-elect-data.xml", None, True, { "binary": True })
+	if not xml:
+		print("Could not download the clerk's member data.")
+		return
+	root=lxml.etree.fromstring(xml)
 
 	for moc in y:
 		try:
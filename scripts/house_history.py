@@ -2,11 +2,39 @@
 
 # Stores a house_history ID for all legislators that don't yet
 # have one, by scraping history.house.gov.
+#
+# python house_history.py
+# ... probes every unknown ID from FIRST_ID up to the last ID that
+# history.house.gov has a page for. That frontier is found by probing
+# windows of PROBE_WINDOW IDs past the highest known ID, doubling the
+# distance until a window has no pages, and then binary searching
+# between the last window with pages and that one. The IDs in a window
+# are probed concurrently. Progress is saved in the cache directory
+# after each window, so an interrupted run picks up where it left off.
+#
+# python house_history.py 22001 22002 ...
+# ... probes just the given IDs.
 
+import concurrent.futures
+import json
+import os
 import lxml.html, io
-import requests
+import utils
 from utils import load_data, save_data
-import sys
+
+# IDs below FIRST_ID were all found long ago. Members added more
+# recently have IDs like 15032386867 that aren't sequential, so only
+# known IDs below SEQUENTIAL_ID_LIMIT are used to find the frontier.
+FIRST_ID = 22000
+SEQUENTIAL_ID_LIMIT = 1000000
+
+# A run of this many IDs without pages is taken to mean there are no
+# more pages after it.
+PROBE_WINDOW = 50
+PROBE_CONCURRENCY = 8
+PROBE_REQUESTS_PER_MINUTE = 600
+
+CHECKPOINT = "house_history/probe.json"
 
 def run():
   # load legislators YAML files
@@ -28,16 +56,19 @@ def run():
   count = 0
 
   # scrape history.house.gov
-  if len(sys.argv) == 1:
-    id_range = range(22000, 25000)
+  if utils.args():
+    prober = Prober()
+    prober.probe([int(arg) for arg in utils.args()])
   else:
-    id_range = [int(arg) for arg in sys.argv[1:]]
-  for id in id_range:
-    # skip known IDs
+    prober = Prober(os.path.join(utils.cache_dir(), CHECKPOINT))
+    start = max([id for id in known_house_history_ids if id < SEQUENTIAL_ID_LIMIT] + [FIRST_ID])
+    frontier = prober.find_frontier(start)
+    print("The last ID with a page is %d." % frontier)
+    prober.probe([id for id in range(FIRST_ID, frontier + 1) if id not in known_house_history_ids])
+
+  for id, bioguide_id in sorted(prober.pages.items()):
     if id in known_house_history_ids:
       continue
-    print(id)
-    bioguide_id = get_bioguide_for_house_history_id(id)
     if bioguide_id and bioguide_id in by_bioguide:
       print(id, bioguide_id)
       by_bioguide[bioguide_id]["id"]["house_history"] = id
@@ -51,18 +82,107 @@ def run():
   # how many updates did we make?
   print("Saved %d legislators" % count)
 
-def get_bioguide_for_house_history_id(id):
-    url = "http://history.house.gov/People/Detail/%s" % id
-    r = requests.get(url, allow_redirects=False)
-    if r.status_code == 200:
-        dom = lxml.html.parse(io.StringIO(r.text)).getroot()
+  # The next run starts over.
+  prober.finish()
+
+class Prober:
+  # Probes IDs concurrently and remembers which ones have pages (and
+  # their bioguide IDs) and which don't. With a checkpoint path, what
+  # it learns is saved there, and loaded from there when it starts.
+
+  def __init__(self, checkpoint=None):
+    self.checkpoint = checkpoint
+    self.pages = { } # maps IDs with pages to their bioguide ID or None
+    self.missing = set()
+    if checkpoint and os.path.exists(checkpoint):
+      with open(checkpoint) as f:
+        data = json.load(f)
+      self.pages = { int(id): bioguide_id for id, bioguide_id in data["pages"].items() }
+      self.missing = set(data["missing"])
+      print("Resuming from %s (%d IDs probed)." % (checkpoint, len(self.pages) + len(self.missing)))
+
+  def probe(self, ids):
+    # Probes the IDs that haven't been probed yet, a window at a time.
+    # If a probe fails, the exception is raised after the IDs probed
+    # before it are saved, so that running again resumes from there.
+    ids = [id for id in ids if id not in self.pages and id not in self.missing]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=PROBE_CONCURRENCY) as executor:
+      for i in range(0, len(ids), PROBE_WINDOW):
+        window = ids[i:i + PROBE_WINDOW]
+        print("Probing %d-%d..." % (window[0], window[-1]))
         try:
-            bioguide_link = dom.cssselect("a.view-in-bioguide")[0].get('href')
-            return bioguide_link.split('=')[1]
-        except:
-            return None
-    else:
-        return None
+          for id, (exists, bioguide_id) in zip(window, executor.map(probe_house_history_id, window)):
+            if exists:
+              self.pages[id] = bioguide_id
+            else:
+              self.missing.add(id)
+        finally:
+          self.save()
+
+  def last_page_in_window(self, first):
+    # Returns the highest ID with a page in the window starting at
+    # first, or None.
+    window = range(first, first + PROBE_WINDOW)
+    self.probe(window)
+    return max((id for id in window if id in self.pages), default=None)
+
+  def find_frontier(self, start):
+    # Returns the highest ID with a page, given that start has one.
+    # Windows are numbered from 0 for the one just after start.
+    window_start = lambda n: start + 1 + n * PROBE_WINDOW
+
+    # Gallop: find a window with pages (lo) and a later window without
+    # any (hi). lo is -1 if the first window has no pages.
+    lo, hi = -1, 0
+    while self.last_page_in_window(window_start(hi)) is not None:
+      lo, hi = hi, max(1, hi * 2)
+
+    # Binary search for the last window with pages.
+    while hi - lo > 1:
+      mid = (lo + hi) // 2
+      if self.last_page_in_window(window_start(mid)) is not None:
+        lo = mid
+      else:
+        hi = mid
+
+    return start if lo == -1 else self.last_page_in_window(window_start(lo))
+
+  def save(self):
+    if not self.checkpoint:
+      return
+    # Write to a temporary file first so that an interrupted write
+    # doesn't lose the checkpoint.
+    temp = self.checkpoint + ".tmp"
+    utils.write(json.dumps({ "pages": { str(id): bioguide_id for id, bioguide_id in self.pages.items() },
+                             "missing": sorted(self.missing) }), temp)
+    os.replace(temp, self.checkpoint)
+
+  def finish(self):
+    if self.checkpoint and os.path.exists(self.checkpoint):
+      os.remove(self.checkpoint)
+
+def probe_house_history_id(id):
+  # Returns whether history.house.gov has a page for the ID and the
+  # bioguide ID it links to, if any. IDs without a page get a 404 or a
+  # redirect. Any other response (such as a 429 or 5xx that outlasted
+  # http_get's retries) raises an exception rather than being taken to
+  # mean that there is no page, which would end the search too early.
+  url = "http://history.house.gov/People/Detail/%s" % id
+  r = utils.http_get(url, requests_per_minute=PROBE_REQUESTS_PER_MINUTE, allow_redirects=False)
+  if r.status_code == 200:
+    return True, bioguide_for_page(r.text)
+  if r.status_code == 404 or r.is_redirect:
+    return False, None
+  r.raise_for_status()
+  raise Exception("Unexpected status %d for %s" % (r.status_code, url))
+
+def bioguide_for_page(body):
+  dom = lxml.html.parse(io.StringIO(body)).getroot()
+  try:
+    bioguide_link = dom.cssselect("a.view-in-bioguide")[0].get('href')
+    return bioguide_link.split('=')[1]
+  except:
+    return None
 
 if __name__ == '__main__':
-  run()
\ No newline at end of file
+  run()
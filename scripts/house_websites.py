@@ -7,7 +7,7 @@
 #  member's state and district fields are present and accurate.
 #  member's most recent term in the terms field is their current one.
 
-import lxml.html, io, urllib.request, urllib.error, urllib.parse
+import lxml.html, io
 import re
 import utils
 from utils import load_data, save_data, states as state_names
@@ -85,8 +85,9 @@ def run():
       # directory to have the current active subdomain. As an example,
       # the directory lists randyforbes.house.gov, which redirects to
       # forbes.house.gov.
-      resp = urllib.request.urlopen(url)
-      url = resp.geturl()
+      response = utils.http_get(url)
+      response.raise_for_status()
+      url = response.url
 
       # kill everything after the domain
       url = re.sub(".gov/.*$", ".gov", url)
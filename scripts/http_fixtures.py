@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+# Records the HTTP responses that the scripts get, and replays them from
+# a local stand-in server, so that the scrapers can be run (and timed)
+# without the network.
+#
+# Any script that imports utils takes these options:
+#
+# python committee_membership.py --record=fixtures/committees
+# ... saves every response to a file in the directory, one per method
+# and URL (the last response wins).
+#
+# python committee_membership.py --replay=fixtures/committees [--latency=0.2]
+# ... sends every request to a server on 127.0.0.1 that answers with
+# the saved responses, after waiting for the given number of seconds.
+# Requests without a saved response get a 404.
+#
+# Requests made with requests (including through scrapelib and
+# utils.download) and with urllib.request.urlopen are covered. When
+# recording, conditional request headers are dropped so that full
+# responses are saved, and when replaying, the server answers
+# conditional requests with 304 as the real server would.
+#
+# python http_fixtures.py serve DIR [--port=8000] [--latency=0.2]
+# ... runs the stand-in server by itself. Its URLs are the original
+# URLs quoted, after a slash (see stand_in_url).
+
+import base64
+import hashlib
+import http.server
+import io
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+import urllib.response
+
+import requests
+
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+# Headers that describe how the body was sent rather than the body.
+TRANSFER_HEADERS = ("content-length", "content-encoding", "transfer-encoding", "connection", "keep-alive")
+
+def fixture_path(directory, method, url, body=None):
+  key = method.upper() + " " + url
+  if body:
+    key += " " + hashlib.sha1(body if isinstance(body, bytes) else body.encode("utf-8")).hexdigest()
+  return os.path.join(directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+def save_fixture(directory, method, url, request_body, status, headers, body):
+  fixture = {
+    "method": method.upper(),
+    "url": url,
+    "status": status,
+    "headers": [[name, value] for name, value in headers if name.lower() not in TRANSFER_HEADERS],
+    "body": base64.b64encode(body).decode("ascii"),
+  }
+  path = fixture_path(directory, method, url, request_body)
+  os.makedirs(directory, exist_ok=True)
+  temp = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+  with open(temp, "w") as f:
+    json.dump(fixture, f, indent=2)
+  os.replace(temp, path)
+
+def load_fixture(directory, method, url, request_body=None):
+  try:
+    with open(fixture_path(directory, method, url, request_body)) as f:
+      fixture = json.load(f)
+  except OSError:
+    return None
+  fixture["body"] = base64.b64decode(fixture["body"])
+  return fixture
+
+##### The stand-in server
+
+def stand_in_url(server_url, url):
+  return server_url + "/" + urllib.parse.quote(url, safe="")
+
+def not_modified(request_headers, headers):
+  # Returns whether a conditional request matches a response's ETag or
+  # Last-Modified header.
+  headers = { name.lower(): value for name, value in headers }
+  return any(request_headers.get(name) and request_headers.get(name) == headers.get(header)
+             for name, header in (("If-None-Match", "etag"), ("If-Modified-Since", "last-modified")))
+
+def make_handler(directory, latency):
+  class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def respond(self):
+      url = urllib.parse.unquote(self.path[1:])
+      length = int(self.headers.get("Content-Length") or 0)
+      request_body = self.rfile.read(length) if length else None
+      fixture = load_fixture(directory, self.command, url, request_body)
+      if latency:
+        time.sleep(latency)
+
+      if fixture is None:
+        sys.stderr.write("No recorded response for %s %s\n" % (self.command, url))
+        status, headers, body = 404, [["Content-Type", "text/plain"]], b"No recorded response."
+      else:
+        status, headers, body = fixture["status"], fixture["headers"], fixture["body"]
+        if status == 200 and not_modified(self.headers, headers):
+          status, body = 304, b""
+
+      self.send_response(status)
+      for name, value in headers:
+        self.send_header(name, value)
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      if self.command != "HEAD":
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_HEAD = respond
+
+    def log_message(self, *args):
+      pass
+
+  return Handler
+
+def start_server(directory, latency=0, port=0):
+  # Starts the stand-in server in a thread and returns it. Its URL is
+  # server.url.
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", port), make_handler(directory, latency))
+  server.daemon_threads = True
+  server.url = "http://127.0.0.1:%d" % server.server_address[1]
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server
+
+##### Hooks into requests and urllib
+
+_original_send = requests.Session.send
+_installed = None
+
+def send(session, request, **kwargs):
+  # Replaces requests.Session.send. Each redirect is followed here
+  # rather than by requests so that each one is recorded or replayed
+  # on its own.
+  allow_redirects = kwargs.pop("allow_redirects", True)
+  mode, directory, server = _installed
+  url = request.url
+  if mode == "record":
+    for name in CONDITIONAL_HEADERS:
+      request.headers.pop(name, None)
+    response = _original_send(session, request, allow_redirects=False, **kwargs)
+    save_fixture(directory, request.method, url, request.body, response.status_code,
+                 response.headers.items(), response.content)
+  else:
+    request.url = stand_in_url(server.url, url)
+    try:
+      response = _original_send(session, request, allow_redirects=False, **kwargs)
+    finally:
+      request.url = url
+    response.url = url
+
+  if allow_redirects:
+    history = list(session.resolve_redirects(response, request, **kwargs))
+    if history:
+      history.insert(0, response)
+      response = history.pop()
+      response.history = history
+  return response
+
+class URLLibHandler(urllib.request.BaseHandler):
+  # Records or replays urllib requests. It runs before the handler that
+  # raises HTTPError for error responses and follows redirects.
+  handler_order = 900
+
+  def http_request(self, request):
+    mode, directory, server = _installed
+    request.original_url = request.full_url
+    if mode == "record":
+      for name in CONDITIONAL_HEADERS:
+        request.remove_header(name.capitalize())
+    else:
+      request.full_url = stand_in_url(server.url, request.full_url)
+    return request
+
+  def http_response(self, request, response):
+    mode, directory, server = _installed
+    url = getattr(request, "original_url", request.full_url)
+    body = response.read()
+    if mode == "record":
+      save_fixture(directory, request.get_method(), url, request.data, response.status,
+                   response.headers.items(), body)
+    else:
+      # Relative redirects are relative to the original URL.
+      request.full_url = url
+    new_response = urllib.response.addinfourl(io.BytesIO(body), response.headers, url, response.status)
+    new_response.msg = response.reason
+    return new_response
+
+  https_request = http_request
+  https_response = http_response
+
+def install(record=None, replay=None, latency=0):
+  # Starts recording to the directory record or replaying from the
+  # directory replay.
+  global _installed
+  uninstall()
+  if record:
+    _installed = ("record", record, None)
+  else:
+    _installed = ("replay", replay, start_server(replay, latency))
+  requests.Session.send = send
+  urllib.request.install_opener(urllib.request.build_opener(URLLibHandler))
+
+def uninstall():
+  global _installed
+  if _installed and _installed[2]:
+    _installed[2].shutdown()
+    _installed[2].server_close()
+  _installed = None
+  requests.Session.send = _original_send
+  urllib.request.install_opener(None)
+
+def run():
+  import utils
+  args, flags = utils.args(), utils.flags()
+  if len(args) != 2 or args[0] != "serve":
+    print("Usage: python http_fixtures.py serve DIR [--port=8000] [--latency=SECONDS]")
+    sys.exit(1)
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", int(flags.get("port", 8000))),
+                                           make_handler(args[1], float(flags.get("latency", 0))))
+  print("Serving %s at http://127.0.0.1:%d" % (args[1], server.server_address[1]))
+  server.serve_forever()
+
+if __name__ == '__main__':
+  run()
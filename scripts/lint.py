@@ -5,15 +5,36 @@
 #
 # python lint.py file1.yaml file2.yaml ...
 # ... will lint the specified files.
+#
+# The files are linted in parallel, and a file is only written (along
+# with its .pickle cache) if linting changes it.
+
+import concurrent.futures, glob, io, multiprocessing, sys
+import rtyaml
+from utils import yaml_dump, data_dir
+
+def lint_file(fn):
+    # Returns whether the file was changed.
+    with open(fn) as f:
+        body = f.read()
+
+    # Go through streams so that rtyaml preserves the comment block
+    # at the top of legislators-social-media.yaml.
+    data = rtyaml.load(io.StringIO(body))
+    buf = io.StringIO()
+    rtyaml.dump(data, buf)
+    if buf.getvalue() == body:
+        return False
 
-import glob, sys
-from utils import yaml_load, yaml_dump, data_dir
+    yaml_dump(data, fn)
+    return True
 
 def run():
-    for fn in glob.glob(data_dir() + "/*.yaml") if len(sys.argv) == 1 else sys.argv[1:]:
-        print(fn + "...")
-        data = yaml_load(fn, use_cache=False)
-        yaml_dump(data, fn)
+    files = glob.glob(data_dir() + "/*.yaml") if len(sys.argv) == 1 else sys.argv[1:]
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, min(len(files), multiprocessing.cpu_count())), mp_context=context) as executor:
+        for fn, changed in zip(files, executor.map(lint_file, files)):
+            print(fn + ("... linted" if changed else "... unchanged"))
 
 if __name__ == '__main__':
-  run()
\ No newline at end of file
+  run()
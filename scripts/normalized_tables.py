@@ -0,0 +1,381 @@
+# Flattens the YAML data files into normalized tables, one row per
+# person, term, ID, office, committee, etc., with typed columns. These
+# are used by alternate_bulk_formats.py to write columnar (Parquet) files
+# and a SQLite database.
+#
+# Each table is a dict with:
+#   name: the table name
+#   inputs: the YAML files the table is built from
+#   columns: a list of (column name, type) pairs, where type is one of
+#            "str", "int", "float", "bool", "date" or "category"
+#   rows: a function that takes a function that loads a YAML file by
+#         name (e.g. utils.load_data) and yields one tuple per row
+#   primary_key: (optional) the list of columns that identify a row
+#   foreign_keys: (optional) a list of (columns, table, columns) tuples
+#   indexes: (optional) a list of lists of columns to index in databases
+
+import utils
+
+LEGISLATOR_FILES = [("legislators-current.yaml", True), ("legislators-historical.yaml", False)]
+
+# id types whose values are integers, which get a typed column in the ids table
+integer_ids = { "govtrack", "votesmart", "maplight", "icpsr", "icpsr_prez", "cspan",
+  "house_history", "house_history_alternate", "pictorial" }
+
+def to_date(value):
+  # Dates are strings in the YAML files. Anything that isn't a complete
+  # date (which the validator would report) is left empty.
+  if not isinstance(value, str):
+    return None
+  try:
+    return utils.parse_date(value)
+  except ValueError:
+    return None
+
+def to_str(value):
+  # A few free-text fields (e.g. office suites) are sometimes numbers.
+  if value is None:
+    return None
+  return str(value)
+
+def to_int(value):
+  if isinstance(value, bool) or not isinstance(value, int):
+    return None
+  return value
+
+def person_id(record):
+  # People are keyed by their bioguide ID, or by their GovTrack ID if
+  # they don't have one yet (or never will, like some presidents).
+  return str(utils.record_key(record))
+
+def legislators(load):
+  for filename, current in LEGISLATOR_FILES:
+    for legislator in load(filename):
+      yield legislator, current
+
+def people_rows(load):
+  for legislator, current in legislators(load):
+    name = legislator.get("name", {})
+    bio = legislator.get("bio", {})
+    yield (
+      person_id(legislator),
+      legislator["id"].get("bioguide"),
+      to_int(legislator["id"].get("govtrack")),
+      current,
+      name.get("first"),
+      name.get("middle"),
+      name.get("last"),
+      name.get("suffix"),
+      name.get("nickname"),
+      name.get("official_full"),
+      to_date(bio.get("birthday")),
+      bio.get("gender"),
+    )
+
+def terms_rows(load):
+  for legislator, current in legislators(load):
+    for i, term in enumerate(legislator.get("terms", [])):
+      yield (
+        person_id(legislator),
+        i,
+        term.get("type"),
+        to_date(term.get("start")),
+        to_date(term.get("end")),
+        term.get("state"),
+        to_int(term.get("district")),
+        to_int(term.get("class")),
+        term.get("state_rank"),
+        term.get("party"),
+        term.get("caucus"),
+        term.get("how"),
+        term.get("end-type"),
+        term.get("url"),
+        term.get("address"),
+        term.get("office"),
+        term.get("phone"),
+        term.get("fax"),
+        term.get("contact_form"),
+        term.get("rss_url"),
+      )
+
+def party_affiliations_rows(load):
+  for legislator, current in legislators(load):
+    for i, term in enumerate(legislator.get("terms", [])):
+      for pa in term.get("party_affiliations", []):
+        yield (
+          person_id(legislator),
+          i,
+          to_date(pa.get("start")),
+          to_date(pa.get("end")),
+          pa.get("party"),
+          pa.get("caucus"),
+        )
+
+def leadership_roles_rows(load):
+  for legislator, current in legislators(load):
+    for role in legislator.get("leadership_roles", []):
+      yield (
+        person_id(legislator),
+        role.get("title"),
+        role.get("chamber"),
+        to_date(role.get("start")),
+        to_date(role.get("end")),
+      )
+
+def ids_rows(load):
+  for legislator, current in legislators(load):
+    for id_type, values in legislator["id"].items():
+      # fec and bioguide_previous are lists
+      if not isinstance(values, list):
+        values = [values]
+      for value in values:
+        yield (
+          person_id(legislator),
+          id_type,
+          str(value),
+          to_int(value) if id_type in integer_ids else None,
+        )
+
+def district_offices_rows(load):
+  for legislator_offices in load("legislators-district-offices.yaml"):
+    for office in legislator_offices.get("offices", []):
+      yield (
+        person_id(legislator_offices),
+        office.get("id"),
+        office.get("address"),
+        to_str(office.get("suite")),
+        office.get("building"),
+        office.get("city"),
+        office.get("state"),
+        to_str(office.get("zip")),
+        office.get("latitude"),
+        office.get("longitude"),
+        office.get("phone"),
+        office.get("fax"),
+        office.get("hours"),
+      )
+
+def social_media_rows(load):
+  for entry in load("legislators-social-media.yaml"):
+    social = entry["social"]
+    yield (
+      person_id(entry),
+      social.get("twitter"),
+      to_int(social.get("twitter_id")),
+      social.get("facebook"),
+      social.get("youtube"),
+      social.get("youtube_id"),
+      social.get("instagram"),
+      to_int(social.get("instagram_id")),
+      social.get("mastodon"),
+    )
+
+def committees(load):
+  # Yields each committee in committees-current.yaml and then each
+  # committee that is only in committees-historical.yaml, along with
+  # whether it is current.
+  current = load("committees-current.yaml")
+  current_ids = set(committee["thomas_id"] for committee in current)
+  for committee in current:
+    yield committee, True
+  for committee in load("committees-historical.yaml"):
+    if committee["thomas_id"] not in current_ids:
+      yield committee, False
+
+def committees_rows(load):
+  for committee, current in committees(load):
+    yield (
+      committee["thomas_id"],
+      committee.get("type"),
+      committee.get("name"),
+      current,
+      committee.get("house_committee_id"),
+      committee.get("senate_committee_id"),
+      committee.get("url"),
+      committee.get("minority_url"),
+      committee.get("rss_url"),
+      committee.get("minority_rss_url"),
+      committee.get("address"),
+      committee.get("phone"),
+      committee.get("jurisdiction"),
+      committee.get("wikipedia"),
+      committee.get("youtube_id"),
+    )
+
+def subcommittees_rows(load):
+  # Historical committees may have subcommittees that are no longer
+  # current, so both files are scanned and each subcommittee is taken
+  # from the current file if it is there.
+  seen = set()
+  for filename, current in (("committees-current.yaml", True), ("committees-historical.yaml", False)):
+    for committee in load(filename):
+      for subcommittee in committee.get("subcommittees", []):
+        subcommittee_id = committee["thomas_id"] + subcommittee["thomas_id"]
+        if subcommittee_id in seen:
+          continue
+        seen.add(subcommittee_id)
+        yield (
+          subcommittee_id,
+          committee["thomas_id"],
+          subcommittee["thomas_id"],
+          subcommittee.get("name"),
+          current,
+          subcommittee.get("address"),
+          subcommittee.get("phone"),
+          subcommittee.get("wikipedia"),
+        )
+
+def committee_membership_rows(load):
+  for committee_id, members in load("committee-membership-current.yaml").items():
+    for member in members:
+      yield (
+        committee_id,
+        member.get("bioguide"),
+        member.get("name"),
+        member.get("party"),
+        to_int(member.get("rank")),
+        member.get("title"),
+        member.get("chamber"),
+      )
+
+LEGISLATOR_INPUTS = [filename for filename, current in LEGISLATOR_FILES]
+COMMITTEE_INPUTS = ["committees-current.yaml", "committees-historical.yaml"]
+
+TABLES = [
+  {
+    "name": "people",
+    "inputs": LEGISLATOR_INPUTS,
+    "columns": [
+      ("person_id", "str"), ("bioguide", "str"), ("govtrack", "int"), ("current", "bool"),
+      ("first", "str"), ("middle", "str"), ("last", "str"), ("suffix", "str"),
+      ("nickname", "str"), ("official_full", "str"),
+      ("birthday", "date"), ("gender", "category"),
+    ],
+    "rows": people_rows,
+    "primary_key": ["person_id"],
+    "indexes": [["bioguide"], ["govtrack"], ["last", "first"]],
+  },
+  {
+    "name": "terms",
+    "inputs": LEGISLATOR_INPUTS,
+    "columns": [
+      ("person_id", "str"), ("term_index", "int"), ("type", "category"),
+      ("start", "date"), ("end", "date"),
+      ("state", "category"), ("district", "int"), ("class", "int"), ("state_rank", "category"),
+      ("party", "category"), ("caucus", "category"), ("how", "category"), ("end_type", "category"),
+      ("url", "str"), ("address", "str"), ("office", "str"), ("phone", "str"), ("fax", "str"),
+      ("contact_form", "str"), ("rss_url", "str"),
+    ],
+    "rows": terms_rows,
+    "primary_key": ["person_id", "term_index"],
+    "foreign_keys": [(["person_id"], "people", ["person_id"])],
+    "indexes": [["state", "district", "type"], ["start", "end"]],
+  },
+  {
+    "name": "party_affiliations",
+    "inputs": LEGISLATOR_INPUTS,
+    "columns": [
+      ("person_id", "str"), ("term_index", "int"),
+      ("start", "date"), ("end", "date"),
+      ("party", "category"), ("caucus", "category"),
+    ],
+    "rows": party_affiliations_rows,
+    "foreign_keys": [(["person_id", "term_index"], "terms", ["person_id", "term_index"])],
+    "indexes": [["person_id", "term_index"], ["start", "end"]],
+  },
+  {
+    "name": "leadership_roles",
+    "inputs": LEGISLATOR_INPUTS,
+    "columns": [
+      ("person_id", "str"), ("title", "str"), ("chamber", "category"),
+      ("start", "date"), ("end", "date"),
+    ],
+    "rows": leadership_roles_rows,
+    "foreign_keys": [(["person_id"], "people", ["person_id"])],
+    "indexes": [["person_id"], ["start", "end"]],
+  },
+  {
+    "name": "ids",
+    "inputs": LEGISLATOR_INPUTS,
+    "columns": [
+      ("person_id", "str"), ("id_type", "category"), ("id_value", "str"), ("id_value_int", "int"),
+    ],
+    "rows": ids_rows,
+    "primary_key": ["person_id", "id_type", "id_value"],
+    "foreign_keys": [(["person_id"], "people", ["person_id"])],
+    "indexes": [["id_type", "id_value"]],
+  },
+  {
+    "name": "district_offices",
+    "inputs": ["legislators-district-offices.yaml"],
+    "columns": [
+      ("person_id", "str"), ("office_id", "str"),
+      ("address", "str"), ("suite", "str"), ("building", "str"),
+      ("city", "str"), ("state", "category"), ("zip", "str"),
+      ("latitude", "float"), ("longitude", "float"),
+      ("phone", "str"), ("fax", "str"), ("hours", "str"),
+    ],
+    "rows": district_offices_rows,
+    "primary_key": ["office_id"],
+    "foreign_keys": [(["person_id"], "people", ["person_id"])],
+    "indexes": [["person_id"]],
+  },
+  {
+    "name": "social_media",
+    "inputs": ["legislators-social-media.yaml"],
+    "columns": [
+      ("person_id", "str"),
+      ("twitter", "str"), ("twitter_id", "int"),
+      ("facebook", "str"),
+      ("youtube", "str"), ("youtube_id", "str"),
+      ("instagram", "str"), ("instagram_id", "int"),
+      ("mastodon", "str"),
+    ],
+    "rows": social_media_rows,
+    "primary_key": ["person_id"],
+    "foreign_keys": [(["person_id"], "people", ["person_id"])],
+  },
+  {
+    "name": "committees",
+    "inputs": COMMITTEE_INPUTS,
+    "columns": [
+      ("committee_id", "str"), ("type", "category"), ("name", "str"), ("current", "bool"),
+      ("house_committee_id", "str"), ("senate_committee_id", "str"),
+      ("url", "str"), ("minority_url", "str"), ("rss_url", "str"), ("minority_rss_url", "str"),
+      ("address", "str"), ("phone", "str"), ("jurisdiction", "str"),
+      ("wikipedia", "str"), ("youtube_id", "str"),
+    ],
+    "rows": committees_rows,
+    "primary_key": ["committee_id"],
+  },
+  {
+    "name": "subcommittees",
+    "inputs": COMMITTEE_INPUTS,
+    "columns": [
+      ("subcommittee_id", "str"), ("committee_id", "str"), ("thomas_id", "str"),
+      ("name", "str"), ("current", "bool"),
+      ("address", "str"), ("phone", "str"), ("wikipedia", "str"),
+    ],
+    "rows": subcommittees_rows,
+    "primary_key": ["subcommittee_id"],
+    "foreign_keys": [(["committee_id"], "committees", ["committee_id"])],
+    "indexes": [["committee_id"]],
+  },
+  {
+    "name": "committee_membership",
+    "inputs": ["committee-membership-current.yaml"],
+    "columns": [
+      ("committee_id", "str"), ("bioguide", "str"), ("name", "str"),
+      ("party", "category"), ("rank", "int"), ("title", "str"), ("chamber", "category"),
+    ],
+    "rows": committee_membership_rows,
+    "foreign_keys": [(["bioguide"], "people", ["person_id"])],
+    "indexes": [["committee_id"], ["bioguide"]],
+  },
+]
+
+def get_table(name):
+  for table in TABLES:
+    if table["name"] == name:
+      return table
+  raise ValueError("Unknown table: " + name)
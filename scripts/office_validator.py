@@ -26,6 +26,8 @@ from collections import OrderedDict, defaultdict
 from itertools import count
 import sys
 
+import schema
+
 try:
     import rtyaml as yaml
 except ImportError:
@@ -75,83 +77,97 @@ def id_offices(bioguide_id, offices):
         yield office_id, office
 
 
-def check_legislator_offices(legislator_offices, legislator):
-    bioguide_id = legislator_offices['id']['bioguide']
-    offices = legislator_offices.get('offices', [])
+REQUIRED_FIELDS = ['id', 'city', 'state']
+EXPECTED_FIELDS = ['address', 'zip', 'phone', 'latitude', 'longitude']
+OPTIONAL_FIELDS = ['building', 'suite', 'hours', 'fax']
 
-    state = None
-    if legislator:
-        state = legislator['terms'][-1]['state']
 
-    required = ['id', 'city', 'state']
-    expected = ['address', 'zip', 'phone', 'latitude', 'longitude']
-    optional = ['building', 'suite', 'hours', 'fax']
-    all_fields = set(required + expected + optional)
+def check_office_id(office, office_id, report, env):
+    found_id = office.get('id')
+    if found_id and office_id != found_id:
+        report(True, office_id, "Office %s has unexpected id '%s'" % (office_id, found_id))
 
-    errors = []
-    warnings = []
 
-    if not legislator:
-        errors.append("Offices for inactive legislator")
+def check_office_state(office, office_id, report, env):
+    state = env['state']
+    office_state = office.get('state')
+    if state and office_state and office_state != state:
+        report(True, office_id, "Office %s is in '%s', legislator is from '%s'" % (office_id, office_state, state))
 
-    if not offices:
-        errors.append("Zero offices")
 
-    for office_id, office in id_offices(bioguide_id, offices):
+def check_address_or_phone(office, office_id, report, env):
+    if (office.get('address') and
+            not (office.get('latitude') and office.get('longitude'))):
+        report(False, office_id, "Office %s missing geocode" % office_id)
 
-        for field in required:
-            if not office.get(field):
-                errors.append("Office %s is missing required field '%s'" % (office_id, field))
+    if not office.get('address') and not office.get('phone'):
+        report(True, office_id, "Office %s needs at least address or phone" % office_id)
 
-        for field in expected:
-            if not office.get(field):
-                warnings.append("Office %s is missing field '%s'" % (office_id, field))
 
-        for field in office:
-            if field not in all_fields:
-                errors.append("Office %s has unrecognized field '%s'" % (office_id, field))
-            if not office.get(field):
-                warnings.append("Office %s has empty field %s" % (office_id, field))
+def check_field_order(office, office_id, report, env):
+    fields = [f for f in office if f in FIELD_ORDER]  # unknown fields checked above
+    sorted_fields = sorted(fields, key=FIELD_ORDER.index)
+    if fields != sorted_fields:
+        report(False, office_id, "Office %s fields out of order, expected %s" % (office_id, sorted_fields))
 
-        found_id = office.get('id')
-        if found_id and office_id != found_id:
-            errors.append("Office %s has unexpected id '%s'" % (office_id, found_id))
 
-        office_state = office.get('state')
-        if state and office_state and office_state != state:
-            errors.append("Office %s is in '%s', legislator is from '%s'" % (office_id, office_state, state))
+# The rules for each office (see schema.py). The context is the office id
+# generated by id_offices.
+check_office = schema.compile_schema(
+    [{"key": field, "nonempty": "Office {context} is missing required field '{key}'"}
+     for field in REQUIRED_FIELDS] +
+    [{"key": field, "nonempty": "Office {context} is missing field '{key}'", "warning": True}
+     for field in EXPECTED_FIELDS] +
+    [
+        {
+            "keys": {field: {"empty": "Office {context} has empty field {key}", "warning": True}
+                     for field in REQUIRED_FIELDS + EXPECTED_FIELDS + OPTIONAL_FIELDS},
+            "unknown": "Office {context} has unrecognized field '{key}'",
+            "other": {"empty": "Office {context} has empty field {key}", "warning": True},
+        },
+        check_office_id,
+        check_office_state,
+        {"key": "zip", "type": (str, type(None)), "message": "Office {context} has non-string zip: {value}"},
+        {"key": "phone", "pattern": PHONE, "message": "Office {context} phone '{value}' does not match format ddd-ddd-dddd"},
+        {"key": "fax", "pattern": PHONE, "message": "Office {context} fax '{value}' does not match format ddd-ddd-dddd"},
+        check_address_or_phone,
+        check_field_order,
+    ])
 
-        office_zip = office.get('zip')
-        if office_zip is not None and not isinstance(office_zip, str):
-            errors.append("Office %s has non-string zip: %s" % (office_id, office_zip))
 
-        phone = office.get('phone')
-        fax = office.get('fax')
+def check_legislator_offices(legislator_offices, legislator):
+    bioguide_id = legislator_offices['id']['bioguide']
+    offices = legislator_offices.get('offices', [])
+
+    state = None
+    if legislator:
+        state = legislator['terms'][-1]['state']
 
-        if phone and not PHONE.match(phone):
-            errors.append("Office %s phone '%s' does not match format ddd-ddd-dddd" % (office_id, phone))
+    errors = []
+    warnings = []
 
-        if fax and not PHONE.match(fax):
-            errors.append("Office %s fax '%s' does not match format ddd-ddd-dddd" % (office_id, fax))
+    def report(is_error, office_id, message):
+        (errors if is_error else warnings).append(message)
 
-        if (office.get('address') and
-                not (office.get('latitude') and office.get('longitude'))):
-            warnings.append("Office %s missing geocode" % office_id)
+    if not legislator:
+        errors.append("Offices for inactive legislator")
 
-        if not office.get('address') and not office.get('phone'):
-            errors.append("Office %s needs at least address or phone" % office_id)
+    if not offices:
+        errors.append("Zero offices")
 
-        fields = [f for f in office if f in FIELD_ORDER]  # unknown fields checked above
-        sorted_fields = sorted(fields, key=FIELD_ORDER.index)
-        if fields != sorted_fields:
-            warnings.append("Office %s fields out of order, expected %s" % (office_id, sorted_fields))
+    env = {'state': state}
+    for office_id, office in id_offices(bioguide_id, offices):
+        check_office(office, office_id, report, env)
 
     return errors, warnings
 
 
 def load_to_dict(path):
-    # load to an OrderedDict keyed by bioguide id
-    d = yaml.load(open(relfile(path)))
+    return to_dict(yaml.load(open(relfile(path))))
+
+
+def to_dict(d):
+    # convert a list of records to an OrderedDict keyed by bioguide id
     return OrderedDict((l['id']['bioguide'], l) for l in d
         if 'bioguide' in l['id'])
 
@@ -183,9 +199,16 @@ def print_issues(legislator, errors, warnings):
     print("")
 
 
-def run(skip_warnings=False):
-    legislators = load_to_dict("../legislators-current.yaml")
-    legislators_offices = load_to_dict("../legislators-district-offices.yaml")
+def run(skip_warnings=False, legislators=None, legislators_offices=None):
+    # The caller may pass the already-loaded files' data.
+    if legislators is None:
+        legislators = load_to_dict("../legislators-current.yaml")
+    else:
+        legislators = to_dict(legislators)
+    if legislators_offices is None:
+        legislators_offices = load_to_dict("../legislators-district-offices.yaml")
+    else:
+        legislators_offices = to_dict(legislators_offices)
 
     has_errors = False
 
@@ -0,0 +1,130 @@
+# Prepares the data files on the gh-pages branch for caching. Run after
+# alternate_bulk_formats.py.
+#
+# python publish_artifacts.py
+#
+# Each data file is copied to hashed/ under a name that includes a hash
+# of its contents, along with gzip- and zstd-compressed copies, so that
+# clients and caches can keep those files forever. manifest.json maps
+# each file's usual name to its hashed copies, with their sizes and
+# digests, so clients only need to re-fetch the small manifest to check
+# for updates. Hashed files not referenced by the new or the previous
+# manifest are deleted.
+
+import glob
+import gzip
+import hashlib
+import json
+import os
+
+import utils
+
+try:
+  from compression import zstd # Python 3.14+
+  zstd_compress = lambda data: zstd.compress(data, level=19)
+except ImportError:
+  try:
+    import zstandard
+    zstd_compress = zstandard.ZstdCompressor(level=19).compress
+  except ImportError:
+    zstd_compress = None
+
+MANIFEST_FILE = "manifest.json"
+HASHED_DIR = "hashed"
+
+# Files published on gh-pages, relative to the data directory.
+PUBLISHED_FILES = ["*.yaml", "*.csv", "*.json", "*.ndjson", "*.sqlite", "tables/*.parquet"]
+
+# Files that aren't data.
+EXCLUDED_FILES = { MANIFEST_FILE, "build-manifest.json" }
+
+# Formats that are already compressed.
+COMPRESSED_EXTENSIONS = { ".parquet" }
+
+def published_files():
+  files = set()
+  for pattern in PUBLISHED_FILES:
+    for path in glob.glob(os.path.join(utils.data_dir(), pattern)):
+      files.add(os.path.relpath(path, utils.data_dir()))
+  return sorted(f for f in files if f not in EXCLUDED_FILES)
+
+def hashed_name(name, digest):
+  # e.g. tables/people.parquet => hashed/tables/people.0123456789abcdef.parquet
+  stem, ext = os.path.splitext(name)
+  return os.path.join(HASHED_DIR, "%s.%s%s" % (stem, digest[:16], ext))
+
+def write_once(path, body):
+  # Hashed files never change, so only write them if they are new.
+  path = os.path.join(utils.data_dir(), path)
+  if not os.path.exists(path):
+    utils.write(body, path)
+
+def publish_file(name):
+  with open(os.path.join(utils.data_dir(), name), 'rb') as f:
+    body = f.read()
+  digest = hashlib.sha256(body).hexdigest()
+
+  entry = {
+    "path": hashed_name(name, digest),
+    "size": len(body),
+    "sha256": digest,
+    "encodings": { },
+  }
+  write_once(entry["path"], body)
+
+  if os.path.splitext(name)[1] not in COMPRESSED_EXTENSIONS:
+    # mtime=0 so that the output depends only on the input.
+    encodings = [("gzip", ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if zstd_compress:
+      encodings.append(("zstd", ".zst", zstd_compress))
+    for encoding, ext, compress in encodings:
+      path = entry["path"] + ext
+      if os.path.exists(os.path.join(utils.data_dir(), path)):
+        with open(os.path.join(utils.data_dir(), path), 'rb') as f:
+          compressed = f.read()
+      else:
+        compressed = compress(body)
+        write_once(path, compressed)
+      entry["encodings"][encoding] = {
+        "path": path,
+        "size": len(compressed),
+        "sha256": hashlib.sha256(compressed).hexdigest(),
+      }
+
+  return entry
+
+def manifest_paths(manifest):
+  paths = set()
+  for entry in manifest.get("files", {}).values():
+    paths.add(entry["path"])
+    for encoding in entry["encodings"].values():
+      paths.add(encoding["path"])
+  return paths
+
+def run():
+  if not zstd_compress:
+    print("zstd is not available, so zstd-compressed files will not be generated.")
+
+  manifest_path = os.path.join(utils.data_dir(), MANIFEST_FILE)
+  if os.path.exists(manifest_path):
+    with open(manifest_path) as f:
+      previous_manifest = json.load(f)
+  else:
+    previous_manifest = { }
+
+  manifest = { "files": { } }
+  for name in published_files():
+    print(name + "...")
+    manifest["files"][name] = publish_file(name)
+
+  # Keep the files from the previous release for clients that fetched
+  # the previous manifest but not yet the files. Delete older files.
+  keep = manifest_paths(manifest) | manifest_paths(previous_manifest)
+  for path in glob.glob(os.path.join(utils.data_dir(), HASHED_DIR, "**", "*"), recursive=True):
+    if os.path.isfile(path) and os.path.relpath(path, utils.data_dir()) not in keep:
+      os.unlink(path)
+
+  utils.write(json.dumps(manifest, indent=2, sort_keys=True), manifest_path)
+
+if __name__ == '__main__':
+  run()
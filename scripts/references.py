@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+# Checks the references between the data files: that committee
+# membership and social media accounts are for current legislators (in
+# the right chamber, for committees), that
+# leadership roles are during a term in the same chamber, and that
+# family members are known legislators or executive branch officials.
+#
+# python references.py
+#
+# With --fix, references to people who are no longer serving and
+# membership of committees that no longer exist are removed, and the
+# files are saved:
+#
+# python references.py --fix
+#
+# Each file is read once and each reference is looked up in sets of the
+# IDs that are allowed (see build_index).
+
+import re
+import sys
+
+import utils
+
+# The files that are read, and the files that --fix may change.
+FILES = [
+  "legislators-current.yaml",
+  "legislators-historical.yaml",
+  "executive.yaml",
+  "committees-current.yaml",
+  "committee-membership-current.yaml",
+  "legislators-social-media.yaml",
+  "legislators-district-offices.yaml",
+]
+FIXABLE_FILES = [
+  "committee-membership-current.yaml",
+  "legislators-social-media.yaml",
+  "legislators-district-offices.yaml",
+]
+
+CHAMBER_TERM_TYPES = { "house": "rep", "senate": "sen" }
+
+NAME_SUFFIXES = { "jr", "sr", "ii", "iii", "iv", "v" }
+
+def load_files(load=utils.load_data):
+  return { fn: load(fn) for fn in FILES }
+
+def name_key(name):
+  # Returns the first and last words of a name, lowercased and without
+  # punctuation or suffixes, which is how family members are matched
+  # with legislators because the family names are written out in full
+  # (e.g. "Arch Alfred Moore Jr.").
+  words = [w for w in re.sub(r"[^\w\s-]", "", name.lower()).split() if w not in NAME_SUFFIXES]
+  if len(words) < 2:
+    return None
+  return (words[0], words[-1])
+
+def build_index(files):
+  # Returns the sets of the IDs and names that references may refer to.
+  index = {
+    "current": set(), # bioguide IDs of current legislators
+    "rep": set(), # ... who are serving in the House
+    "sen": set(), # ... who are serving in the Senate
+    "names": set(), # name_keys of every legislator and executive branch official
+  }
+  for fn in ("legislators-current.yaml", "legislators-historical.yaml", "executive.yaml"):
+    for person in files.get(fn) or []:
+      name = person.get("name", {})
+      names = [name.get("official_full")]
+      if name.get("last"):
+        names += [first + " " + name["last"] for first in (name.get("first"), name.get("nickname")) if first]
+      index["names"].update(name_key(n) for n in names if n)
+      if fn == "legislators-current.yaml" and "bioguide" in person["id"]:
+        index["current"].add(person["id"]["bioguide"])
+        index[person["terms"][-1]["type"]].add(person["id"]["bioguide"])
+  index["names"].discard(None)
+  return index
+
+def committee_ids(committees):
+  # Returns the IDs of the committees and subcommittees, mapped to the
+  # committee's type (house, senate or joint).
+  ids = { }
+  for c in committees:
+    ids[c["thomas_id"]] = c["type"]
+    for s in c.get("subcommittees", []):
+      ids[c["thomas_id"] + s["thomas_id"]] = c["type"]
+  return ids
+
+def check_references(files, index=None):
+  # Returns a list of (is_error, context, message) for each problem.
+  if index is None:
+    index = build_index(files)
+  problems = []
+  def error(context, message):
+    problems.append((True, context, message))
+  def warning(context, message):
+    problems.append((False, context, message))
+
+  # Committee membership.
+  committees = committee_ids(files["committees-current.yaml"])
+  membership = files["committee-membership-current.yaml"]
+  for committee_id, members in membership.items():
+    if committee_id not in committees:
+      error("committee-membership-current.yaml", "Invalid committee ID: " + committee_id)
+      continue
+    for member in members:
+      bioguide = member.get("bioguide")
+      if bioguide not in index["current"]:
+        error("committee-membership-current.yaml", "Member of {} is not a current legislator: {} ({})".format(
+          committee_id, bioguide, member.get("name")))
+        continue
+      # The chamber of members of joint committees is given in the entry.
+      chamber = committees[committee_id] if committees[committee_id] != "joint" else member.get("chamber")
+      if chamber in CHAMBER_TERM_TYPES and bioguide not in index[CHAMBER_TERM_TYPES[chamber]]:
+        error("committee-membership-current.yaml", "Member of {} is not serving in the {}: {} ({})".format(
+          committee_id, chamber, bioguide, member.get("name")))
+  for committee_id in committees:
+    if committee_id not in membership:
+      warning("committees-current.yaml", "No membership information for: " + committee_id)
+
+  # Social media. (District offices of people who aren't serving are
+  # reported by office_validator.py, as "Offices for inactive legislator".)
+  for entry in files["legislators-social-media.yaml"]:
+    if entry["id"].get("bioguide") not in index["current"]:
+      error("legislators-social-media.yaml", "Entry for non-current legislator: " + str(entry["id"].get("bioguide")))
+
+  # Leadership roles and family members.
+  for fn in ("legislators-current.yaml", "legislators-historical.yaml"):
+    for legislator in files.get(fn) or []:
+      context = "{}:{}".format(fn, legislator["id"].get("bioguide", legislator["id"].get("govtrack")))
+      for role in legislator.get("leadership_roles", []):
+        # The role must overlap a term in its chamber. (Dates are
+        # YYYY-MM-DD strings, which sort like dates, and the role's
+        # dates are checked in validate.py.)
+        term_type = CHAMBER_TERM_TYPES.get(role.get("chamber"))
+        start, end = role.get("start"), role.get("end", "9999-12-31")
+        if not (term_type and isinstance(start, str) and isinstance(end, str)):
+          continue
+        if not any(term.get("type") == term_type and term.get("start", "") <= end and start <= term.get("end", "")
+                   for term in legislator.get("terms", [])):
+          error(context, "Leadership role {} ({} to {}) is not during a term in the {}.".format(
+            role.get("title"), start, role.get("end", "present"), role["chamber"]))
+      for relative in legislator.get("family", []):
+        if name_key(relative.get("name", "")) not in index["names"]:
+          warning(context, "Family member {} ({}) is not a known legislator or official.".format(
+            relative.get("name"), relative.get("relation")))
+
+  return problems
+
+def fix(files, index=None):
+  # Removes references to people who are no longer serving, and the
+  # membership of committees that no longer exist, from the files in
+  # FIXABLE_FILES. The lists are rebuilt rather than modified while
+  # they are iterated over. Returns a description of each removal.
+  if index is None:
+    index = build_index(files)
+  removed = []
+
+  committees = committee_ids(files["committees-current.yaml"])
+  membership = files["committee-membership-current.yaml"]
+  for committee_id in list(membership):
+    if committee_id not in committees:
+      removed.append("[{}] Committee no longer exists.".format(committee_id))
+      del membership[committee_id]
+      continue
+    members = []
+    for member in membership[committee_id]:
+      if member.get("bioguide") in index["current"]:
+        members.append(member)
+      else:
+        removed.append("[{}] Removed from {}. ({})".format(member.get("bioguide"), committee_id, member.get("name")))
+    membership[committee_id] = members
+
+  for fn in ("legislators-social-media.yaml", "legislators-district-offices.yaml"):
+    entries = []
+    for entry in files[fn]:
+      if entry["id"].get("bioguide") in index["current"]:
+        entries.append(entry)
+      else:
+        removed.append("[{}] Removed from {}.".format(entry["id"].get("bioguide"), fn))
+    files[fn][:] = entries
+
+  return removed
+
+def save_files(files):
+  for fn in FIXABLE_FILES:
+    utils.save_data(files[fn], fn)
+
+def run():
+  files = load_files()
+  if utils.flags().get("fix"):
+    removed = fix(files)
+    for message in removed:
+      print(message)
+    if removed:
+      save_files(files)
+
+  has_errors = False
+  for is_error, context, message in check_references(files):
+    print(("ERROR: " if is_error else "WARNING: ") + context + ": " + message)
+    has_errors = has_errors or is_error
+  sys.exit(1 if has_errors else 0)
+
+if __name__ == '__main__':
+  run()
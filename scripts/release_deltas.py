@@ -0,0 +1,214 @@
+# Computes what changed in the JSON files on the gh-pages branch since
+# the previous release, as a feed of JSON Patches, so that copies of the
+# data can be updated without downloading whole files again. Run after
+# alternate_bulk_formats.py and before committing the new files.
+#
+# python release_deltas.py [--previous=REVISION]
+#
+# The previous release is read from git, from the given revision or
+# by default from HEAD (the last commit on gh-pages).
+#
+# Each JSON file is treated as a mapping from record keys (bioguide IDs,
+# committee IDs, or GovTrack IDs for executive branch officials without
+# bioguide IDs) to records. Each release that changes anything gets the
+# next sequence number and a file deltas/<sequence>.json:
+#
+#   {
+#     "sequence": 42,
+#     "files": {
+#       "legislators-current.json": {
+#         "patch": [ { "op": "replace", "path": "/B001288/terms/2/phone", "value": "..." }, ... ],
+#         "sha256": "<digest of the new keyed mapping>"
+#       }, ...
+#     }
+#   }
+#
+# Each patch is an RFC 6902 JSON Patch to apply to the keyed mapping.
+# Applying a patch doesn't reproduce the order of the records in the
+# file, so the digests are not of the files themselves but of the keyed
+# mapping in a canonical form: serialized with sorted keys, no
+# whitespace and unescaped non-ASCII characters, encoded as UTF-8
+# (json.dumps(mapping, sort_keys=True, separators=(",", ":"),
+# ensure_ascii=False)). See keyed_digest.
+# deltas/feed.json lists the latest sequence number, the delta files
+# that are still available, and the digests of the files as of the
+# latest sequence number. A client at sequence N applies each delta
+# after N in order, or fetches the whole files again if a delta it needs
+# is no longer listed.
+
+import glob
+import hashlib
+import json
+import os
+import subprocess
+
+import utils
+
+DELTAS_DIR = "deltas"
+FEED_FILE = os.path.join(DELTAS_DIR, "feed.json")
+
+# The JSON files whose changes are published.
+FILES = [
+  "legislators-current.json",
+  "legislators-historical.json",
+  "legislators-social-media.json",
+  "legislators-district-offices.json",
+  "executive.json",
+  "committees-current.json",
+  "committees-historical.json",
+  "committee-membership-current.json",
+]
+
+# How many delta files to keep.
+MAX_DELTAS = 200
+
+def keyed(data):
+  # The mapping files are already keyed. The other files are lists of records.
+  if isinstance(data, dict):
+    return data
+  return { str(utils.record_key(record)): record for record in data }
+
+def keyed_digest(mapping):
+  # The SHA-256 digest of a keyed mapping in canonical form, which a
+  # client can compute after applying a patch to check the result.
+  canonical = json.dumps(mapping, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+  return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def escape(key):
+  # Escape a JSON Pointer path component.
+  return str(key).replace("~", "~0").replace("/", "~1")
+
+def unescape(key):
+  return key.replace("~1", "/").replace("~0", "~")
+
+def json_patch(old, new, path=""):
+  # Returns a list of JSON Patch operations that transform old into new.
+  # Lists are compared element by element, which suits the data files
+  # where new items (terms, IDs) are usually appended.
+  if isinstance(old, dict) and isinstance(new, dict):
+    ops = []
+    for key in old:
+      if key not in new:
+        ops.append({ "op": "remove", "path": path + "/" + escape(key) })
+    for key, value in new.items():
+      if key not in old:
+        ops.append({ "op": "add", "path": path + "/" + escape(key), "value": value })
+      else:
+        ops.extend(json_patch(old[key], value, path + "/" + escape(key)))
+    return ops
+
+  if isinstance(old, list) and isinstance(new, list):
+    ops = []
+    for i in range(min(len(old), len(new))):
+      ops.extend(json_patch(old[i], new[i], path + "/" + str(i)))
+    for i in range(len(old), len(new)):
+      ops.append({ "op": "add", "path": path + "/" + str(i), "value": new[i] })
+    # Remove from the end so that the indexes stay valid.
+    for i in reversed(range(len(new), len(old))):
+      ops.append({ "op": "remove", "path": path + "/" + str(i) })
+    return ops
+
+  # Compare types too so that e.g. 1 and True or 1 and 1.0 are different.
+  if type(old) != type(new) or old != new:
+    return [{ "op": "replace", "path": path, "value": new }]
+  return []
+
+def apply_patch(document, patch):
+  # Applies a JSON Patch made by json_patch (add, remove and replace
+  # operations only) to document, modifying it in place where possible,
+  # and returns the result.
+  for op in patch:
+    if op["path"] == "":
+      document = op["value"]
+      continue
+    parts = [unescape(part) for part in op["path"].split("/")[1:]]
+    parent = document
+    for part in parts[:-1]:
+      parent = parent[int(part) if isinstance(parent, list) else part]
+    key = int(parts[-1]) if isinstance(parent, list) else parts[-1]
+    if op["op"] == "remove":
+      del parent[key]
+    elif op["op"] == "add" and isinstance(parent, list):
+      parent.insert(key, op["value"])
+    elif op["op"] in ("add", "replace"):
+      parent[key] = op["value"]
+    else:
+      raise ValueError("Unsupported operation: " + op["op"])
+  return document
+
+def load_previous(name, revision):
+  # Returns the file at the given git revision, or None if it didn't exist.
+  result = subprocess.run(["git", "show", "%s:%s" % (revision, name)],
+    cwd=utils.data_dir(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+  if result.returncode != 0:
+    return None
+  return json.loads(result.stdout)
+
+def load_feed():
+  path = os.path.join(utils.data_dir(), FEED_FILE)
+  if not os.path.exists(path):
+    return { "sequence": 0, "deltas": [], "sha256": { } }
+  with open(path) as f:
+    return json.load(f)
+
+def run():
+  revision = utils.flags().get("previous", "HEAD")
+  feed = load_feed()
+
+  delta = { "files": { } }
+  for name in FILES:
+    path = os.path.join(utils.data_dir(), name)
+    if not os.path.exists(path):
+      continue
+    with open(path, 'rb') as f:
+      data = keyed(json.load(f))
+
+    # Skip files that are unchanged since the last delta, so that running
+    # this twice doesn't publish the same changes twice.
+    digest = keyed_digest(data)
+    if feed["sha256"].get(name) == digest:
+      continue
+    feed["sha256"][name] = digest
+
+    previous = load_previous(name, revision)
+    if previous is None:
+      # There's nothing to compare to. Clients will have to fetch the file.
+      print("%s is not in %s." % (name, revision))
+      continue
+
+    patch = json_patch(keyed(previous), data)
+    if patch:
+      print("%s: %d changes" % (name, len(patch)))
+      delta["files"][name] = {
+        "patch": patch,
+        "sha256": digest,
+      }
+
+  if not delta["files"]:
+    print("No changes.")
+    utils.write(json.dumps(feed, indent=2), os.path.join(utils.data_dir(), FEED_FILE))
+    return
+
+  feed["sequence"] += 1
+  delta["sequence"] = feed["sequence"]
+
+  delta_path = os.path.join(DELTAS_DIR, "%d.json" % delta["sequence"])
+  utils.write(json.dumps(delta, separators=(',', ':')), os.path.join(utils.data_dir(), delta_path))
+  feed["deltas"].append({
+    "sequence": delta["sequence"],
+    "path": delta_path,
+    "size": os.path.getsize(os.path.join(utils.data_dir(), delta_path)),
+  })
+
+  # Delete the oldest delta files.
+  feed["deltas"] = feed["deltas"][-MAX_DELTAS:]
+  keep = set(entry["path"] for entry in feed["deltas"])
+  for path in glob.glob(os.path.join(utils.data_dir(), DELTAS_DIR, "*.json")):
+    relpath = os.path.relpath(path, utils.data_dir())
+    if relpath != FEED_FILE and relpath not in keep:
+      os.unlink(path)
+
+  utils.write(json.dumps(feed, indent=2), os.path.join(utils.data_dir(), FEED_FILE))
+
+if __name__ == '__main__':
+  run()
@@ -0,0 +1,211 @@
+# Compiles declarative schemas for the records in the data files into
+# functions that check records.
+#
+# A schema is a list of rules, which are checked in order. A rule is
+# either a function or a dict of one of these forms:
+#
+#   { "keys": { key: field, ... }, "unknown": message, "other": field }
+#     Checks each key/value pair in the record, in the record's order.
+#     Keys not in "keys" are reported with the "unknown" message (if
+#     given) and are checked against the "other" field (if given).
+#
+#   { "key": key, "required": message }
+#     Reports the message if the key is not present.
+#
+#   { "key": key, "nonempty": message }
+#     Reports the message if the key is not present or its value is empty.
+#
+#   { "key": key, "choices": values, "message": message }
+#     Reports the message if the value is not one of the values (a
+#     missing key's value is None).
+#
+#   { "key": key, "type": type, "message": message }
+#     Reports the message if the value is not of the type (or tuple of
+#     types).
+#
+#   { "key": key, "pattern": regex, "message": message }
+#     Reports the message if the value is not empty and doesn't match.
+#
+# Any of the dict rules can also have "when": { key: value, ... } to
+# only apply to records with those values, and "warning": True to
+# report a warning instead of an error.
+#
+# A field is a dict with any of:
+#
+#   "type": a type or tuple of types that the value must be,
+#   "pattern": a regex that the value, or each item in a list value, must match,
+#   "strip": True if strings must not have leading or trailing spaces,
+#   "empty": a message to report if the value is empty,
+#   "messages": a dict of messages to use instead of the default ones
+#     for "type", "pattern" and "strip" (see DEFAULT_MESSAGES),
+#   "warning": True to report warnings instead of errors.
+#
+# Messages are str.format templates, formatted only when there is
+# something to report, with these fields: {key}, {value}, {yaml} (the
+# key and value as YAML), {record_yaml} (the whole record as YAML) and
+# {context}.
+#
+# compile_schema(rules) returns a function check(record, context,
+# report, env=None) that calls report(is_error, context, message) for
+# each problem found. context says where the record is, for messages,
+# and can be a string or a function that returns one so that it is only
+# made when needed. env is passed to function rules, which are called as
+# rule(record, context, report, env) and may return a new context for
+# the rules after them.
+
+import re
+
+import rtyaml
+
+DEFAULT_MESSAGES = {
+  "type": "{yaml} has an invalid data type.",
+  "pattern": "{yaml} has invalid format.",
+  "strip": "{yaml} has leading or trailing spaces.",
+}
+
+def context_text(context):
+  return context() if callable(context) else context
+
+def format_message(template, context, key=None, value=None, record=None):
+  fields = { "key": key, "value": value }
+  if "{context}" in template:
+    fields["context"] = context_text(context)
+  if "{yaml}" in template:
+    fields["yaml"] = rtyaml.dump({ key: value }).strip()
+  if "{record_yaml}" in template:
+    fields["record_yaml"] = rtyaml.dump(record)
+  return template.format(**fields)
+
+def compile_field(field):
+  # Returns a field's checks as a tuple for compile_keys, or None if the
+  # field has no checks.
+  value_type = field.get("type")
+  match = re.compile(field["pattern"]).match if "pattern" in field else None
+  strip = field.get("strip")
+  empty = field.get("empty")
+  if value_type is None and match is None and not strip and empty is None:
+    return None
+  messages = dict(DEFAULT_MESSAGES, **field.get("messages", {}))
+  return (not field.get("warning"), empty, value_type, match, strip, messages)
+
+def compile_keys(rule):
+  fields = { key: compile_field(field) for key, field in rule["keys"].items() }
+  other = compile_field(rule["other"]) if "other" in rule else None
+  unknown = rule.get("unknown")
+
+  # The field checks are done here rather than in a function for each
+  # field because this runs for every key of every record.
+  def check(record, context, report, env):
+    for key, value in record.items():
+      if key in fields:
+        field = fields[key]
+      else:
+        if unknown is not None:
+          report(True, context, format_message(unknown, context, key, value, record))
+        field = other
+      if field is None:
+        continue
+      is_error, empty, value_type, match, strip, messages = field
+      if empty is not None and not value:
+        report(is_error, context, format_message(empty, context, key, value, record))
+      if value_type is not None and not isinstance(value, value_type):
+        report(is_error, context, format_message(messages["type"], context, key, value, record))
+        continue
+      if match is not None:
+        for item in (value if isinstance(value, list) else [value]):
+          if not isinstance(item, str) or not match(item):
+            report(is_error, context, format_message(messages["pattern"], context, key, item, record))
+      if strip and isinstance(value, str) and value != value.strip():
+        report(is_error, context, format_message(messages["strip"], context, key, value, record))
+  return check
+
+def compile_presence(rules):
+  # Returns one function that does several "required" and "nonempty"
+  # rules (that don't have "when").
+  presence = [(rule["key"], "required" in rule, rule.get("required", rule.get("nonempty")), not rule.get("warning"))
+              for rule in rules]
+
+  def check(record, context, report, env):
+    for key, required, message, is_error in presence:
+      if (key not in record) if required else (not record.get(key)):
+        report(is_error, context, format_message(message, context, key, record.get(key), record))
+  return check
+
+def compile_rule(rule):
+  # Returns a function check(record, context, report, env) for a rule.
+  if callable(rule):
+    return rule
+  if "keys" in rule:
+    return compile_keys(rule)
+
+  key = rule["key"]
+  is_error = not rule.get("warning")
+
+  # Each kind of rule gets its own function so that checking a record
+  # takes as few steps as possible.
+  if "required" in rule:
+    message = rule["required"]
+    def check(record, context, report, env):
+      if key not in record:
+        report(is_error, context, format_message(message, context, key, None, record))
+  elif "nonempty" in rule:
+    message = rule["nonempty"]
+    def check(record, context, report, env):
+      value = record.get(key)
+      if not value:
+        report(is_error, context, format_message(message, context, key, value, record))
+  elif "choices" in rule:
+    message, choices = rule["message"], rule["choices"]
+    def check(record, context, report, env):
+      value = record.get(key)
+      if value not in choices:
+        report(is_error, context, format_message(message, context, key, value, record))
+  elif "type" in rule:
+    message, value_type = rule["message"], rule["type"]
+    def check(record, context, report, env):
+      value = record.get(key)
+      if not isinstance(value, value_type):
+        report(is_error, context, format_message(message, context, key, value, record))
+  elif "pattern" in rule:
+    message, match = rule["message"], re.compile(rule["pattern"]).match
+    def check(record, context, report, env):
+      value = record.get(key)
+      if value and not match(value):
+        report(is_error, context, format_message(message, context, key, value, record))
+  else:
+    raise ValueError("Invalid rule: " + repr(rule))
+
+  if "when" in rule:
+    when = list(rule["when"].items())
+    check_always = check
+    def check(record, context, report, env):
+      for k, v in when:
+        if record.get(k) != v:
+          return
+      check_always(record, context, report, env)
+  return check
+
+def compile_schema(rules):
+  # Compiles a schema (a list of rules) into a function
+  # check(record, context, report, env=None). Runs of "required" and
+  # "nonempty" rules are done by one function.
+  checks = []
+  presence = []
+  for rule in rules + [None]:
+    if isinstance(rule, dict) and ("required" in rule or "nonempty" in rule) and "when" not in rule:
+      presence.append(rule)
+      continue
+    if len(presence) > 1:
+      checks.append(compile_presence(presence))
+    elif presence:
+      checks.append(compile_rule(presence[0]))
+    presence = []
+    if rule is not None:
+      checks.append(compile_rule(rule))
+
+  def check(record, context, report, env=None):
+    for rule_check in checks:
+      new_context = rule_check(record, context, report, env)
+      if new_context is not None:
+        context = new_context
+  return check
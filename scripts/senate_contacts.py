@@ -7,7 +7,6 @@ import string, re
 from datetime import datetime
 import utils
 from utils import download, load_data, save_data, parse_date
-import urllib.request
 
 def run():
 
@@ -99,10 +98,9 @@ def run():
 			# hit the URL to resolve any redirects to get the canonical URL,
 			# since the listing sometimes gives URLs that redirect.
 			try:
-				req = urllib.request.Request(url)
-				req.add_header("User-Agent", "https://github.com/unitedstates/congress-legislators")
-				resp = urllib.request.urlopen(req)
-				url = resp.geturl()
+				response = utils.http_get(url)
+				response.raise_for_status()
+				url = response.url
 			except Exception as e:
 				print(url, e)
 
@@ -34,7 +34,6 @@
 import csv, json, re
 import utils
 from utils import load_data, save_data
-import requests
 import time
 
 def main():
@@ -144,7 +143,7 @@ def main():
 
         try:
           print("Resolving YT info for %s" % social['youtube'])
-          ytreq = requests.get(profile_url)
+          ytreq = utils.http_get(profile_url)
           # print "\tFetched with status code %i..." % ytreq.status_code
 
           if ytreq.status_code == 404:
@@ -153,7 +152,7 @@ def main():
               # Try to scrape the real YouTube username
               print("\Scraping YouTube username")
               search_url = ("https://www.youtube.com/%s" % social['youtube'])
-              csearch = requests.get(search_url).text.encode('ascii','ignore')
+              csearch = utils.http_get(search_url).text.encode('ascii','ignore')
 
               u = re.search(r'<a[^>]*href="[^"]*/user/([^/"]*)"[.]*>',csearch)
 
@@ -164,7 +163,7 @@ def main():
                 "?v=2&prettyprint=true&alt=json" % social['youtube'])
 
                 print("\tFetching GData profile...")
-                ytreq = requests.get(profile_url)
+                ytreq = utils.http_get(profile_url)
                 print("\tFetched GData profile")
 
               else:
@@ -222,7 +221,7 @@ def main():
 
       instagram_handle = social['instagram']
       query_url = "https://api.instagram.com/v1/users/search?q={query}&client_id={client_id}".format(query=instagram_handle,client_id=client_id)
-      instagram_user_search = requests.get(query_url).json()
+      instagram_user_search = utils.http_get(query_url).json()
       for user in instagram_user_search['data']:
         time.sleep(0.5)
         if user['username'] == instagram_handle:
@@ -353,8 +352,9 @@ def main():
 
     if len(to_check) > 0:
       rows_found = []
+      pages = download_pages(to_check)
       for bioguide in to_check:
-        candidate = candidate_for(bioguide)
+        candidate = candidate_for(bioguide, pages=pages)
         if candidate:
           url = current_bioguide[bioguide]["terms"][-1].get("url", None)
           candidate_url = "https://%s.com/%s" % (service, candidate)
@@ -376,15 +376,16 @@ def main():
     else:
       to_check = list(media_bioguide.keys())
 
+    to_check = [bioguide for bioguide in to_check if media_bioguide[bioguide]['social'].get(service, None)]
+    pages = download_pages(to_check)
+
     for bioguide in to_check:
       entry = media_bioguide[bioguide]
       current = entry['social'].get(service, None)
-      if not current:
-        continue
 
       bioguide = entry['id']['bioguide']
 
-      candidate = candidate_for(bioguide, current)
+      candidate = candidate_for(bioguide, current, pages)
       if not candidate:
         # if current is in whitelist, and none is on the page, that's okay
         if current.lower() in whitelist[service]:
@@ -442,10 +443,20 @@ def main():
     save_data(media, "legislators-social-media.yaml")
 
 
-  def candidate_for(bioguide, current = None):
+  def download_pages(bioguides):
+    """download the official websites of the legislators concurrently,
+    returning a dict from bioguide ID to the page (or None).
+    """
+    bioguides = [bioguide for bioguide in bioguides if current_bioguide[bioguide]["terms"][-1].get("url", None)]
+    downloads = [(current_bioguide[bioguide]["terms"][-1]["url"], "congress/%s.html" % bioguide) for bioguide in bioguides]
+    return dict(zip(bioguides, utils.download_many(downloads, force, {'check_redirects': True, 'debug': debug})))
+
+  def candidate_for(bioguide, current = None, pages = None):
     """find the most likely candidate account from the URL.
     If current is passed, the candidate will match it if found
-    otherwise, the first candidate match is returned
+    otherwise, the first candidate match is returned.
+    If pages is passed, the page is taken from it (see download_pages)
+    instead of being downloaded.
     """
     url = current_bioguide[bioguide]["terms"][-1].get("url", None)
     if not url:
@@ -453,10 +464,13 @@ def main():
         print("[%s] No official website, skipping" % bioguide)
       return None
 
-    if debug:
-      print("[%s] Downloading..." % bioguide)
-    cache = "congress/%s.html" % bioguide
-    body = utils.download(url, cache, force, {'check_redirects': True})
+    if pages is not None:
+      body = pages.get(bioguide)
+    else:
+      if debug:
+        print("[%s] Downloading..." % bioguide)
+      cache = "congress/%s.html" % bioguide
+      body = utils.download(url, cache, force, {'check_redirects': True})
     if not body:
       return None
 
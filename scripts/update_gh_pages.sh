@@ -12,12 +12,20 @@ git checkout gh-pages
 git fetch origin $SRC_BRANCH
 HASH=$(git rev-parse FETCH_HEAD)
 echo "Getting latest files from $SRC_BRANCH @ $HASH."
-git checkout FETCH_HEAD "*.yaml" scripts/alternate_bulk_formats.py scripts/utils.py
+git checkout FETCH_HEAD "*.yaml" scripts/alternate_bulk_formats.py scripts/normalized_tables.py scripts/publish_artifacts.py scripts/release_deltas.py scripts/utils.py
 
-# Generate CSV and JSON.
+# Generate CSV, JSON, NDJSON, Parquet, and SQLite.
 (cd scripts/; python3 alternate_bulk_formats.py;)
 
-# Commit the YAML, CSV, and JSON.
+# Write the JSON Patch feed of changes since the previous commit
+# on this branch.
+(cd scripts/; python3 release_deltas.py;)
+
+# Write the content-hashed and compressed copies and manifest.json.
+(cd scripts/; python3 publish_artifacts.py;)
+
+# Commit the YAML, CSV, JSON, NDJSON, Parquet, and SQLite, the delta feed,
+# and the hashed copies (including deletions of old ones).
 # (Don't commit the other scripts files we checked out from
 # the source branch, which git has unhelpfully put in the
 # index.)
@@ -25,10 +33,12 @@ export GIT_AUTHOR_NAME="the unitedstates project (CircleCI)"
 export GIT_AUTHOR_EMAIL=circleci@theunitedstates.io
 export GIT_COMMITTER_NAME="$GIT_AUTHOR_NAME"
 export GIT_COMMITTER_EMAIL="GIT_AUTHOR_EMAIL"
+# (The Parquet tables are only generated when pyarrow is installed.)
+PATHS="*.yaml *.csv *.json *.ndjson *.sqlite deltas hashed"
+if [ -d tables ]; then PATHS="$PATHS tables"; fi
 (
-	git add *.yaml *.csv *.json \
-	&& git commit -m "update to $SRC_BRANCH @ $HASH by CircleCI" \
-	       *.yaml *.csv *.json \
+	git add -A $PATHS \
+	&& git commit -m "update to $SRC_BRANCH @ $HASH by CircleCI" $PATHS \
 	&& git push
 ) || /bin/true # if there's nothing to commit, don't exit with error status
 
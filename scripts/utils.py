@@ -232,6 +232,14 @@ def flags():
       options[key.lower()] = value
   return options
 
+def record_key(record):
+  # Returns the key that identifies a record in one of the data files.
+  # Committees are keyed by their ID and people by their bioguide ID,
+  # or GovTrack ID for presidents and vice presidents without one.
+  if "thomas_id" in record:
+    return record["thomas_id"]
+  return record["id"].get("bioguide", record["id"].get("govtrack"))
+
 ##### Data management
 
 def data_dir():
@@ -242,19 +250,523 @@ def load_data(path):
 
 def save_data(data, path):
   yaml_dump(data, os.path.join(data_dir(), path))
-  write(
-		json.dumps(data, default=format_datetime),
-		"../alternate_formats/%s" %path.replace(".yaml", ".json"))
+  write_json(data, "../alternate_formats/%s" %path.replace(".yaml", ".json"))
 
 ##### Downloading
 
+import asyncio
+import concurrent.futures
+import threading
+import requests
 import scrapelib
-scraper = scrapelib.Scraper(requests_per_minute=60, retry_attempts=3)
-scraper.user_agent = "the @unitedstates project (https://github.com/unitedstates/congress-legislators)"
+# All requests go through one requests session (see http_session), whose
+# connections to each host are kept alive and reused. Each host gets
+# HOST_REQUESTS_PER_MINUTE requests on average, and download_many sends
+# at most HOST_CONCURRENCY requests at a time to a host and
+# DOWNLOAD_CONCURRENCY in all. Connection errors, timeouts (after
+# DOWNLOAD_TIMEOUT seconds) and 429 and 5xx responses are retried
+# RETRY_ATTEMPTS times, waiting RETRY_WAIT seconds and then twice as
+# long each time.
+DOWNLOAD_CONCURRENCY = 8
+HOST_CONCURRENCY = 2
+HOST_REQUESTS_PER_MINUTE = 60
+RETRY_ATTEMPTS = 3
+RETRY_WAIT = 2
+DOWNLOAD_TIMEOUT = 60
+
+USER_AGENT = "the @unitedstates project (https://github.com/unitedstates/congress-legislators)"
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def http_session():
+  # Returns the requests session that the scripts share. It is safe to
+  # use from the threads that download_many uses.
+  global _http_session
+  with _http_session_lock:
+    if _http_session is None:
+      session = requests.Session()
+      adapter = requests.adapters.HTTPAdapter(pool_connections=DOWNLOAD_CONCURRENCY, pool_maxsize=DOWNLOAD_CONCURRENCY)
+      session.mount("http://", adapter)
+      session.mount("https://", adapter)
+      session.headers["User-Agent"] = USER_AGENT
+      _http_session = session
+    return _http_session
+
+_host_next_request = { }
+_host_next_request_lock = threading.Lock()
+
+def wait_for_host(url, requests_per_minute=None):
+  # Waits until the URL's host may get another request, for the threads
+  # that don't use download_many's rate limits. Returns the time waited.
+  if requests_per_minute is None:
+    requests_per_minute = HOST_REQUESTS_PER_MINUTE
+  if not requests_per_minute:
+    return 0
+  host = urllib.parse.urlsplit(url).netloc.lower()
+  with _host_next_request_lock:
+    now = time.monotonic()
+    at = max(now, _host_next_request.get(host, now))
+    _host_next_request[host] = at + 60.0 / requests_per_minute
+  if at > now:
+    time.sleep(at - now)
+  return at - now
+
+def http_get(url, requests_per_minute=None, **kwargs):
+  # GETs a URL with the shared session, after waiting for the host's
+  # rate limit, retrying errors that may go away, and counting it in
+  # download_metrics. Takes the keyword arguments of requests.get and
+  # returns the last response, whatever its status. Use download instead
+  # for pages that should be cached.
+  kwargs.setdefault("timeout", DOWNLOAD_TIMEOUT)
+  for attempt in range(RETRY_ATTEMPTS + 1):
+    download_metrics.throttled(url, wait_for_host(url, requests_per_minute))
+    start = time.monotonic()
+    try:
+      response = http_session().get(url, **kwargs)
+    except (requests.ConnectionError, requests.Timeout):
+      download_metrics.request(url, None, time.monotonic() - start)
+      if attempt == RETRY_ATTEMPTS:
+        raise
+    else:
+      download_metrics.request(url, response.status_code, time.monotonic() - start, response.content)
+      if (response.status_code < 500 and response.status_code != 429) or attempt == RETRY_ATTEMPTS:
+        return response
+    download_metrics.retry(url)
+    time.sleep(RETRY_WAIT * 2 ** attempt)
+
+# historical_committees.py uses scrapelib for its cache.
+scraper = scrapelib.Scraper(requests_per_minute=HOST_REQUESTS_PER_MINUTE, retry_attempts=RETRY_ATTEMPTS)
+scraper.user_agent = USER_AGENT
+
+# With --record=DIR, the HTTP responses that a script gets are saved in
+# DIR, and with --replay=DIR they are served from a local server instead
+# of the network (see http_fixtures.py).
+if flags().get('record') or flags().get('replay'):
+  import http_fixtures
+  http_fixtures.install(flags().get('record'), flags().get('replay'), float(flags().get('latency', 0)))
 
 def cache_dir():
   return "cache"
 
+# A cached file is used without asking the server again for the number
+# of seconds given for the first prefix here that its destination
+# starts with, or DEFAULT_CACHE_TTL (None means forever), or the 'ttl'
+# download option. After that, and always when force is True, it is
+# revalidated with a conditional request, which costs only a 304
+# response if the file hasn't changed.
+CACHE_TTLS = {
+  "legislators/bioguide/": 7 * 24 * 60 * 60,
+  "icpsr/": 30 * 24 * 60 * 60,
+}
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
+# When a script that downloaded something exits, and the cache hasn't
+# been pruned for CACHE_PRUNE_INTERVAL seconds, the least recently used
+# downloaded files are deleted until the cache is at most
+# CACHE_MAX_BYTES, along with files not used for CACHE_MAX_AGE seconds
+# (see prune_cache). When it was last pruned is the modification time
+# of CACHE_PRUNED in the cache directory.
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_MAX_AGE = 90 * 24 * 60 * 60
+CACHE_PRUNE_INTERVAL = 24 * 60 * 60
+CACHE_PRUNED = "pruned"
+
+def cache_ttl(destination, options):
+  if 'ttl' in options:
+    return options['ttl']
+  for prefix, ttl in CACHE_TTLS.items():
+    if destination.startswith(prefix):
+      return ttl
+  return DEFAULT_CACHE_TTL
+
+# Downloaded files are stored as blobs named by the SHA-256 hash of their
+# contents, zstd-compressed (if the compression.zstd module of Python
+# 3.14 or the zstandard package is available), in the blobs directory of
+# the cache. Each downloaded file's path in the cache has a .meta.json
+# file instead of the file itself, which gives the blob's hash along
+# with the metadata for revalidating it (see save_cache). pack_cache
+# writes all of them to one zip file, CACHE_PACK in the cache directory,
+# which is read from when a file isn't in the cache directory itself, so
+# copying a pack there is enough to warm an empty cache.
+CACHE_PACK = "pack.zip"
+
+try:
+  from compression import zstd # Python 3.14+
+  zstd_compress, zstd_decompress = zstd.compress, zstd.decompress
+except ImportError:
+  try:
+    import zstandard
+    zstd_compress = lambda data: zstandard.ZstdCompressor().compress(data)
+    zstd_decompress = lambda data: zstandard.ZstdDecompressor().decompress(data)
+  except ImportError:
+    zstd_compress = zstd_decompress = None
+
+def cache_meta_path(cache):
+  return cache + ".meta.json"
+
+def blob_name(digest, compressed):
+  return os.path.join(digest[:2], digest + (".zst" if compressed else ""))
+
+_pack = None
+
+def cache_pack():
+  # Returns the open pack file (a zipfile.ZipFile) and its index, which
+  # maps paths in the cache to their metadata, or None if there is no
+  # pack. The pack is opened again if it changes.
+  global _pack
+  import zipfile
+  path = os.path.join(cache_dir(), CACHE_PACK)
+  try:
+    key = (path, os.path.getmtime(path))
+  except OSError:
+    return None
+  if _pack is None or _pack[0] != key:
+    if _pack is not None:
+      _pack[1].close()
+    pack = zipfile.ZipFile(path)
+    _pack = (key, pack, json.loads(pack.read("index.json")))
+  return _pack[1:]
+
+def read_cache_meta(cache):
+  # Returns the metadata saved with a downloaded file (see save_cache),
+  # or None.
+  try:
+    with open(cache_meta_path(cache)) as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    pass
+  pack = cache_pack()
+  if pack:
+    return pack[1].get(os.path.relpath(cache, cache_dir()).replace(os.sep, "/"))
+  return None
+
+def read_blob(digest):
+  # Returns the contents of a blob, or None if it isn't stored.
+  for compressed in ((True, False) if zstd_decompress else (False,)):
+    name = blob_name(digest, compressed)
+    try:
+      with open(os.path.join(cache_dir(), "blobs", name), "rb") as f:
+        data = f.read()
+    except OSError:
+      pack = cache_pack()
+      if not pack:
+        continue
+      try:
+        data = pack[0].read("blobs/" + name.replace(os.sep, "/"))
+      except KeyError:
+        continue # not in the pack
+    return zstd_decompress(data) if compressed else data
+  return None
+
+def write_blob(data):
+  # Stores data as a blob, if it isn't already, and returns its hash.
+  import hashlib
+  digest = hashlib.sha256(data).hexdigest()
+  path = os.path.join(cache_dir(), "blobs", blob_name(digest, zstd_compress is not None))
+  if not os.path.exists(path):
+    # Write to a temporary file first so that other processes never see
+    # a partly written blob.
+    temp = "%s.%d.tmp" % (path, os.getpid())
+    write(zstd_compress(data) if zstd_compress else data, temp)
+    os.replace(temp, path)
+  return digest
+
+def read_cached_data(cache, meta):
+  # Returns the bytes of a downloaded file, or None. Files downloaded
+  # before there was a blob store are stored as is, without a hash.
+  if meta and "digest" in meta:
+    return read_blob(meta["digest"])
+  try:
+    with open(cache, "rb") as f:
+      return f.read()
+  except OSError:
+    return None
+
+def read_cache(cache, options, data=None):
+  # Returns a cached file as download would and marks it as used (for
+  # prune_cache).
+  if data is None:
+    data = read_cached_data(cache, read_cache_meta(cache))
+  try:
+    os.utime(cache_meta_path(cache))
+  except OSError:
+    pass
+  return data if options.get('binary', False) else data.decode("utf-8")
+
+def cache_lookup(cache, destination, force, options):
+  # Returns the cached body if it can be used without asking the server,
+  # or else None and the headers for a conditional request.
+  meta = read_cache_meta(cache)
+  data = read_cached_data(cache, meta)
+  if data is None:
+    return None, {}
+  meta = meta or {}
+  if not force:
+    ttl = cache_ttl(destination, options)
+    fetched = meta["fetched"] if "fetched" in meta else os.path.getmtime(cache)
+    if ttl is None or time.time() - fetched < ttl:
+      return read_cache(cache, options, data), {}
+  headers = {}
+  if meta.get("etag"):
+    headers["If-None-Match"] = meta["etag"]
+  if meta.get("last_modified"):
+    headers["If-Modified-Since"] = meta["last_modified"]
+  return None, headers
+
+def revalidated(cache, options):
+  # Returns a cached file that the server says hasn't changed, and
+  # notes when that was.
+  if options.get('debug', False):
+    log("Not modified: %s" % cache)
+  meta = read_cache_meta(cache)
+  meta["fetched"] = time.time()
+  write(json.dumps(meta), cache_meta_path(cache))
+  return read_cache(cache, options)
+
+_prune_at_exit = False
+
+def save_cache(cache, url, body, status, headers, validators=True):
+  # Saves a downloaded file as a blob, and its metadata: the blob's
+  # hash, the URL, the response's status and ETag and Last-Modified
+  # headers (unless validators is False), and when it was fetched.
+  global _prune_at_exit
+  digest = write_blob(body.encode("utf-8") if isinstance(body, str) else body)
+  meta = { "digest": digest, "url": url, "status": status, "fetched": time.time() }
+  if validators:
+    meta["etag"] = headers.get("ETag")
+    meta["last_modified"] = headers.get("Last-Modified")
+  write(json.dumps(meta), cache_meta_path(cache))
+  if os.path.exists(cache):
+    os.remove(cache) # stored as is before there was a blob store
+  if not _prune_at_exit:
+    import atexit
+    atexit.register(prune_cache_if_due)
+    _prune_at_exit = True
+
+def cache_entries():
+  # Yields the path in the cache, metadata file and metadata of each
+  # downloaded file in the cache directory.
+  for root, dirs, names in os.walk(cache_dir()):
+    for name in names:
+      if name.endswith(".meta.json"):
+        meta_path = os.path.join(root, name)
+        try:
+          with open(meta_path) as f:
+            meta = json.load(f)
+        except (OSError, ValueError):
+          continue
+        yield meta_path[:-len(".meta.json")], meta_path, meta
+
+def prune_cache(max_bytes=None, max_age=None):
+  # Deletes the least recently used downloaded files until the cache is
+  # at most max_bytes, and files that haven't been used for max_age
+  # seconds, along with blobs that no file uses anymore. Files in the
+  # cache directory that download didn't save (they have no metadata)
+  # and the pack are left alone. Returns the number of files deleted.
+  if max_bytes is None: max_bytes = CACHE_MAX_BYTES
+  if max_age is None: max_age = CACHE_MAX_AGE
+
+  blobs = { } # maps hashes to the path and size of each blob
+  for root, dirs, names in os.walk(os.path.join(cache_dir(), "blobs")):
+    for name in names:
+      if not name.endswith(".tmp"): # being written
+        path = os.path.join(root, name)
+        blobs[name.split(".")[0]] = (path, os.path.getsize(path))
+  files = []
+  uses = { } # maps hashes to the number of files using them
+  for cache, meta_path, meta in cache_entries():
+    try:
+      size = os.path.getsize(meta_path) + (os.path.getsize(cache) if os.path.exists(cache) else 0)
+      files.append((os.path.getmtime(meta_path), size, cache, meta.get("digest")))
+    except OSError:
+      continue
+    uses[meta.get("digest")] = uses.get(meta.get("digest"), 0) + 1
+  files.sort()
+
+  def remove(*paths):
+    for path in paths:
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+
+  for digest in list(blobs):
+    if digest not in uses:
+      remove(blobs.pop(digest)[0])
+  total = sum(size for used, size, cache, digest in files) + sum(size for path, size in blobs.values())
+  now = time.time()
+  deleted = 0
+  for used, size, cache, digest in files:
+    if total <= max_bytes and now - used < max_age:
+      break
+    remove(cache, cache_meta_path(cache))
+    total -= size
+    uses[digest] -= 1
+    if uses[digest] == 0 and digest in blobs:
+      remove(blobs[digest][0])
+      total -= blobs[digest][1]
+    deleted += 1
+  return deleted
+
+def prune_cache_if_due():
+  # Prunes the cache if it hasn't been pruned for CACHE_PRUNE_INTERVAL
+  # seconds, so that most runs don't have to read all of its metadata.
+  # Returns the number of files deleted, or None if it wasn't due (or
+  # there's no cache).
+  if not os.path.isdir(cache_dir()):
+    return None
+  stamp = os.path.join(cache_dir(), CACHE_PRUNED)
+  try:
+    if time.time() - os.path.getmtime(stamp) < CACHE_PRUNE_INTERVAL:
+      return None
+  except OSError:
+    pass
+  deleted = prune_cache()
+  write("", stamp)
+  return deleted
+
+def pack_cache(path=None):
+  # Writes the downloaded files in the cache, and those in the current
+  # pack, to one zip file (by default the pack, replacing it). Returns
+  # the number of files.
+  import zipfile
+  if path is None:
+    path = os.path.join(cache_dir(), CACHE_PACK)
+  pack = cache_pack()
+  index = dict(pack[1]) if pack else { }
+  for cache, meta_path, meta in cache_entries():
+    if "digest" not in meta:
+      # Move a file stored as is into the blob store.
+      data = read_cached_data(cache, meta)
+      if data is None:
+        continue
+      meta["digest"] = write_blob(data)
+    index[os.path.relpath(cache, cache_dir()).replace(os.sep, "/")] = meta
+
+  temp = "%s.%d.tmp" % (path, os.getpid())
+  with zipfile.ZipFile(temp, "w", zipfile.ZIP_STORED) as z:
+    # The blobs are stored as they are in the blobs directory, compressed
+    # already.
+    written = set()
+    for key, meta in sorted(index.items()):
+      digest = meta["digest"]
+      if digest in written:
+        continue
+      data = read_blob(digest)
+      if data is None:
+        del index[key]
+        continue
+      z.writestr("blobs/" + blob_name(digest, zstd_compress is not None).replace(os.sep, "/"),
+                 zstd_compress(data) if zstd_compress else data)
+      written.add(digest)
+    z.writestr("index.json", json.dumps(index, sort_keys=True))
+  os.replace(temp, path)
+  return len(index)
+
+class DownloadMetrics:
+  # Counts the requests that download and download_many make for each
+  # host: their statuses ("error" if there was no response), latency (a
+  # histogram with the counts of requests that took at most each of
+  # LATENCY_BUCKETS seconds), bytes, retries, time spent waiting for the
+  # host's rate limit, and how cached files were used ("hit" if used as
+  # is, "revalidated" if the server said it was unchanged, and "miss" if
+  # it was downloaded). A summary is printed when the script exits, and
+  # with --metrics=FILE the metrics are also written to FILE as JSON.
+  LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+  def __init__(self):
+    self.hosts = { }
+    self.lock = threading.Lock()
+    self.reporting = False
+
+  def host(self, url):
+    # Returns the metrics for the URL's host. Call with the lock held.
+    host = urllib.parse.urlsplit(url).netloc.lower()
+    if host not in self.hosts:
+      self.hosts[host] = {
+        "requests": 0, "statuses": { }, "bytes": 0, "retries": 0, "throttled_seconds": 0.0,
+        "latency": { "count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * (len(self.LATENCY_BUCKETS) + 1) },
+        "cache": { "hit": 0, "revalidated": 0, "miss": 0 },
+      }
+      if not self.reporting:
+        import atexit
+        atexit.register(self.report)
+        self.reporting = True
+    return self.hosts[host]
+
+  def request(self, url, status, seconds, body=None):
+    size = len(body.encode("utf-8")) if isinstance(body, str) else len(body or b"")
+    with self.lock:
+      host = self.host(url)
+      host["requests"] += 1
+      status = str(status or "error")
+      host["statuses"][status] = host["statuses"].get(status, 0) + 1
+      host["bytes"] += size
+      latency = host["latency"]
+      latency["count"] += 1
+      latency["sum"] += seconds
+      latency["max"] = max(latency["max"], seconds)
+      latency["buckets"][sum(1 for bound in self.LATENCY_BUCKETS if seconds > bound)] += 1
+
+  def retry(self, url):
+    with self.lock:
+      self.host(url)["retries"] += 1
+
+  def throttled(self, url, seconds):
+    with self.lock:
+      self.host(url)["throttled_seconds"] += seconds
+
+  def cache(self, url, result):
+    with self.lock:
+      self.host(url)["cache"][result] += 1
+
+  def to_json(self):
+    # Returns the metrics by host, with cumulative histogram buckets
+    # keyed by their upper bounds.
+    with self.lock:
+      hosts = json.loads(json.dumps(self.hosts))
+    for host in hosts.values():
+      counts, total = host["latency"].pop("buckets"), 0
+      host["latency"]["buckets"] = { }
+      for bound, count in zip([str(bound) for bound in self.LATENCY_BUCKETS] + ["+Inf"], counts):
+        total += count
+        host["latency"]["buckets"][bound] = total
+    return { "hosts": hosts }
+
+  def summary(self):
+    lines = ["Downloads by host:"]
+    for name, host in sorted(self.hosts.items()):
+      latency, cache = host["latency"], host["cache"]
+      lines.append("  %s: %d requests (%s), %.1f KB, %d retries, %.1fs average, %.1fs max, %.1fs throttled, cache %d hit / %d revalidated / %d miss" % (
+        name, host["requests"], ", ".join("%s: %d" % item for item in sorted(host["statuses"].items())),
+        host["bytes"] / 1024.0, host["retries"], latency["sum"] / latency["count"] if latency["count"] else 0,
+        latency["max"], host["throttled_seconds"], cache["hit"], cache["revalidated"], cache["miss"]))
+    return "\n".join(lines)
+
+  def report(self):
+    if not self.hosts:
+      return
+    sys.stderr.write(self.summary() + "\n")
+    if flags().get('metrics'):
+      write(json.dumps(self.to_json(), indent=2), flags()['metrics'])
+
+download_metrics = DownloadMetrics()
+
+def urlopen(url, headers, options, timeout=None):
+  # Downloads a URL with urllib and returns the status, body (None for a
+  # 304 response) and response headers.
+  try:
+    response = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout)
+  except urllib.error.HTTPError as e:
+    if e.code != 304:
+      raise
+    return 304, None, e.headers
+  body = response.read()
+  if not options.get('binary', False):
+    body = body.decode("utf-8") # guessing encoding
+  return response.status, body, response.headers
+
 def download(url, destination=None, force=False, options=None):
   if not destination and not force:
     raise TypeError("destination must not be None if force is False.")
@@ -265,63 +777,237 @@ def download(url, destination=None, force=False, options=None):
   # get the path to cache the file, or None if destination is None
   cache = os.path.join(cache_dir(), destination) if destination else None
 
-  if not force and os.path.exists(cache):
+  headers = {}
+  if cache:
+    body, headers = cache_lookup(cache, destination, force, options)
+    if body is not None:
+      if options.get('debug', False):
+        log("Cached: (%s, %s)" % (cache, url))
+      download_metrics.cache(url, "hit")
+      return body
+
+  start = time.monotonic()
+  try:
     if options.get('debug', False):
-      log("Cached: (%s, %s)" % (cache, url))
+      log("Downloading: %s" % url)
 
-    with open(cache, 'r') as f:
-      body = f.read()
-  else:
+    if options.get('urllib', False):
+      status, body, response_headers = urlopen(url, headers, options)
+      download_metrics.request(url, status, time.monotonic() - start, body)
+    else:
+      response = http_get(url, headers=headers)
+      status, response_headers = response.status_code, response.headers
+      if status >= 400:
+        log("Error downloading %s" % url)
+        return None
+      if status == 304:
+        body = None
+      elif not options.get('binary', False):
+        body = response.text
+      else:
+        body = response.content
+  except urllib.error.HTTPError as e:
+    download_metrics.request(url, e.code, time.monotonic() - start)
+    raise
+  if cache:
+    download_metrics.cache(url, "revalidated" if status == 304 else "miss")
+
+  if status == 304:
+    return revalidated(cache, options)
+
+  # don't allow 0-byte files
+  if (not body) or (not body.strip()):
+    return None
+
+  # the downloader can optionally parse the body as HTML
+  # and look for meta redirects. a bit expensive, so opt-in.
+  redirected = False
+  if options.get('check_redirects', False):
     try:
-      if options.get('debug', False):
-        log("Downloading: %s" % url)
+      new_url = meta_redirect(url, body)
+    except ValueError:
+      log("Error parsing source from url {0}".format(url))
+      return None
 
-      if options.get('urllib', False):
-        response = urllib.request.urlopen(url)
-        body = response.read()
-        if not options.get('binary', False):
-          body = body.decode("utf-8") # guessing encoding
-      else:
-        response = scraper.get(url)
-        if not options.get('binary', False):
-          body = response.text
-        else:
-          body = response.content
-    except scrapelib.HTTPError:
-      log("Error downloading %s" % url)
+    if new_url:
+      options.pop('check_redirects')
+      body = download(new_url, None, True, options)
+      redirected = True
+
+  # cache content to disk, without the validators if they are for a
+  # page that redirected elsewhere
+  if cache and body: save_cache(cache, url, body, status, response_headers, not redirected)
+
+  return body
+
+def meta_redirect(url, body):
+  # Returns the URL that an HTML page redirects to with a meta refresh
+  # tag, or None. Raises ValueError if the page can't be parsed.
+  html_tree = lxml.html.fromstring(body)
+  meta = html_tree.xpath("//meta[translate(@http-equiv, 'REFSH', 'refsh') = 'refresh']/@content")
+  if meta:
+    attr = meta[0]
+    wait, text = attr.split(";")
+    if text.lower().startswith("url="):
+
+      new_url = text[4:]
+      if not new_url.startswith(url): #dont print if a local redirect
+        print("Found redirect for {}, downloading {} instead..".format(url, new_url))
+      return new_url
+  return None
+
+class TokenBucket:
+  # Allows requests_per_minute requests on average (0 for no limit), in
+  # bursts of up to burst requests. Only used from within one event loop.
+  def __init__(self, requests_per_minute, burst=1):
+    self.rate = requests_per_minute / 60.0
+    self.burst = burst
+    self.tokens = burst
+    self.updated = time.monotonic()
+
+  async def acquire(self):
+    if not self.rate:
+      return # no limit
+    while True:
+      now = time.monotonic()
+      self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+      self.updated = now
+      if self.tokens >= 1:
+        self.tokens -= 1
+        return
+      await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class RetryableError(Exception):
+  def __init__(self, message, status=None):
+    super().__init__(message)
+    self.status = status
+
+def fetch_url(url, options, headers):
+  # Fetches a URL (in a worker thread) and returns the status, body
+  # (None for a 304 response) and response headers. Raises RetryableError
+  # for errors that may go away.
+  try:
+    if options.get('urllib', False):
+      return urlopen(url, headers, options, DOWNLOAD_TIMEOUT)
+    response = http_session().get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+  except urllib.error.HTTPError as e:
+    if e.code >= 500 or e.code == 429:
+      raise RetryableError(str(e), e.code)
+    raise
+  except (urllib.error.URLError, requests.ConnectionError, requests.Timeout) as e:
+    raise RetryableError(str(e))
+  if response.status_code >= 500 or response.status_code == 429:
+    raise RetryableError("%d error" % response.status_code, response.status_code)
+  response.raise_for_status()
+  if response.status_code == 304:
+    return 304, None, response.headers
+  return response.status_code, (response.content if options.get('binary', False) else response.text), response.headers
+
+def download_many(downloads, force=False, options=None, concurrency=None,
+                  host_concurrency=None, requests_per_minute=None):
+  # Downloads (url, destination) pairs concurrently and returns a list
+  # of what download(url, destination, force, options) would return for
+  # each, in the same order and with the same cache files. Errors are
+  # logged and give None rather than stopping the other downloads. The
+  # limits default to DOWNLOAD_CONCURRENCY, HOST_CONCURRENCY and
+  # HOST_REQUESTS_PER_MINUTE.
+  downloads = list(downloads)
+  if not force and any(not destination for url, destination in downloads):
+    raise TypeError("destination must not be None if force is False.")
+  return asyncio.run(download_many_async(downloads, force, options or {},
+    concurrency or DOWNLOAD_CONCURRENCY, host_concurrency or HOST_CONCURRENCY,
+    HOST_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute))
+
+async def download_many_async(downloads, force, options, concurrency, host_concurrency, requests_per_minute):
+  loop = asyncio.get_running_loop()
+  executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+  slots = asyncio.Semaphore(concurrency)
+  hosts = { } # maps host names to a semaphore and a TokenBucket
+
+  async def fetch_with_retries(url, options, headers):
+    host = urllib.parse.urlsplit(url).netloc.lower()
+    if host not in hosts:
+      hosts[host] = (asyncio.Semaphore(host_concurrency), TokenBucket(requests_per_minute))
+    host_slots, bucket = hosts[host]
+    for attempt in range(RETRY_ATTEMPTS + 1):
+      waiting = time.monotonic()
+      async with host_slots:
+        await bucket.acquire()
+        async with slots:
+          start = time.monotonic()
+          download_metrics.throttled(url, start - waiting)
+          try:
+            response = await loop.run_in_executor(executor, fetch_url, url, options, headers)
+            download_metrics.request(url, response[0], time.monotonic() - start, response[1])
+            return response
+          except RetryableError as e:
+            download_metrics.request(url, e.status, time.monotonic() - start)
+            error = e
+          except Exception as e:
+            download_metrics.request(url, getattr(getattr(e, "response", None), "status_code", getattr(e, "code", None)), time.monotonic() - start)
+            log("Error downloading %s: %s" % (url, e))
+            return None
+      if attempt < RETRY_ATTEMPTS:
+        if options.get('debug', False):
+          log("Retrying %s (%s)" % (url, error))
+        download_metrics.retry(url)
+        await asyncio.sleep(RETRY_WAIT * 2 ** attempt)
+    log("Error downloading %s: %s" % (url, error))
+    return None
+
+  async def download_one(url, destination, force, options):
+    # The same steps as download.
+    cache = os.path.join(cache_dir(), destination) if destination else None
+
+    headers = {}
+    if cache:
+      body, headers = cache_lookup(cache, destination, force, options)
+      if body is not None:
+        if options.get('debug', False):
+          log("Cached: (%s, %s)" % (cache, url))
+        download_metrics.cache(url, "hit")
+        return body
+
+    if options.get('debug', False):
+      log("Downloading: %s" % url)
+    response = await fetch_with_retries(url, options, headers)
+    if response is None:
       return None
+    status, body, response_headers = response
+    if cache:
+      download_metrics.cache(url, "revalidated" if status == 304 else "miss")
+
+    if status == 304:
+      return revalidated(cache, options)
 
     # don't allow 0-byte files
     if (not body) or (not body.strip()):
       return None
 
-    # the downloader can optionally parse the body as HTML
-    # and look for meta redirects. a bit expensive, so opt-in.
+    redirected = False
     if options.get('check_redirects', False):
       try:
-        html_tree = lxml.html.fromstring(body)
+        new_url = meta_redirect(url, body)
       except ValueError:
         log("Error parsing source from url {0}".format(url))
         return None
 
-      meta = html_tree.xpath("//meta[translate(@http-equiv, 'REFSH', 'refsh') = 'refresh']/@content")
-      if meta:
-        attr = meta[0]
-        wait, text = attr.split(";")
-        if text.lower().startswith("url="):
-
-          new_url = text[4:]
-          if not new_url.startswith(url): #dont print if a local redirect
-            print("Found redirect for {}, downloading {} instead..".format(url, new_url))
-
-          options.pop('check_redirects')
-          body = download(new_url, None, True, options)
+      if new_url:
+        options = dict(options)
+        options.pop('check_redirects')
+        body = await download_one(new_url, None, True, options)
+        redirected = True
 
     # cache content to disk
-    if cache: write(body, cache)
+    if cache and body: save_cache(cache, url, body, status, response_headers, not redirected)
 
+    return body
 
-  return body
+  try:
+    return await asyncio.gather(*(download_one(url, destination, force, dict(options))
+                                  for url, destination in downloads))
+  finally:
+    executor.shutdown(wait=False)
 
 from pytz import timezone
 eastern_time_zone = timezone('US/Eastern')
@@ -340,6 +1026,67 @@ def write(content, destination):
   f.write(content)
   f.close()
 
+def write_json(data, destination, indent=None):
+  # Writes the same bytes as json.dumps(data, indent=indent) but encodes
+  # and writes one top-level record at a time so that the JSON for the
+  # whole file is never held in memory at once.
+  mkdir_p(os.path.dirname(destination))
+  encoder = json.JSONEncoder(default=format_datetime, indent=indent)
+
+  if isinstance(data, list):
+    items = ((None, value) for value in data)
+    start, end = "[", "]"
+  elif isinstance(data, dict) and all(isinstance(key, str) for key in data):
+    items = iter(data.items())
+    start, end = "{", "}"
+  else:
+    items = None
+
+  with open(destination, 'w') as f:
+    if items is None or not data:
+      for chunk in encoder.iterencode(data):
+        f.write(chunk)
+      return
+
+    # Match the separators and indentation that json uses.
+    if indent is None:
+      item_separator, newline = ", ", ""
+    else:
+      item_separator, newline = ",", "\n" + (" " * indent if isinstance(indent, int) else indent)
+
+    f.write(start)
+    for i, (key, value) in enumerate(items):
+      f.write((item_separator if i > 0 else "") + newline)
+      if key is not None:
+        f.write(encoder.encode(key) + ": ")
+      # Nested lines get one more level of indentation. Newlines only occur
+      # between tokens, since they are escaped within strings.
+      f.write(encoder.encode(value).replace("\n", newline))
+    f.write(newline[:1] + end)
+
+def write_ndjson(data, destination, record_key):
+  # Writes newline-delimited JSON, one record per line, and a sidecar
+  # index file listing each record's key, byte offset, and byte length,
+  # so that a single record can be read with a range request. The
+  # records of a mapping are written as single-key objects and keyed
+  # by their key. Otherwise record_key(record) gives each record's key.
+  mkdir_p(os.path.dirname(destination))
+  if isinstance(data, dict):
+    records = (({ key: value }, key) for key, value in data.items())
+  else:
+    records = ((record, record_key(record)) for record in data)
+
+  index = []
+  offset = 0
+  with open(destination, 'wb') as f:
+    for record, key in records:
+      line = (json.dumps(record, default=format_datetime, separators=(',', ':')) + "\n").encode("utf8")
+      f.write(line)
+      index.append([key, offset, len(line)])
+      offset += len(line)
+
+  write_json(index, destination + ".index.json")
+
 # mkdir -p in python, from:
 # http://stackoverflow.com/questions/600268/mkdir-p-functionality-in-python
 def mkdir_p(path):
@@ -424,6 +1171,32 @@ def yaml_load(path, use_cache=True):
 
     return data
 
+def yaml_iter(path):
+    # Yields the items of a YAML file whose top level is a list one at a
+    # time, so that a large file can be processed without loading all of
+    # it into memory. The items are the same as those from yaml_load but
+    # the pickle cache isn't used.
+    import yaml.composer
+
+    # rtyaml's Loader may be the C-accelerated loader, which can only
+    # compose whole documents. Composing the items of the top-level list
+    # one by one uses the pure-Python composer on top of its events.
+    class ItemLoader(rtyaml.Loader, yaml.composer.Composer):
+        pass
+
+    with open(path) as f:
+        loader = ItemLoader(f)
+        loader.anchors = {}
+        try:
+            loader.get_event() # StreamStartEvent
+            loader.get_event() # DocumentStartEvent
+            if not isinstance(loader.get_event(), yaml.SequenceStartEvent):
+                raise ValueError(path + " is not a list.")
+            while not loader.check_event(yaml.SequenceEndEvent):
+                yield loader.construct_document(loader.compose_node(None, None))
+        finally:
+            loader.dispose()
+
 def yaml_dump(data, path):
     # write file
     rtyaml.dump(data, open(path, "w"))
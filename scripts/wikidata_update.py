@@ -1,9 +1,8 @@
 #!/usr/bin/python
 
 import re
-import urllib.request
-import json
 from urllib.parse import quote, unquote
+import utils
 from utils import load_data, save_data
 from SPARQLWrapper import SPARQLWrapper, JSON
 
@@ -13,7 +12,7 @@ def get_wikidata_ids(legislators):
         if not p["id"].get("wikidata") and p["id"].get("wikipedia"):
             w = quote(p["id"]["wikipedia"].replace(" ", "_"))
             query_url = f"https://en.wikipedia.org/w/api.php?action=query&prop=pageprops&titles={w}&format=json"
-            response = json.load(urllib.request.urlopen(query_url))
+            response = utils.http_get(query_url).json()
             wikidata_id = list(response["query"]["pages"].values())[0]["pageprops"]["wikibase_item"]
             p["id"]["wikidata"] = wikidata_id
 
@@ -3,23 +3,36 @@
 # ID field for matching Members of Congress, and for pages
 # using the CongLinks template also updates a variety of
 # other ID as found in the template.
-
-import lxml.etree, re, urllib.request, urllib.parse, urllib.error
+#
+# Pages are fetched through the MediaWiki API in batches of
+# API_BATCH_SIZE titles, a few batches at a time. Page text is cached
+# by revision ID, so only pages that changed since the last run are
+# fetched again, and the templates are parsed in a process pool.
+
+import lxml.etree, re, urllib.parse, json
+import concurrent.futures, multiprocessing
 import utils, os.path
 
-def run():
+API_URL = "https://en.wikipedia.org/w/api.php"
+
+# The API accepts up to 50 titles or revision IDs per request.
+API_BATCH_SIZE = 50
+API_CONCURRENCY = 2
+API_REQUESTS_PER_MINUTE = 120
+
+# Field mapping. And which fields should be turned into integers.
+# See https://en.wikipedia.org/wiki/Template:CongLinks for what's possibly available.
+fieldmap = {
+	"congbio": "bioguide",
+	#"fec": "fec", # handled specially...
+	"govtrack": "govtrack", # for sanity checking since we definitely have this already (I caught some Wikipedia errors)
+	"opensecrets": "opensecrets",
+	"votesmart": "votesmart",
+	"cspan": "cspan",
+}
+int_fields = ("govtrack", "votesmart", "cspan")
 
-	# Field mapping. And which fields should be turned into integers.
-	# See https://en.wikipedia.org/wiki/Template:CongLinks for what's possibly available.
-	fieldmap = {
-		"congbio": "bioguide",
-		#"fec": "fec", # handled specially...
-		"govtrack": "govtrack", # for sanity checking since we definitely have this already (I caught some Wikipedia errors)
-		"opensecrets": "opensecrets",
-		"votesmart": "votesmart",
-		"cspan": "cspan",
-	}
-	int_fields = ("govtrack", "votesmart", "cspan")
+def run():
 
 	# default to not caching
 	cache = utils.flags().get('cache', False)
@@ -73,54 +86,16 @@ def run():
 	matching_pages = [p for p in matching_pages if ":" not in p]
 
 	# Load each page's content and parse the template.
-	for p in sorted(matching_pages):
-		if " campaign" in p: continue
-		if " (surname)" in p: continue
-		if "career of " in p: continue
-		if "for Congress" in p: continue
-		if p.startswith("List of "): continue
-		if p in ("New York in the American Civil War", "Upper Marlboro, Maryland"): continue
-
-		# Query the Wikipedia API to get the raw page content in XML,
-		# and then use XPath to get the raw page text.
-		url = "http://en.wikipedia.org/w/api.php?action=query&titles=" + urllib.parse.quote(p.encode("utf8")) + "&export&exportnowrap"
-		cache_path = "legislators/wikipedia/pages/" + p
-		dom = lxml.etree.fromstring(utils.download(url, cache_path, not cache))
-		page_content = dom.xpath("string(mw:page/mw:revision/mw:text)", namespaces={ "mw": "http://www.mediawiki.org/xml/export-0.8/" })
-
-		# Build a dict for the IDs that we want to insert into our files.
-		new_ids = {
-			"wikipedia": p # Wikipedia page name, with spaces for spaces (not underscores)
-		}
-
-		if "CongLinks" in page_content:
-			# Parse the key/val pairs in the template.
-			m = re.search(r"\{\{\s*CongLinks\s+([^}]*\S)\s*\}\}", page_content)
-			if not m: continue # no template?
-			for arg in m.group(1).split("|"):
-				if "=" not in arg: continue
-				key, val = arg.split("=", 1)
-				key = key.strip()
-				val = val.strip()
-				if val and key in fieldmap:
-					try:
-						if fieldmap[key] in int_fields: val = int(val)
-					except ValueError:
-						print("invalid value", key, val)
-						continue
-
-					if key == "opensecrets": val = val.replace("&newMem=Y", "").replace("&newmem=Y", "").replace("&cycle=2004", "").upper()
-					new_ids[fieldmap[key]] = val
-
-			if "bioguide" not in new_ids: continue
-			new_ids["bioguide"] = new_ids["bioguide"].upper() # hmm
-			bioguide = new_ids["bioguide"]
-
-		else:
-			m = re.search(r"\{\{\s*CongBio\s*\|\s*(\w+)\s*\}\}", page_content)
-			if not m: continue # no template?
-			bioguide = m.group(1).upper()
+	matching_pages = [p for p in matching_pages if not skip_page(p)]
+	page_contents = get_page_contents(matching_pages)
+	context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+	with concurrent.futures.ProcessPoolExecutor(max_workers=multiprocessing.cpu_count(), mp_context=context) as executor:
+		parsed = list(executor.map(parse_page, sorted(page_contents), [page_contents[p] for p in sorted(page_contents)], chunksize=100))
 
+	for p, bioguide, new_ids, warnings in parsed:
+		for warning in warnings:
+			print(*warning)
+		if not bioguide: continue # no template?
 
 		if not bioguide in bioguides:
 			print("Member not found: " + bioguide, p, "(Might have been a delegate to the Constitutional Convention.)")
@@ -143,5 +118,128 @@ def run():
 	utils.save_data(y1, "legislators-current.yaml")
 	utils.save_data(y2, "legislators-historical.yaml")
 
+def skip_page(p):
+	if " campaign" in p: return True
+	if " (surname)" in p: return True
+	if "career of " in p: return True
+	if "for Congress" in p: return True
+	if p.startswith("List of "): return True
+	if p in ("New York in the American Civil War", "Upper Marlboro, Maryland"): return True
+	return False
+
+def api_urls(params, key, values):
+	# Returns the API URLs that pass the values for the key in batches.
+	values = list(values)
+	return [
+		API_URL + "?" + urllib.parse.urlencode(dict(params, **{ key: "|".join(values[i:i + API_BATCH_SIZE]) }))
+		for i in range(0, len(values), API_BATCH_SIZE)
+	]
+
+def api_query(urls):
+	# Fetches API URLs concurrently and returns the pages in all of the
+	# responses. When the API doesn't fit a batch's results in one
+	# response (page content is limited in size), the response has
+	# "continue" parameters, and the query is made again with them until
+	# there are none. A page may then be returned once per response.
+	pages = []
+	queries = [(url, url) for url in urls] # the original URL and the one to fetch
+	while queries:
+		bodies = utils.download_many([(url, None) for base, url in queries], True,
+			concurrency=API_CONCURRENCY, host_concurrency=API_CONCURRENCY,
+			requests_per_minute=API_REQUESTS_PER_MINUTE)
+		next_queries = []
+		for (base, url), body in zip(queries, bodies):
+			if body is None:
+				raise Exception("Wikipedia API request failed: " + url)
+			response = json.loads(body)
+			pages.extend(response.get("query", {}).get("pages", []))
+			if "continue" in response:
+				next_queries.append((base, base + "&" + urllib.parse.urlencode(response["continue"])))
+		queries = next_queries
+	return pages
+
+def revision_cache_path(revid):
+	return os.path.join(utils.cache_dir(), "legislators/wikipedia/revisions/%d" % revid)
+
+def read_revision(revid):
+	# Returns the cached text of a revision, or None.
+	path = revision_cache_path(revid)
+	data = utils.read_cached_data(path, utils.read_cache_meta(path))
+	if data is None:
+		return None
+	return utils.read_cache(path, {}, data)
+
+def get_page_contents(titles):
+	# Returns a dict mapping the titles of pages that exist to their
+	# text. First the latest revision ID of each page is looked up, and
+	# then the text of the revisions that aren't cached is fetched.
+	params = { "action": "query", "format": "json", "formatversion": "2" }
+	print("Getting the latest revisions of %d pages..." % len(titles))
+	revids = { }
+	for page in api_query(api_urls(dict(params, prop="info"), "titles", titles)):
+		if "lastrevid" in page:
+			revids[page["title"]] = page["lastrevid"]
+
+	contents = { }
+	for title, revid in revids.items():
+		contents[title] = read_revision(revid)
+
+	changed = [revids[title] for title in sorted(revids) if contents[title] is None]
+	print("Getting %d changed pages..." % len(changed))
+	urls = api_urls(dict(params, prop="revisions", rvprop="ids|content", rvslots="main"), "revids", (str(revid) for revid in changed))
+	for page in api_query(urls):
+		for revision in page.get("revisions", []):
+			text = revision.get("slots", {}).get("main", {}).get("content")
+			if text is None: continue # in a later response, or hidden
+			utils.save_cache(revision_cache_path(revision["revid"]), API_URL + "?oldid=%d" % revision["revid"], text, 200, {}, False)
+			contents[page["title"]] = text
+
+	for title in sorted(revids):
+		if contents[title] is None:
+			print("Wikipedia API did not return the text of revision %d of %s." % (revids[title], title))
+
+	return { title: text for title, text in contents.items() if text is not None }
+
+def parse_page(p, page_content):
+	# Runs in a worker process. Returns the page title, the bioguide ID in
+	# its template (or None if it has none), the IDs to set, and any
+	# warnings to print.
+
+	# Build a dict for the IDs that we want to insert into our files.
+	new_ids = {
+		"wikipedia": p # Wikipedia page name, with spaces for spaces (not underscores)
+	}
+	warnings = []
+
+	if "CongLinks" in page_content:
+		# Parse the key/val pairs in the template.
+		m = re.search(r"\{\{\s*CongLinks\s+([^}]*\S)\s*\}\}", page_content)
+		if not m: return p, None, None, warnings # no template?
+		for arg in m.group(1).split("|"):
+			if "=" not in arg: continue
+			key, val = arg.split("=", 1)
+			key = key.strip()
+			val = val.strip()
+			if val and key in fieldmap:
+				try:
+					if fieldmap[key] in int_fields: val = int(val)
+				except ValueError:
+					warnings.append(("invalid value", key, val))
+					continue
+
+				if key == "opensecrets": val = val.replace("&newMem=Y", "").replace("&newmem=Y", "").replace("&cycle=2004", "").upper()
+				new_ids[fieldmap[key]] = val
+
+		if "bioguide" not in new_ids: return p, None, None, warnings
+		new_ids["bioguide"] = new_ids["bioguide"].upper() # hmm
+		bioguide = new_ids["bioguide"]
+
+	else:
+		m = re.search(r"\{\{\s*CongBio\s*\|\s*(\w+)\s*\}\}", page_content)
+		if not m: return p, None, None, warnings # no template?
+		bioguide = m.group(1).upper()
+
+	return p, bioguide, new_ids, warnings
+
 if __name__ == '__main__':
   run()
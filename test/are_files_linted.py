@@ -1,15 +1,53 @@
 # Check that each YAML file has been linted.
+#
+# The SHA-256 hashes of files that are known to be linted are kept in
+# .lint-cache.json so that unchanged files aren't round-tripped again
+# (which takes a while for the large files). The cache is only used
+# with the same versions of rtyaml and PyYAML, since they determine the
+# canonical form. The other files are checked in parallel.
 
+import concurrent.futures
 import difflib
 import glob
+import hashlib
+import importlib.metadata
 import io
+import json
+import multiprocessing
 import sys
 
 import rtyaml
+import yaml
 
-ok = True
+CACHE_FILE = ".lint-cache.json"
 
-for fn in glob.glob("*.yaml"):
+def cache_key():
+  try:
+    rtyaml_version = importlib.metadata.version("rtyaml")
+  except importlib.metadata.PackageNotFoundError:
+    rtyaml_version = "?"
+  return "rtyaml {} PyYAML {}".format(rtyaml_version, yaml.__version__)
+
+def load_cache():
+  try:
+    with open(CACHE_FILE) as f:
+      cache = json.load(f)
+  except (OSError, ValueError):
+    return set()
+  if not isinstance(cache, dict) or cache.get("key") != cache_key():
+    return set()
+  return set(cache.get("hashes", []))
+
+def save_cache(hashes):
+  try:
+    with open(CACHE_FILE, "w") as f:
+      json.dump({ "key": cache_key(), "hashes": sorted(hashes) }, f, indent=2)
+  except OSError:
+    pass # the cache is only an optimization
+
+def check_file(fn):
+  # Returns a diff of the file against its linted form, or None if it
+  # is already linted.
   with open(fn) as f:
     body = f.read()
 
@@ -26,12 +64,43 @@ for fn in glob.glob("*.yaml"):
   # Check that the file round-trips to the same bytes,
   # except don't worry about trailing newlines because
   # editors mess with the last line line ending.
-  if buf.rstrip() != body.rstrip():
+  if buf.rstrip() == body.rstrip():
+    return None
+
+  # Make a diff only for files that need to be linted.
+  return list(difflib.unified_diff(body.split("\n"), buf.split("\n"), fromfile='in repository', tofile='after linting', lineterm=''))
+
+def run():
+  known_linted = load_cache()
+  hashes = { }
+  for fn in sorted(glob.glob("*.yaml")):
+    with open(fn, "rb") as f:
+      hashes[fn] = hashlib.sha256(f.read()).hexdigest()
+  files = [fn for fn in hashes if hashes[fn] not in known_linted]
+
+  if len(files) > 1:
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(len(files), multiprocessing.cpu_count()), mp_context=context) as executor:
+      diffs = dict(zip(files, executor.map(check_file, files)))
+  else:
+    diffs = { fn: check_file(fn) for fn in files }
+
+  ok = True
+  for fn in files:
+    if diffs[fn] is None:
+      continue
     ok = False
     print(fn, "needs to be linted:")
 
     # Show a diff.
-    for line in difflib.unified_diff(body.split("\n"), buf.split("\n"), fromfile='in repository', tofile='after linting', lineterm=''):
+    for line in diffs[fn]:
       print(line)
 
-sys.exit(0 if ok else 1)
+  # Remember the files that are linted now, dropping hashes of old
+  # versions of files.
+  save_cache({ hashes[fn] for fn in hashes if diffs.get(fn) is None })
+
+  sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+  run()
@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+# Times the checks that validate.py runs on each legislator against the
+# checks in validate.py as of an earlier git revision, and compares the
+# problems they report.
+#
+# python test/benchmark_validate.py REVISION [--file=legislators-historical.yaml] [--repeat=5]
+#
+# The file defaults to both legislators files. The earlier validate.py
+# must be one that collects its output in messages (see run_check).
+#
+# python test/benchmark_validate.py REVISION --whole [--repeat=5]
+#
+# ... times whole runs of validate.py as of the revision (with the
+# scripts as of the revision) and of the working tree, as separate
+# processes on the working tree's data files, and compares their output.
+# This works with any earlier revision, including the original
+# validate.py from before run_check.
+
+import glob
+import importlib.util
+import io
+import os, sys
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(0, "scripts")
+sys.path.insert(0, "test")
+import utils
+import validate
+
+def load_revision(revision):
+  # Import validate.py as of the revision as a separate module.
+  source = subprocess.check_output(["git", "show", revision + ":test/validate.py"])
+  with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as f:
+    f.write(source)
+  try:
+    spec = importlib.util.spec_from_file_location("validate_at_revision", f.name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+  finally:
+    os.unlink(f.name)
+  return module
+
+def benchmark(module, fn, repeat):
+  # Returns the time of the first run, the best time, and the messages.
+  module.data_files[fn] = validate.load(fn)
+  current = "current" in fn
+  times = []
+  for i in range(repeat):
+    start = time.perf_counter()
+    messages = module.run_check(module.check_legislators_file, fn, current)[0]
+    times.append(time.perf_counter() - start)
+  return times[0], min(times), messages
+
+def extract_revision(revision, directory):
+  # Writes test/ and scripts/ as of the revision to the directory, and
+  # links the working tree's data files into it.
+  archive = subprocess.check_output(["git", "archive", revision, "test", "scripts"])
+  with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+    tar.extractall(directory, filter="data")
+  for fn in glob.glob("*.yaml"):
+    os.symlink(os.path.abspath(fn), os.path.join(directory, fn))
+
+def benchmark_whole(directory, repeat):
+  # Returns the time of the first run, the best time, and the output of
+  # validate.py run in the directory.
+  times = []
+  for i in range(repeat):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "test/validate.py"], cwd=directory,
+      stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    times.append(time.perf_counter() - start)
+  return times[0], min(times), result.stdout.decode("utf8").splitlines()
+
+def run_whole(revision, repeat):
+  directory = tempfile.mkdtemp()
+  try:
+    extract_revision(revision, directory)
+    before_first, before_best, before_output = benchmark_whole(directory, repeat)
+  finally:
+    shutil.rmtree(directory)
+  after_first, after_best, after_output = benchmark_whole(".", repeat)
+  print("validate.py:")
+  print("  {:<12} first run {:.3f}s, best of {} {:.3f}s".format(revision, before_first, repeat, before_best))
+  print("  {:<12} first run {:.3f}s, best of {} {:.3f}s".format("working tree", after_first, repeat, after_best))
+  print("  {:.1f}x faster".format(before_best / after_best))
+  if before_output == after_output:
+    return True
+  print("  The output is different: {} lines only before, {} only after.".format(
+    len(set(before_output) - set(after_output)), len(set(after_output) - set(before_output))))
+  for a, b in zip(before_output, after_output):
+    if a != b:
+      print("    " + a)
+      print("    " + b)
+      break
+  return False
+
+def run():
+  if len(utils.args()) != 1:
+    print("Usage: python test/benchmark_validate.py REVISION [--file=FILE] [--repeat=N] [--whole]")
+    sys.exit(1)
+  revision = utils.args()[0]
+  flags = utils.flags()
+  files = [flags["file"]] if "file" in flags else ["legislators-historical.yaml", "legislators-current.yaml"]
+  repeat = int(flags.get("repeat", 5))
+
+  if flags.get("whole"):
+    sys.exit(0 if run_whole(revision, repeat) else 1)
+
+  before = load_revision(revision)
+  same = True
+  for fn in files:
+    print("{} ({} entries):".format(fn, len(validate.load(fn))))
+    before_first, before_best, before_messages = benchmark(before, fn, repeat)
+    after_first, after_best, after_messages = benchmark(validate, fn, repeat)
+    print("  {:<12} first run {:.3f}s, best of {} {:.3f}s".format(revision, before_first, repeat, before_best))
+    print("  {:<12} first run {:.3f}s, best of {} {:.3f}s".format("working tree", after_first, repeat, after_best))
+    print("  {:.1f}x faster".format(before_best / after_best))
+    if before_messages != after_messages:
+      same = False
+      print("  The output is different:")
+      for (_, a), (_, b) in zip(before_messages, after_messages):
+        if a != b:
+          print("    " + a.rstrip())
+          print("    " + b.rstrip())
+          break
+      else:
+        print("    {} messages before, {} after.".format(len(before_messages), len(after_messages)))
+  sys.exit(0 if same else 1)
+
+if __name__ == "__main__":
+  run()
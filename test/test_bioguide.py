@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Unit tests for bioguide.py.
+Run from root `congress-legislators` dir:
+`python test/test_bioguide.py`
+"""
+import io
+import json
+import sys
+import unittest
+import zipfile
+
+sys.path.insert(0, "scripts")
+import bioguide
+
+
+def profile(bioguide_id, text, **fields):
+    return json.dumps(dict(usCongressBioId=bioguide_id, profileText=text, **fields))
+
+
+class TestBulkData(unittest.TestCase):
+    def setUp(self):
+        self.zip_file = io.BytesIO()
+        with zipfile.ZipFile(self.zip_file, "w") as zf:
+            zf.writestr("A000001.json", profile(
+                "A000001", "ADAMS, Ann, a Representative from Ohio; born in Akron,\nOhio, March 4, 1950; lawyer.",
+                birthDate="1950", relationship=[{
+                    "relationshipType": "Daughter",
+                    "relatedTo": {"givenName": "Arch", "middleName": "Alfred", "familyName": "Moore", "honorificSuffix": "Jr."},
+                }]))
+            zf.writestr("B000002.json", profile(
+                "B000002", "BROWN, Bob, a Senator from Iowa; born in Ames, Iowa, June 1, 1900.",
+                birthDate="1901-06-01"))
+            zf.writestr("C000003.json", profile("C000003", "born January 1, 1800"))
+            zf.writestr("D000004.json", json.dumps({"usCongressBioId": "D000004"}))
+            zf.writestr("README.txt", "not a profile")
+
+    def parse(self, bioguides, relationships=False):
+        return [result for profiles in bioguide.read_profiles(self.zip_file, bioguides)
+                for result in bioguide.parse_profiles(profiles, relationships)]
+
+    def test_read_profiles(self):
+        profiles_per_task = bioguide.PROFILES_PER_TASK
+        bioguide.PROFILES_PER_TASK = 2
+        try:
+            chunks = list(bioguide.read_profiles(self.zip_file, {"A000001", "B000002", "D000004"}))
+        finally:
+            bioguide.PROFILES_PER_TASK = profiles_per_task
+        self.assertEqual([[bioguide_id for bioguide_id, data in chunk] for chunk in chunks],
+                         [["A000001", "B000002"], ["D000004"]])
+
+    def test_parse_profiles(self):
+        results = self.parse({"A000001", "B000002", "D000004"})
+        self.assertEqual([result[:3] for result in results], [
+            ("A000001", "1950-03-04", None),
+            ("B000002", None, None), # the metadata disagrees
+        ])
+        self.assertIsNone(results[0][3])
+        self.assertIn("doesn't match", results[1][3])
+
+    def test_parse_all_profiles(self):
+        # Chunks are read only a few at a time ahead of the results.
+        read = []
+        def chunks():
+            for i in range(1000):
+                read.append(i)
+                yield [("C%06d" % i, profile("C%06d" % i, "born January %d, 1800" % (i % 28 + 1)))]
+        results = bioguide.parse_all_profiles(chunks(), False)
+        next(results)
+        self.assertLess(len(read), 1000)
+        self.assertEqual(len(list(results)), 999)
+
+    def test_relationships(self):
+        results = self.parse({"A000001"}, relationships=True)
+        self.assertEqual(results[0][2], [{"name": "Arch Alfred Moore Jr.", "relation": "daughter"}])
+
+    def test_parse_birthday(self):
+        self.assertEqual(bioguide.parse_birthday("born in Brooklyn, N.Y., January, 20, 1949; lawyer"), ("1949-01-20", None))
+        self.assertEqual(bioguide.parse_birthday("born in Rowan County, N.C., in 1776; lawyer"), ("UNKNOWN", None))
+        birthday, problem = bioguide.parse_birthday("a Representative from Ohio")
+        self.assertIsNone(birthday)
+        self.assertIn("NO BIRTHDAY", problem)
+
+
+if __name__ == "__main__":
+    unittest.main()
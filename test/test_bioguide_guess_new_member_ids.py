@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Unit tests for bioguide_guess_new_member_ids.py.
+Run from root `congress-legislators` dir:
+`python test/test_bioguide_guess_new_member_ids.py`
+"""
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.parse
+
+sys.path.insert(0, "scripts")
+import bioguide_guess_new_member_ids as guess
+import utils
+
+# Pages exist for A000001-A000020 and A000024-A000300 (a gap shorter
+# than PROBE_WINDOW) and for B000001-B000010.
+PAGES = {"A%06d" % num for num in list(range(1, 21)) + list(range(24, 301))}
+PAGES |= {"B%06d" % num for num in range(1, 11)}
+
+# IDs whose requests fail with a 500 error.
+FAILING = set()
+
+
+class Bioguide(http.server.BaseHTTPRequestHandler):
+    # Serves /?index=BIOGUIDE like bioguide.congress.gov's biodisplay.pl.
+    def do_GET(self):
+        bioguide = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)["index"][0]
+        self.server.probed.append(bioguide)
+        if bioguide in FAILING:
+            body, status = "server error", 500
+        elif bioguide in PAGES:
+            body, status = "<html><head><title>%s</title></head><body><p>page</p></body></html>" % bioguide, 200
+        else:
+            body, status = "not found", 404
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFindNewPages(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache_dir = utils.cache_dir
+        utils.cache_dir = lambda: os.path.join(self.dir.name, "cache")
+        self.download_metrics = utils.download_metrics
+        utils.download_metrics = utils.DownloadMetrics()
+        utils.download_metrics.reporting = True # don't print a summary at exit
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Bioguide)
+        self.server.probed = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.page_url = guess.PAGE_URL
+        guess.PAGE_URL = "http://127.0.0.1:%d/?index=%%s" % self.server.server_address[1]
+        self.requests_per_minute = guess.PROBE_REQUESTS_PER_MINUTE
+        guess.PROBE_REQUESTS_PER_MINUTE = 0
+        self.retry_wait = utils.RETRY_WAIT
+        utils.RETRY_WAIT = 0
+
+    def tearDown(self):
+        guess.PAGE_URL = self.page_url
+        guess.PROBE_REQUESTS_PER_MINUTE = self.requests_per_minute
+        utils.RETRY_WAIT = self.retry_wait
+        FAILING.clear()
+        self.server.shutdown()
+        self.server.server_close()
+        utils.cache_dir = self.cache_dir
+        utils.download_metrics = self.download_metrics
+        self.dir.cleanup()
+
+    def test_find_new_pages(self):
+        pages = guess.find_new_pages({"A": 10, "B": 10, "C": 0})
+        expected = {"A%06d" % num for num in list(range(11, 21)) + list(range(24, 301))}
+        self.assertEqual(set(pages), expected)
+        self.assertEqual(pages["A000300"].cssselect("title")[0].text, "A000300")
+
+        # Each ID is probed once, and the IDs past the last page only
+        # as far as the search needs to.
+        probed = self.server.probed
+        self.assertEqual(len(probed), len(set(probed)))
+        self.assertLess(len([bioguide for bioguide in probed if bioguide not in PAGES]), 100)
+
+        # Found pages are cached for bioguide.py.
+        cache = os.path.join(utils.cache_dir(), "legislators/bioguide/A000300.html")
+        self.assertIn("A000300", utils.read_cache(cache, {}))
+
+    def test_failed_request(self):
+        # A failed request stops the search instead of being taken as a
+        # missing page that would end the search early.
+        FAILING.add("A000016")
+        with self.assertRaises(Exception):
+            guess.find_new_pages({"A": 10})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Unit tests for house_history.py.
+Run from root `congress-legislators` dir:
+`python test/test_house_history.py`
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, "scripts")
+import house_history
+
+
+class TestProber(unittest.TestCase):
+    def setUp(self):
+        # Pages exist for IDs 100-130 and 150-5000 except for a gap of
+        # fewer than PROBE_WINDOW IDs at 400-420.
+        self.pages = set(range(100, 131)) | set(range(150, 5001))
+        self.pages -= set(range(400, 421))
+        self.probed = []
+        self.failing = set()
+        self.probe_house_history_id = house_history.probe_house_history_id
+        house_history.probe_house_history_id = self.probe
+        self.dir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.dir.name, "probe.json")
+
+    def tearDown(self):
+        house_history.probe_house_history_id = self.probe_house_history_id
+        self.dir.cleanup()
+
+    def probe(self, id):
+        self.probed.append(id)
+        if id in self.failing:
+            raise Exception("503 Server Error")
+        return (id in self.pages), ("B%06d" % id if id in self.pages else None)
+
+    def test_find_frontier(self):
+        prober = house_history.Prober()
+        self.assertEqual(prober.find_frontier(100), 5000)
+        # Far fewer IDs are probed than a scan to the frontier would.
+        self.assertLess(len(self.probed), 1000)
+        self.assertEqual(len(self.probed), len(set(self.probed)))
+
+    def test_no_pages_past_start(self):
+        self.assertEqual(house_history.Prober().find_frontier(5000), 5000)
+
+    def test_probe(self):
+        prober = house_history.Prober()
+        prober.probe([129, 130, 131])
+        self.assertEqual(prober.pages, {129: "B000129", 130: "B000130"})
+        self.assertEqual(prober.missing, {131})
+
+    def test_checkpoint(self):
+        prober = house_history.Prober(self.checkpoint)
+        prober.probe(range(100, 200))
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+        # A new prober resumes without probing the same IDs again.
+        self.probed = []
+        prober = house_history.Prober(self.checkpoint)
+        prober.probe(range(100, 250))
+        self.assertEqual(self.probed, list(range(200, 250)))
+        self.assertEqual(prober.pages[150], "B000150")
+        self.assertIn(140, prober.missing)
+
+        prober.finish()
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_failed_probe(self):
+        # A failed request stops the run without recording the ID as
+        # missing, and the IDs probed before it are kept for resuming.
+        self.failing = {160}
+        prober = house_history.Prober(self.checkpoint)
+        with self.assertRaises(Exception):
+            prober.probe(range(100, 200))
+        self.assertNotIn(160, prober.missing)
+        self.assertNotIn(160, prober.pages)
+
+        self.failing = set()
+        self.probed = []
+        prober = house_history.Prober(self.checkpoint)
+        self.assertIn(140, prober.missing)
+        prober.probe(range(100, 200))
+        self.assertIn(160, self.probed)
+        self.assertEqual(prober.pages[160], "B000160")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Unit tests for http_fixtures.py.
+Run from root `congress-legislators` dir:
+`python test/test_http_fixtures.py`
+"""
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+import requests
+
+sys.path.insert(0, "scripts")
+import http_fixtures
+import utils
+
+
+class Origin(http.server.BaseHTTPRequestHandler):
+    # Serves /page/NAME, /redirect (to /page/target, relatively) and
+    # /etag (which answers If-None-Match).
+    def do_GET(self):
+        if self.path.startswith("/page/"):
+            self.respond(200, "page " + self.path[6:])
+        elif self.path == "/redirect":
+            self.respond(302, "", {"Location": "/page/target"})
+        elif self.path == "/etag" and self.headers.get("If-None-Match") == '"v1"':
+            self.respond(304, "")
+        elif self.path == "/etag":
+            self.respond(200, "page etag", {"ETag": '"v1"'})
+        else:
+            self.respond(404, "not found")
+
+    def respond(self, status, body, headers={}):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.fixtures = os.path.join(self.dir.name, "fixtures")
+        self.cache_dir = utils.cache_dir
+        utils.cache_dir = lambda: os.path.join(self.dir.name, "cache")
+        self.requests_per_minute = utils.HOST_REQUESTS_PER_MINUTE
+        utils.HOST_REQUESTS_PER_MINUTE = 0
+        self.download_metrics = utils.download_metrics
+        utils.download_metrics = utils.DownloadMetrics()
+        utils.download_metrics.reporting = True # don't print a summary at exit
+        self.origin = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+        self.base = "http://127.0.0.1:%d" % self.origin.server_address[1]
+        threading.Thread(target=self.origin.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        http_fixtures.uninstall()
+        self.origin.shutdown()
+        self.origin.server_close()
+        utils.cache_dir = self.cache_dir
+        utils.HOST_REQUESTS_PER_MINUTE = self.requests_per_minute
+        utils.download_metrics = self.download_metrics
+        self.dir.cleanup()
+
+    def fetch_all(self):
+        # Fetches pages in each of the ways that the scripts do.
+        response = requests.get(self.base + "/redirect")
+        urllib_response = urllib.request.urlopen(self.base + "/redirect")
+        try:
+            urllib.request.urlopen(self.base + "/missing")
+            missing = None
+        except urllib.error.HTTPError as e:
+            missing = e.code
+        return [
+            response.text, response.url, [r.status_code for r in response.history],
+            urllib_response.read(), urllib_response.geturl(), missing,
+            utils.download(self.base + "/page/a", "a.html", True),
+            utils.download_many([(self.base + "/page/b", "b.html"), (self.base + "/etag", "etag.html")], True),
+        ]
+
+    def test_record_replay(self):
+        http_fixtures.install(record=self.fixtures)
+        recorded = self.fetch_all()
+        self.assertEqual(recorded, [
+            "page target", self.base + "/page/target", [302],
+            b"page target", self.base + "/page/target", 404,
+            "page a", ["page b", "page etag"],
+        ])
+
+        # Replaying gives the same results without the origin server.
+        self.origin.shutdown()
+        self.origin.server_close()
+        http_fixtures.install(replay=self.fixtures)
+        self.assertEqual(self.fetch_all(), recorded)
+
+        # The stand-in server answers conditional requests.
+        response = requests.get(self.base + "/etag", headers={"If-None-Match": '"v1"'})
+        self.assertEqual((response.status_code, response.text), (304, ""))
+        self.assertEqual(requests.get(self.base + "/unknown").status_code, 404)
+
+    def test_conditional_requests_are_recorded_in_full(self):
+        http_fixtures.install(record=self.fixtures)
+        response = requests.get(self.base + "/etag", headers={"If-None-Match": '"v1"'})
+        self.assertEqual((response.status_code, response.text), (200, "page etag"))
+
+    def test_latency(self):
+        http_fixtures.install(record=self.fixtures)
+        requests.get(self.base + "/page/a")
+        http_fixtures.install(replay=self.fixtures, latency=0.2)
+        start = time.monotonic()
+        self.assertEqual(requests.get(self.base + "/page/a").text, "page a")
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Unit tests for normalized_tables.py.
+Run from root `congress-legislators` dir:
+`python test/test_normalized_tables.py`
+"""
+import sys
+import unittest
+
+sys.path.insert(0, "scripts")
+import normalized_tables
+
+DATA = {
+    "legislators-current.yaml": [
+        {"id": {"bioguide": "B001288", "govtrack": 412598, "fec": ["S4NJ00185"]},
+         "name": {"first": "Cory", "last": "Booker"},
+         "terms": [{"type": "sen", "start": "2013-10-31", "end": "2021-01-03", "state": "NJ", "class": 2,
+                    "party": "Democrat"}]},
+        # A newly added legislator who doesn't have a bioguide ID yet.
+        {"id": {"govtrack": 456999},
+         "name": {"first": "New", "last": "Member"},
+         "terms": [{"type": "rep", "start": "2025-01-03", "end": "2027-01-03", "state": "NJ", "district": 1,
+                    "party": "Democrat",
+                    "party_affiliations": [{"start": "2025-01-03", "end": "2027-01-03", "party": "Democrat"}]}],
+         "leadership_roles": [{"title": "Whip", "chamber": "house", "start": "2025-01-03"}]},
+    ],
+    "legislators-historical.yaml": [],
+    "legislators-district-offices.yaml": [
+        {"id": {"govtrack": 456999}, "offices": [{"id": "X-cherry_hill", "city": "Cherry Hill", "state": "NJ"}]},
+    ],
+    "legislators-social-media.yaml": [
+        {"id": {"govtrack": 456999}, "social": {"twitter": "newmember"}},
+    ],
+    "committees-current.yaml": [{"thomas_id": "SSJU", "type": "senate", "name": "Committee on the Judiciary"}],
+    "committees-historical.yaml": [],
+    "committee-membership-current.yaml": {"SSJU": [{"bioguide": "B001288", "name": "Cory Booker", "rank": 5}]},
+}
+
+
+class TestTables(unittest.TestCase):
+    def rows(self, name):
+        return list(normalized_tables.get_table(name)["rows"](DATA.get))
+
+    def test_legislator_without_bioguide(self):
+        people = {row[0]: row for row in self.rows("people")}
+        self.assertEqual(people["456999"][1:4], (None, 456999, True))
+        self.assertEqual(people["B001288"][1:3], ("B001288", 412598))
+        self.assertEqual([row[:2] for row in self.rows("terms")], [("B001288", 0), ("456999", 0)])
+        self.assertEqual([row[:2] for row in self.rows("party_affiliations")], [("456999", 0)])
+        self.assertEqual([row[0] for row in self.rows("leadership_roles")], ["456999"])
+        self.assertEqual([row[0] for row in self.rows("district_offices")], ["456999"])
+        self.assertEqual([row[0] for row in self.rows("social_media")], ["456999"])
+        self.assertIn(("456999", "govtrack", "456999", 456999), self.rows("ids"))
+
+    def test_keys(self):
+        # Primary keys are unique and foreign keys refer to existing rows.
+        for table in normalized_tables.TABLES:
+            columns = [column for column, column_type in table["columns"]]
+            rows = self.rows(table["name"])
+            for row in rows:
+                self.assertEqual(len(row), len(columns), table["name"])
+            if "primary_key" in table:
+                keys = [tuple(row[columns.index(column)] for column in table["primary_key"]) for row in rows]
+                self.assertEqual(len(keys), len(set(keys)), table["name"])
+            for from_columns, to_table, to_columns in table.get("foreign_keys", []):
+                to_column_names = [column for column, column_type in normalized_tables.get_table(to_table)["columns"]]
+                targets = {tuple(row[to_column_names.index(column)] for column in to_columns) for row in self.rows(to_table)}
+                for row in rows:
+                    self.assertIn(tuple(row[columns.index(column)] for column in from_columns), targets, table["name"])
+
+
+if __name__ == "__main__":
+    unittest.main()
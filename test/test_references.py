@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Unit tests for references.py.
+Run from root `congress-legislators` dir:
+`python test/test_references.py`
+"""
+import sys
+import unittest
+
+sys.path.insert(0, "scripts")
+from references import check_references, fix
+
+
+def legislator(bioguide, term_type, **fields):
+    return dict({"id": {"bioguide": bioguide}, "name": {"first": "A", "last": bioguide},
+                 "terms": [{"type": term_type, "start": "2023-01-03", "end": "2025-01-03"}]}, **fields)
+
+
+def files():
+    return {
+        "legislators-current.yaml": [
+            legislator("S000001", "sen", leadership_roles=[
+                {"title": "Whip", "chamber": "house", "start": "2023-01-03", "end": "2025-01-03"}]),
+            legislator("R000001", "rep", family=[{"name": "A. Z. Old", "relation": "son"}]),
+        ],
+        "legislators-historical.yaml": [legislator("Old", "rep"), legislator("X000001", "rep")],
+        "executive.yaml": [],
+        "committees-current.yaml": [
+            {"type": "senate", "thomas_id": "SSAF", "subcommittees": [{"thomas_id": "01"}]},
+            {"type": "joint", "thomas_id": "JSPR"},
+        ],
+        "committee-membership-current.yaml": {
+            "SSAF": [{"bioguide": "X000001"}, {"bioguide": "Old"}, {"bioguide": "S000001"}, {"bioguide": "R000001"}],
+            "JSPR": [{"bioguide": "R000001", "chamber": "senate"}],
+            "HSXX": [{"bioguide": "R000001"}],
+        },
+        "legislators-social-media.yaml": [{"id": {"bioguide": "X000001"}}, {"id": {"bioguide": "S000001"}}],
+        "legislators-district-offices.yaml": [{"id": {"bioguide": "R000001"}}],
+    }
+
+
+class TestReferences(unittest.TestCase):
+    def test_check(self):
+        self.assertEqual(check_references(files()), [
+            (True, "committee-membership-current.yaml", "Member of SSAF is not a current legislator: X000001 (None)"),
+            (True, "committee-membership-current.yaml", "Member of SSAF is not a current legislator: Old (None)"),
+            (True, "committee-membership-current.yaml", "Member of SSAF is not serving in the senate: R000001 (None)"),
+            (True, "committee-membership-current.yaml", "Member of JSPR is not serving in the senate: R000001 (None)"),
+            (True, "committee-membership-current.yaml", "Invalid committee ID: HSXX"),
+            (False, "committees-current.yaml", "No membership information for: SSAF01"),
+            (True, "legislators-social-media.yaml", "Entry for non-current legislator: X000001"),
+            (True, "legislators-current.yaml:S000001",
+             "Leadership role Whip (2023-01-03 to 2025-01-03) is not during a term in the house."),
+        ])
+
+    def test_fix(self):
+        data = files()
+        removed = fix(data)
+        self.assertEqual(len(removed), 4)
+        # Both consecutive entries for people no longer serving are removed.
+        self.assertEqual([m["bioguide"] for m in data["committee-membership-current.yaml"]["SSAF"]],
+                         ["S000001", "R000001"])
+        self.assertNotIn("HSXX", data["committee-membership-current.yaml"])
+        self.assertEqual(data["legislators-social-media.yaml"], [{"id": {"bioguide": "S000001"}}])
+
+
+if __name__ == "__main__":
+    unittest.main()
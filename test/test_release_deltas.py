@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Unit tests for release_deltas.py.
+Run from root `congress-legislators` dir:
+`python test/test_release_deltas.py`
+"""
+import copy
+import sys
+import unittest
+
+sys.path.insert(0, "scripts")
+from release_deltas import apply_patch, json_patch, keyed, keyed_digest
+
+
+class TestJSONPatch(unittest.TestCase):
+    def assertRoundTrips(self, old, new):
+        patch = json_patch(old, new)
+        self.assertEqual(apply_patch(copy.deepcopy(old), patch), new)
+        return patch
+
+    def test_phone_change(self):
+        old = keyed([
+            {"id": {"bioguide": "B001288"}, "terms": [{"type": "sen", "phone": "202-224-3224"}]},
+            {"id": {"bioguide": "W000437"}, "terms": [{"type": "sen"}]},
+        ])
+        new = copy.deepcopy(old)
+        new["B001288"]["terms"][0]["phone"] = "202-224-0000"
+        patch = self.assertRoundTrips(old, new)
+        self.assertEqual(patch, [{"op": "replace", "path": "/B001288/terms/0/phone", "value": "202-224-0000"}])
+
+    def test_added_and_removed_records(self):
+        old = keyed([{"id": {"bioguide": "A000001"}}, {"id": {"bioguide": "B000002"}}])
+        new = keyed([{"id": {"bioguide": "B000002"}}, {"id": {"bioguide": "C000003", "fec": ["H0XX00000"]}}])
+        self.assertRoundTrips(old, new)
+
+    def test_lists(self):
+        self.assertRoundTrips({"a": [1, 2, 3]}, {"a": [1, 5]})
+        self.assertRoundTrips({"a": [1]}, {"a": [1, {"b": 2}, 3]})
+        self.assertRoundTrips({"a": [1]}, {"a": {"b": 1}})
+
+    def test_types(self):
+        self.assertEqual(json_patch({"a": 1}, {"a": True}), [{"op": "replace", "path": "/a", "value": True}])
+        self.assertEqual(json_patch({"a": 1}, {"a": 1}), [])
+
+    def test_escaping(self):
+        self.assertRoundTrips({"a/b": 1, "c~d": {}}, {"a/b": 2, "c~d": {"e": None}})
+
+    def test_digest_after_applying_patch(self):
+        # A client that applies the patch to the old release gets the
+        # digest of the new release, although the records are in a
+        # different order than in the new file.
+        old = [{"id": {"bioguide": "B000002"}, "name": {"last": "Núñez"}}, {"id": {"bioguide": "C000003"}}]
+        new = [{"id": {"bioguide": "A000001"}}, {"id": {"bioguide": "B000002"}, "name": {"last": "Núñez", "first": "Ana"}}]
+        patch = json_patch(keyed(old), keyed(new))
+        result = apply_patch(keyed(copy.deepcopy(old)), patch)
+        self.assertNotEqual(list(result), list(keyed(new)))
+        self.assertEqual(keyed_digest(result), keyed_digest(keyed(new)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Unit tests for schema.py.
+Run from root `congress-legislators` dir:
+`python test/test_schema.py`
+"""
+import sys
+import unittest
+
+sys.path.insert(0, "scripts")
+from schema import compile_schema
+
+
+def check(schema, record, env=None):
+    problems = []
+    schema(record, lambda: "context", lambda is_error, context, message:
+           problems.append((is_error, message)), env)
+    return problems
+
+
+class TestSchema(unittest.TestCase):
+    def test_keys(self):
+        schema = compile_schema([{
+            "keys": {"first": {"type": str, "strip": True}, "fec": {"type": list, "pattern": r"H\d$"}},
+            "unknown": "{key} is not a valid key.",
+        }])
+        self.assertEqual(check(schema, {"first": "Ann", "fec": ["H1"]}), [])
+        self.assertEqual(check(schema, {"first": 1, "x": 2, "fec": ["H1", "S2"]}), [
+            (True, "first: 1 has an invalid data type."),
+            (True, "x is not a valid key."),
+            (True, "fec: S2 has invalid format."),
+        ])
+        self.assertEqual(check(schema, {"first": " Ann"}), [(True, "first: ' Ann' has leading or trailing spaces.")])
+
+    def test_rules(self):
+        schema = compile_schema([
+            {"key": "title", "required": "Missing {key} in {context}."},
+            {"key": "url", "nonempty": "Missing {key}.", "warning": True},
+            {"key": "chamber", "choices": ("house", "senate"), "message": "Invalid chamber {value}."},
+            {"key": "district", "type": int, "when": {"type": "rep"}, "message": "Invalid district."},
+            {"key": "phone", "pattern": r"\d{3}-\d{4}$", "message": "Invalid phone."},
+        ])
+        self.assertEqual(check(schema, {"title": "X", "url": "u", "chamber": "house", "type": "sen", "phone": "555-1234"}), [])
+        self.assertEqual(check(schema, {"url": "", "chamber": "moon", "type": "rep", "phone": "5"}), [
+            (True, "Missing title in context."),
+            (False, "Missing url."),
+            (True, "Invalid chamber moon."),
+            (True, "Invalid district."),
+            (True, "Invalid phone."),
+        ])
+
+    def test_function_rules(self):
+        def check_dates(record, context, report, env):
+            env["checked"] = True
+            return lambda: context() + "(dates)"
+        schema = compile_schema([
+            check_dates,
+            {"key": "end", "required": "{context}: missing end."},
+        ])
+        env = {}
+        self.assertEqual(check(schema, {}, env), [(True, "context(dates): missing end.")])
+        self.assertTrue(env["checked"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+"""
+Unit tests for utils.py.
+Run from root `congress-legislators` dir:
+`python test/test_utils.py`
+"""
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, "scripts")
+import utils
+
+
+class TestWriteJSON(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_json(self, data, indent):
+        path = os.path.join(self.dir.name, "data.json")
+        utils.write_json(data, path, indent=indent)
+        with open(path) as f:
+            return f.read()
+
+    def test_matches_json_dumps(self):
+        records = [
+            {"id": {"bioguide": "B001288", "fec": ["S4NJ00185"]}, "name": {"first": "Cory", "last": "Booker"}},
+            {"id": {"bioguide": "W000437"}, "name": {"first": "Roger", "last": "Wicker", "note": "line\nbreak"}, "terms": []},
+        ]
+        for data in (records, {"SSAF": records, "HSAG": []}, [], {}, "string", [[1, 2], {"a": None}]):
+            for indent in (None, 2):
+                self.assertEqual(
+                    self.write_json(data, indent),
+                    json.dumps(data, default=utils.format_datetime, indent=indent))
+
+    def test_ndjson_index(self):
+        records = [
+            {"id": {"bioguide": "B001288"}, "name": {"last": "Booker"}},
+            {"id": {"bioguide": "W000437"}, "name": {"last": "Wicker é"}},
+        ]
+        path = os.path.join(self.dir.name, "data.ndjson")
+        utils.write_ndjson(records, path, lambda record: record["id"]["bioguide"])
+        with open(path + ".index.json") as f:
+            index = json.load(f)
+        self.assertEqual([key for key, offset, length in index], ["B001288", "W000437"])
+        with open(path, "rb") as f:
+            for (key, offset, length), record in zip(index, records):
+                f.seek(offset)
+                self.assertEqual(json.loads(f.read(length)), record)
+
+
+class TestDownload(unittest.TestCase):
+    # Serves /ok/NAME, /redirect (a meta refresh to /ok/target), /missing
+    # (a 404), /flaky (a 503 the first time) and /etag (with an ETag),
+    # counting the requests.
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache_dir = utils.cache_dir
+        utils.cache_dir = lambda: self.dir.name
+        self.retry_wait = utils.RETRY_WAIT
+        utils.RETRY_WAIT = 0
+        self.requests_per_minute = utils.HOST_REQUESTS_PER_MINUTE
+        utils.HOST_REQUESTS_PER_MINUTE = 0
+        self.download_metrics = utils.download_metrics
+        utils.download_metrics = utils.DownloadMetrics()
+        utils.download_metrics.reporting = True # don't print a summary at exit
+        self.requests = []
+        self.etag = '"v1"'
+        test = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                test.requests.append(self.path)
+                if self.path.startswith("/ok/"):
+                    self.respond(200, "page " + self.path[4:])
+                elif self.path == "/redirect":
+                    self.respond(200, '<html><head><meta http-equiv="Refresh" content="0;url=%s/ok/target"></head></html>' % test.base)
+                elif self.path == "/flaky" and test.requests.count("/flaky") == 1:
+                    self.respond(503, "unavailable")
+                elif self.path == "/flaky":
+                    self.respond(200, "page flaky")
+                elif self.path == "/etag" and self.headers.get("If-None-Match") == test.etag:
+                    test.requests[-1] += " 304"
+                    self.send_response(304)
+                    self.end_headers()
+                elif self.path == "/etag":
+                    self.respond(200, "page " + test.etag, {"ETag": test.etag})
+                else:
+                    self.respond(404, "not found")
+
+            def respond(self, status, body, headers={}):
+                body = body.encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = "http://127.0.0.1:%d" % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        utils.cache_dir = self.cache_dir
+        utils.RETRY_WAIT = self.retry_wait
+        utils.HOST_REQUESTS_PER_MINUTE = self.requests_per_minute
+        utils.download_metrics = self.download_metrics
+        self.dir.cleanup()
+
+    def test_matches_download(self):
+        downloads = [(self.base + "/ok/a", "a.html"), (self.base + "/missing", "missing.html"),
+                     (self.base + "/redirect", "redirect.html"), (self.base + "/ok/b", "b.html")]
+        bodies = utils.download_many(downloads, options={"check_redirects": True})
+        self.assertEqual(bodies, ["page a", None, "page target", "page b"])
+        self.assertEqual(sorted(fn for fn in os.listdir(self.dir.name) if fn.endswith(".meta.json")),
+                         ["a.html.meta.json", "b.html.meta.json", "redirect.html.meta.json"])
+        self.assertEqual(utils.read_cache(os.path.join(self.dir.name, "redirect.html"), {}), "page target")
+
+        # Cached files are not downloaded again, unless forced.
+        self.requests.clear()
+        self.assertEqual(utils.download_many(downloads[:1]), ["page a"])
+        self.assertEqual(self.requests, [])
+        self.assertEqual(utils.download_many(downloads[:1], force=True), ["page a"])
+        self.assertEqual(self.requests, ["/ok/a"])
+
+    def test_destination_required(self):
+        with self.assertRaises(TypeError):
+            utils.download_many([(self.base + "/ok/a", None)])
+
+    def test_retries(self):
+        self.assertEqual(utils.download_many([(self.base + "/flaky", None)], force=True), ["page flaky"])
+        self.assertEqual(self.requests, ["/flaky", "/flaky"])
+
+    def test_http_get(self):
+        response = utils.http_get(self.base + "/flaky")
+        self.assertEqual((response.status_code, response.text), (200, "page flaky"))
+        self.assertEqual(utils.http_get(self.base + "/missing").status_code, 404)
+        self.assertEqual(self.requests, ["/flaky", "/flaky", "/missing"])
+
+    def test_metrics(self):
+        utils.download_many([(self.base + "/flaky", "flaky.html"), (self.base + "/missing", None)], force=True)
+        utils.download(self.base + "/ok/a", "a.html", True)
+        utils.download(self.base + "/ok/a", "a.html")
+        host = utils.download_metrics.to_json()["hosts"]["127.0.0.1:%d" % self.server.server_address[1]]
+        self.assertEqual(host["requests"], 4)
+        self.assertEqual(host["statuses"], {"200": 2, "404": 1, "503": 1})
+        self.assertEqual(host["retries"], 1)
+        self.assertEqual(host["bytes"], len("page flaky") + len("page a"))
+        self.assertEqual(host["cache"], {"hit": 1, "revalidated": 0, "miss": 2})
+        self.assertEqual(host["latency"]["count"], 4)
+        self.assertEqual(host["latency"]["buckets"]["+Inf"], 4)
+        self.assertIn("4 requests (200: 2, 404: 1, 503: 1)", utils.download_metrics.summary())
+
+    def test_host_rate_limit(self):
+        # The first request is allowed at once and each one after it
+        # waits for the next token.
+        start = time.monotonic()
+        utils.download_many([(self.base + "/ok/%d" % i, None) for i in range(3)], force=True, requests_per_minute=600)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(sorted(self.requests), ["/ok/0", "/ok/1", "/ok/2"])
+
+    def test_revalidation(self):
+        url = self.base + "/etag"
+        for download in (utils.download, lambda *args: utils.download_many([args[:2]], *args[2:])[0]):
+            self.requests.clear()
+            self.etag = '"v1"'
+            self.assertEqual(download(url, "etag.html", True), 'page "v1"')
+
+            # Forced downloads and stale files are revalidated.
+            self.assertEqual(download(url, "etag.html", True), 'page "v1"')
+            self.assertEqual(download(url, "etag.html", False, {"ttl": 0}), 'page "v1"')
+            self.assertEqual(self.requests, ["/etag", "/etag 304", "/etag 304"])
+
+            # Fresh files are not.
+            self.assertEqual(download(url, "etag.html", False), 'page "v1"')
+            self.assertEqual(len(self.requests), 3)
+
+            self.etag = '"v2"'
+            self.assertEqual(download(url, "etag.html", True), 'page "v2"')
+            self.assertEqual(utils.read_cache_meta(os.path.join(self.dir.name, "etag.html"))["etag"], '"v2"')
+
+    def save(self, name, body):
+        utils.save_cache(os.path.join(self.dir.name, name), "http://example.com/" + name, body, 200, {})
+
+    def test_blobs(self):
+        # Files with the same contents share a blob.
+        self.save("a", "same")
+        self.save("b", "same")
+        self.save("c", b"\xff")
+        self.assertEqual(len(os.listdir(os.path.join(self.dir.name, "blobs"))), 2)
+        self.assertEqual(utils.read_cache(os.path.join(self.dir.name, "b"), {}), "same")
+        self.assertEqual(utils.read_cache(os.path.join(self.dir.name, "c"), {"binary": True}), b"\xff")
+
+        # Files stored as is before there was a blob store are read and
+        # replaced.
+        path = os.path.join(self.dir.name, "d")
+        utils.write("old", path)
+        self.assertEqual(utils.cache_lookup(path, "d", False, {}), ("old", {}))
+        self.save("d", "new")
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(utils.cache_lookup(path, "d", False, {}), ("new", {}))
+
+    def test_pack(self):
+        self.save("a", "page a")
+        self.save("dir/b", "page b")
+        self.assertEqual(utils.pack_cache(), 2)
+
+        # A cache directory with only the pack has the same files.
+        pack = os.path.join(self.dir.name, utils.CACHE_PACK)
+        with tempfile.TemporaryDirectory() as other:
+            os.rename(pack, os.path.join(other, utils.CACHE_PACK))
+            utils.cache_dir = lambda: other
+            self.assertEqual(utils.download_many([(self.base + "/ok/a", "a"), (self.base + "/ok/b", "dir/b")]),
+                             ["page a", "page b"])
+            self.assertEqual(self.requests, [])
+
+            # Files saved later are read from the directory.
+            utils.save_cache(os.path.join(other, "a"), "http://example.com/a", "page a2", 200, {})
+            self.assertEqual(utils.download(self.base + "/ok/a", "a"), "page a2")
+
+    def test_prune_cache(self):
+        path = lambda name: os.path.join(self.dir.name, name)
+        body = os.urandom(1000)
+        for i, (name, body) in enumerate([("old", body), ("copy", body), ("used", os.urandom(1000)), ("new", os.urandom(1000))]):
+            self.save(name, body)
+            os.utime(utils.cache_meta_path(path(name)), (1000 + i, 1000 + i))
+        utils.read_cache(path("used"), {"binary": True})
+        os.utime(utils.cache_meta_path(path("new")))
+        utils.write("not downloaded", path("key.txt"))
+        blobs = lambda: [os.path.join(root, name) for root, dirs, names in os.walk(path("blobs")) for name in names]
+        size = lambda: sum(os.path.getsize(fn) for fn in blobs() + [path(fn) for fn in os.listdir(self.dir.name) if fn.endswith(".meta.json")])
+        self.assertEqual(len(blobs()), 3)
+
+        # The least recently used files go first, and blobs are deleted
+        # once no file uses them. Files not saved by download are kept.
+        self.assertEqual(utils.prune_cache(max_bytes=size() - 1, max_age=10 ** 10), 1)
+        self.assertEqual(len(blobs()), 3)
+        self.assertEqual(utils.prune_cache(max_bytes=size() - 1, max_age=10 ** 10), 1)
+        self.assertEqual(len(blobs()), 2)
+        self.assertEqual(sorted(fn for fn in os.listdir(self.dir.name) if fn != "blobs"),
+                         ["key.txt", "new.meta.json", "used.meta.json"])
+        self.assertEqual(utils.prune_cache(max_bytes=10 ** 6, max_age=60 * 60), 0)
+        self.assertEqual(utils.prune_cache(max_bytes=10 ** 6, max_age=0), 2)
+        self.assertEqual(blobs(), [])
+        self.assertEqual(sorted(fn for fn in os.listdir(self.dir.name) if fn != "blobs"), ["key.txt"])
+
+    def test_prune_cache_if_due(self):
+        # The cache is pruned at most once per CACHE_PRUNE_INTERVAL.
+        self.save("old", b"old page")
+        os.utime(utils.cache_meta_path(os.path.join(self.dir.name, "old")), (1000, 1000))
+        self.assertEqual(utils.prune_cache_if_due(), 1)
+        self.save("old", b"old page")
+        os.utime(utils.cache_meta_path(os.path.join(self.dir.name, "old")), (1000, 1000))
+        self.assertIsNone(utils.prune_cache_if_due())
+        stamp = os.path.join(self.dir.name, utils.CACHE_PRUNED)
+        os.utime(stamp, (1000, 1000))
+        self.assertEqual(utils.prune_cache_if_due(), 1)
+
+if __name__ == "__main__":
+    unittest.main()
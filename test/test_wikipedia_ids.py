@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Unit tests for wikipedia_ids.py.
+Run from root `congress-legislators` dir:
+`python test/test_wikipedia_ids.py`
+"""
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.parse
+
+sys.path.insert(0, "scripts")
+import utils
+import wikipedia_ids
+
+# Maps page titles to their latest revision ID and text.
+PAGES = {
+    "Paul Ryan": (101, "{{CongLinks | congbio = r000570 | govtrack = 400351 | votesmart = x | opensecrets = N00004357&newMem=Y }}"),
+    "Abraham Lincoln": (102, "{{CongBio|L000313}}"),
+    "Springfield": (103, "No template here."),
+}
+
+# Revision IDs whose text the API hides.
+HIDDEN = set()
+
+
+class API(http.server.BaseHTTPRequestHandler):
+    # Answers prop=info and prop=revisions queries like the MediaWiki API,
+    # which here returns the content of one revision per response and
+    # "continue" parameters for the rest.
+    def do_GET(self):
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        self.server.queries.append(query)
+        response = {}
+        if query["prop"] == "info":
+            pages = [{"title": title, "lastrevid": PAGES[title][0]} if title in PAGES else {"title": title, "missing": True}
+                     for title in query["titles"].split("|")]
+        else:
+            revids = [int(revid) for revid in query["revids"].split("|")]
+            if "rvcontinue" in query:
+                revids = revids[revids.index(int(query["rvcontinue"])):]
+            if len(revids) > 1:
+                response["continue"] = {"rvcontinue": str(revids[1]), "continue": "||"}
+            pages = []
+            for title, (revid, text) in PAGES.items():
+                if revid in revids:
+                    revision = {"revid": revid}
+                    if revid == revids[0] and revid not in HIDDEN:
+                        revision["slots"] = {"main": {"content": text}}
+                    pages.append({"title": title, "revisions": [revision]})
+        response["query"] = {"pages": pages}
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPageContents(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache_dir = utils.cache_dir
+        utils.cache_dir = lambda: os.path.join(self.dir.name, "cache")
+        self.download_metrics = utils.download_metrics
+        utils.download_metrics = utils.DownloadMetrics()
+        utils.download_metrics.reporting = True # don't print a summary at exit
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), API)
+        self.server.queries = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.settings = (wikipedia_ids.API_URL, wikipedia_ids.API_BATCH_SIZE, wikipedia_ids.API_REQUESTS_PER_MINUTE)
+        wikipedia_ids.API_URL = "http://127.0.0.1:%d/w/api.php" % self.server.server_address[1]
+        wikipedia_ids.API_BATCH_SIZE = 2
+        wikipedia_ids.API_REQUESTS_PER_MINUTE = 0
+
+    def tearDown(self):
+        wikipedia_ids.API_URL, wikipedia_ids.API_BATCH_SIZE, wikipedia_ids.API_REQUESTS_PER_MINUTE = self.settings
+        HIDDEN.clear()
+        self.server.shutdown()
+        self.server.server_close()
+        utils.cache_dir = self.cache_dir
+        utils.download_metrics = self.download_metrics
+        self.dir.cleanup()
+
+    def test_batches_and_revision_cache(self):
+        titles = ["Abraham Lincoln", "Missing Page", "Paul Ryan", "Springfield"]
+        expected = {title: text for title, (revid, text) in PAGES.items()}
+        self.assertEqual(wikipedia_ids.get_page_contents(titles), expected)
+        self.assertEqual([query["prop"] for query in self.server.queries], ["info", "info", "revisions", "revisions", "revisions"])
+        self.assertEqual([query.get("rvcontinue") for query in self.server.queries if query["prop"] == "revisions"], [None, None, "101"])
+
+        # Unchanged pages come from the cache.
+        self.server.queries = []
+        self.assertEqual(wikipedia_ids.get_page_contents(titles), expected)
+        self.assertEqual([query["prop"] for query in self.server.queries], ["info", "info"])
+
+    def test_hidden_revision(self):
+        # A revision that comes back without content is left out.
+        HIDDEN.add(103)
+        contents = wikipedia_ids.get_page_contents(["Abraham Lincoln", "Springfield"])
+        self.assertEqual(contents, {"Abraham Lincoln": PAGES["Abraham Lincoln"][1]})
+        self.assertIsNone(wikipedia_ids.read_revision(103))
+
+    def test_parse_page(self):
+        self.assertEqual(wikipedia_ids.parse_page("Paul Ryan", PAGES["Paul Ryan"][1]), (
+            "Paul Ryan", "R000570",
+            {"wikipedia": "Paul Ryan", "bioguide": "R000570", "govtrack": 400351, "opensecrets": "N00004357"},
+            [("invalid value", "votesmart", "x")]))
+        self.assertEqual(wikipedia_ids.parse_page("Abraham Lincoln", PAGES["Abraham Lincoln"][1])[1], "L000313")
+        self.assertEqual(wikipedia_ids.parse_page("Springfield", PAGES["Springfield"][1]), ("Springfield", None, None, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
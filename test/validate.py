@@ -2,20 +2,141 @@
 # Validate that the YAML files have sane data.
 
 import os, sys
-import re
+import contextlib, io, functools
+import hashlib, json, subprocess
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime
 
 import rtyaml
 
 sys.path.insert(0, "scripts")
 import utils
+import schema
+import references
+import office_validator
 from office_validator import run as validate_offices
 
-ok = True
+# Each data file is loaded once, through the pickle cache in utils, and
+# the same data is given to every check that uses it.
+data_files = { }
+def load(fn):
+  if fn not in data_files:
+    data_files[fn] = utils.yaml_load(fn)
+  return data_files[fn]
+
+# Errors and other output are collected here as (is_error, text) pairs
+# rather than printed immediately so that checks can run in parallel
+# worker processes and their output can be printed in the same order as
+# if they had run one after the other.
+messages = []
 def error(context, message):
-  global ok
-  print(context + ": " + message)
-  ok = False
+  # context may be a function that returns the context string (see
+  # scripts/schema.py).
+  messages.append((True, schema.context_text(context) + ": " + message + "\n"))
+
+def warning(*args):
+  # Takes arguments like print().
+  messages.append((False, " ".join(str(arg) for arg in args) + "\n"))
+
+def run_check(func, *args):
+  # Runs a check and returns the messages it produced, its return value,
+  # and if timings are enabled the time spent in each check (see below).
+  global messages, timings
+  messages = []
+  if timings is not None:
+    timings = { }
+  ret = func(*args)
+  return messages, ret, timings
+
+# With --timings, the checks listed here are replaced by functions that
+# record the time spent in each check, how many times it was called, and
+# how many errors it reported, for each file, in timings, which maps
+# (check, file) to [seconds, calls, errors]. Times include the time spent
+# in the checks that a check calls. Each check is listed with the file
+# it checks: "arg" for its first argument, or None for the file being
+# checked by the check that called it.
+timed_checks = [
+  ("check_legislators_file", "arg"),
+  ("check_id_types", None),
+  ("check_name", None),
+  ("check_bio", None),
+  ("check_term", None),
+  ("check_leadership_roles", None),
+  ("report_vacancies", "legislators-current.yaml"),
+  ("check_executive_file", "arg"),
+  ("check_executive_term", None),
+  ("check_id_uniqueness", ""),
+  ("check_seat_overlaps", ""),
+  ("check_district_offices", "legislators-district-offices.yaml"),
+  ("office_validator.check_legislator_offices", None),
+  ("check_references", ""),
+  ("check_social_media", "legislators-social-media.yaml"),
+]
+timings = None
+timed_file = ""
+
+def time_check(name, func, fn):
+  # (functools.wraps lets the timed check be given to a worker process by name.)
+  @functools.wraps(func)
+  def timed_check(*args, **kwargs):
+    global timed_file
+    caller_file = timed_file
+    if fn == "arg":
+      timed_file = args[0]
+    elif fn is not None:
+      timed_file = fn
+    message_count = len(messages)
+    start = time.perf_counter()
+    try:
+      ret = func(*args, **kwargs)
+    finally:
+      entry = timings.setdefault((name, timed_file), [0.0, 0, 0])
+      entry[0] += time.perf_counter() - start
+      entry[1] += 1
+      entry[2] += sum(1 for is_error, _ in messages[message_count:] if is_error)
+      timed_file = caller_file
+    if name == "office_validator.check_legislator_offices":
+      # The office checks return their errors rather than reporting them.
+      entry[2] += len(ret[0])
+    return ret
+  return timed_check
+
+def enable_timings():
+  # Replace the checks with timed versions. When timings aren't enabled,
+  # the checks aren't wrapped at all.
+  global timings
+  timings = { }
+  for name, fn in timed_checks:
+    if name.startswith("office_validator."):
+      module, attr = office_validator, name.split(".")[1]
+    else:
+      module, attr = sys.modules[__name__], name
+    setattr(module, attr, time_check(name, getattr(module, attr), fn))
+
+def print_timings(all_timings, timings_format="table"):
+  # Print the timings, slowest first. As JSON, they are written to
+  # stderr ("json") or to a file (a path ending in .json), so that they
+  # aren't mixed with the validation messages on stdout.
+  rows = sorted(all_timings.items(), key=lambda item : -item[1][0])
+  if timings_format == "json" or timings_format.endswith(".json"):
+    text = json.dumps([
+      { "check": name, "file": fn, "seconds": round(seconds, 6), "calls": calls, "errors": errors }
+      for (name, fn), (seconds, calls, errors) in rows ], indent=2) + "\n"
+    if timings_format == "json":
+      sys.stderr.write(text)
+    else:
+      with open(timings_format, "w") as f:
+        f.write(text)
+    return
+  print("{:>9} {:>8} {:>7}  {}".format("seconds", "calls", "errors", "check"))
+  for (name, fn), (seconds, calls, errors) in rows:
+    print("{:9.3f} {:8d} {:7d}  {}{}".format(seconds, calls, errors, name, " (" + fn + ")" if fn else ""))
+
+# Legislators in the historical file are checked in chunks of this many
+# records, which can be checked in parallel.
+CHUNK_SIZE = 1000
 
 # Current apportionment of the U.S. House, so that we can report if there
 # are any vacancies in legislators-current. Each state is mapped to an
@@ -33,6 +154,25 @@ state_apportionment = {
   'VT': 1, 'VI': 'T', 'VA': 11, 'WA': 10, 'WV': 2, 'WI': 8, 'WY': 1
   }
 
+# Until the 1970s, some states elected more than one representative
+# at-large (district 0), so at-large seats are only checked for
+# overlapping terms after this date.
+multi_member_at_large_until = "1971-01-03"
+
+# Terms that legitimately overlap another legislator's term for the
+# same seat, such as during contested elections, as tuples of the IDs
+# of the two legislators (the earlier term's first) and the start date
+# of the later term (see check_seat_overlaps).
+seat_overlap_exceptions = {
+}
+
+# Overlapping terms are reported as warnings until the exceptions have
+# been reviewed against the full historical data. Then this can be set to
+# True to make new overlaps errors. Only the first few warnings are
+# printed, followed by a count of the rest.
+seat_overlaps_are_errors = False
+max_seat_overlap_warnings = 10
+
 # id types that must be present on every legislator record
 id_required = ['bioguide', 'govtrack']
 
@@ -77,13 +217,38 @@ def now():
   return datetime.now().date()
 now = now()
 
-def check_legislators_file(fn, seen_ids, current=None, current_mocs=None):
-  # Open and iterate over the entries.
-  with open(fn) as f:
-    legislators = rtyaml.load(f)
-  for legislator in legislators:
-    # Create a string for error messages to tell us where problems are ocurring.
-    context = "{} in {}".format(fn, repr(legislator))
+# Dates are parsed many times (each term's end date is checked again as
+# the next term's previous end date), so cache them.
+parse_date = functools.lru_cache(maxsize=None)(utils.parse_date)
+get_congress_from_date = functools.lru_cache(maxsize=None)(utils.get_congress_from_date)
+
+def report(is_error, context, message):
+  # Reports a problem found by a schema (see scripts/schema.py).
+  if is_error:
+    error(context, message)
+  else:
+    warning(schema.context_text(context), message)
+
+def check_legislators_file(fn, current=None, start=0, end=None, changed=None):
+  # Checks the entries from start to end and returns the IDs seen (see
+  # check_id_types), for the current file the offices held, and the
+  # indexes of the entries that had errors. If changed is given, only
+  # the entries at those indexes are checked and the IDs of the other
+  # entries are just collected.
+  seen_ids = { }
+  current_mocs = set() if current else None
+  failed = set()
+
+  # Iterate over the entries.
+  for index, legislator in enumerate(load(fn)[start:end], start):
+    if changed is not None and index not in changed:
+      add_seen_ids(legislator, seen_ids)
+      continue
+    message_count = len(messages)
+
+    # Create a string for error messages to tell us where problems are ocurring,
+    # but only if there are any.
+    context = lambda : "{} in {}".format(fn, repr(legislator))
 
     # Check the IDs.
     if "id" not in legislator:
@@ -130,134 +295,144 @@ def check_legislators_file(fn, seen_ids, current=None, current_mocs=None):
     # Check the leadership roles.
     check_leadership_roles(legislator.get("leadership_roles", []), current, context)
 
-def check_leadership_roles(roles, current, context):
-  for role in roles:
-    # All of these fields must be strings.
-    for key, value in role.items():
-      if not isinstance(value, str):
-        error(context, rtyaml.dump({ key: value }).strip() + " has an invalid data type.")
+    if any(is_error for is_error, _ in messages[message_count:]):
+      failed.add(index)
 
-    # Check required fields.
-    if "title" not in role:
-      error(context, rtyaml.dump(role) + " is missing title.")
-    if role.get("chamber") not in ("house", "senate"):
-      error(context, rtyaml.dump(role) + " has an invalid chamber.")
-    if "start" not in role:
-      error(context, rtyaml.dump(role) + " is missing start.")
-    if "end" not in role and not current:
-      # end is required only in the historical file
-      error(context, rtyaml.dump(role) + " is missing end.")
-
-    # Check dates.
-    start = check_date(role['start'], context)
-    if "end" in role:
-      end = check_date(role['end'], context)
-      if start and end and end < start:
-        error(context, rtyaml.dump(role) + " has end before start.")
+  return seen_ids, current_mocs, failed
 
-def check_id_types(legislator, seen_ids, is_legislator, context):
-  for key, value in legislator["id"].items():
-    # Check that the id key is one we know about.
-    if key not in id_types:
-      error(context, rtyaml.dump({ key: value }).strip() + " is not a valid id.")
+# The rules for each part of a record are declared below as schemas (see
+# scripts/schema.py), which are compiled once into functions that check
+# a record.
 
-    # Check that the data type is correct.
-    elif not isinstance(value, id_types[key]):
-      error(context, rtyaml.dump({ key: value }).strip() + " has an invalid data type.")
+def check_role_dates(role, context, report, env):
+  start = check_date(role.get('start'), context)
+  if "end" in role:
+    end = check_date(role['end'], context)
+    if start and end and end < start:
+      report(True, context, rtyaml.dump(role) + " has end before start.")
 
-    else:
-      # Since some values are lists of IDs, check the elements.
-      # Make a single-item list for non-list IDs.
-      if not isinstance(value, list): value = [value]
-
-      # Check ID syntax.
-      if key == "fec":
-        for v in value:
-          if not re.match(r"([HS]\d[A-Z]{2}|P\d00)\d{5}$", v):
-            error(context, rtyaml.dump({ key: v }).strip() + " has invalid format.")
-
-      # Check that the ID isn't duplicated across legislators.
-      # Just make a list of ID occurrences here -- we'll check
-      # uniqueness at the end.
-      for v in value:
-        seen_ids.setdefault((key, v), []).append(legislator)
-
-  if is_legislator:
-    # Check that every legislator has ids of the required types.
-    for id_type in id_required:
-      if id_type not in legislator["id"]:
-        error(context, "Missing %s id." % id_type)
+def make_role_schema(current):
+  return schema.compile_schema([
+    # All of these fields must be strings.
+    { "keys": { }, "other": { "type": str } },
 
-def check_name(name, context, is_other_names=False):
-  # Check for required keys and data types of the values.
-  for key, value in name.items():
-    if key in ("start", "end") and is_other_names:
-      if not isinstance(value, str):
-        error(context, rtyaml.dump({ key: value }).strip() + " has an invalid data type.")
-      continue
-    elif key not in name_keys:
-      error(context, "%s is not a valid key in name." % key)
-      continue
+    # Check required fields.
+    { "key": "title", "required": "{record_yaml} is missing title." },
+    { "key": "chamber", "choices": ("house", "senate"), "message": "{record_yaml} has an invalid chamber." },
+    { "key": "start", "required": "{record_yaml} is missing start." },
+  ] + ([] if current else [
+    # end is required only in the historical file
+    { "key": "end", "required": "{record_yaml} is missing end." },
+  ]) + [
+    check_role_dates,
+  ])
+role_schema = make_role_schema(False)
+current_role_schema = make_role_schema(True)
 
-    if key in ("first", "last"):
-      # These are required.
-      if not isinstance(value, str):
-        error(context, rtyaml.dump({ key: value }).strip() + " has an invalid data type.")
-    else:
-      # These can be set explicitly to None, but maybe we should just remove
-      # those keys then.
-      if not isinstance(value, (str, type(None))):
-        error(context, rtyaml.dump({ key: value }).strip() + " has an invalid data type.")
+def check_leadership_roles(roles, current, context):
+  check = current_role_schema if current else role_schema
+  for role in roles:
+    check(role, context, report)
 
-    if isinstance(value, str) and value != value.strip():
-      error(context, rtyaml.dump({ key: value }).strip() + " has leading or trailing spaces.")
+id_keys = {
+  "keys": { key: { "type": value_type } for key, value_type in id_types.items() },
+  "unknown": "{yaml} is not a valid id.",
+}
+id_keys["keys"]["fec"]["pattern"] = r"([HS]\d[A-Z]{2}|P\d00)\d{5}$"
+id_schema = schema.compile_schema([id_keys])
+legislator_id_schema = schema.compile_schema([id_keys] + [
+  # Check that every legislator has ids of the required types.
+  { "key": id_type, "required": "Missing {key} id." }
+  for id_type in id_required
+])
 
+def check_id_types(legislator, seen_ids, is_legislator, context):
+  (legislator_id_schema if is_legislator else id_schema)(legislator["id"], context, report)
+
+  # Check that the ID isn't duplicated across legislators.
+  # Just make a list of ID occurrences here -- we'll check
+  # uniqueness at the end.
+  add_seen_ids(legislator, seen_ids)
+
+def add_seen_ids(legislator, seen_ids):
+  # Collects a legislator's IDs that have valid types for the
+  # uniqueness check.
+  for key, value in legislator.get("id", {}).items():
+    if key in id_types and isinstance(value, id_types[key]):
+      for v in (value if isinstance(value, list) else [value]):
+        seen_ids.setdefault((key, v), []).append(legislator["id"])
+
+def check_first_initial(name, context, report, env):
   # If a person as a first initial only, they should also have a middle name.
   # (GovTrack relies on this to generate name strings.)
   if isinstance(name.get("first"), str) and len(name["first"]) == 2 and name["first"].endswith(".") and not name.get("middle"):
-        error(context, rtyaml.dump(name) + " is missing a middle name to go with its first initial.")
+    report(True, context, rtyaml.dump(name) + " is missing a middle name to go with its first initial.")
+
+name_fields = {
+  # first and last are required to be strings. The others can be set
+  # explicitly to None, but maybe we should just remove those keys then.
+  key: { "type": str if key in ("first", "last") else (str, type(None)), "strip": True }
+  for key in name_keys
+}
+name_schema = schema.compile_schema([
+  { "keys": name_fields, "unknown": "{key} is not a valid key in name." },
+  check_first_initial,
+])
+other_name_schema = schema.compile_schema([
+  { "keys": dict(name_fields, start={ "type": str }, end={ "type": str }), "unknown": "{key} is not a valid key in name." },
+  check_first_initial,
+])
+
+def check_name(name, context, is_other_names=False):
+  (other_name_schema if is_other_names else name_schema)(name, context, report)
+
+bio_fields = {
+  "keys": { key: { "type": str } for key in bio_keys },
+  "unknown": "{key} is not a valid key in bio.",
+}
+bio_schema = schema.compile_schema([bio_fields])
+
+def check_bio_required(bio, context, report, env):
+  # These keys are required only for current legislators.
+  # We don't always have the information for historical members of Congress or presidents.
+  for key in bio_keys:
+    if key not in bio:
+      warning('[warning] ' + schema.context_text(context) + ": Missing bio->{}.".format(key))
+current_bio_schema = schema.compile_schema([bio_fields, check_bio_required])
 
 def check_bio(bio, is_current_legislator, context):
-  for key, value in bio.items():
-    if key not in bio_keys:
-      error(context, "%s is not a valid key in bio." % key)
-    elif not isinstance(value, str):
-      error(context, rtyaml.dump({ key: value }).strip() + " has an invalid data type.")
-  if is_current_legislator:
-    # These keys are required only for current legislators.
-    # We don't always have the information for historical members of Congress or presidents.
-    for key in bio_keys:
-      if key not in bio:
-        print('[warning] ' + context + ": Missing bio->{}.".format(key))
+  (current_bio_schema if is_current_legislator else bio_schema)(bio, context, report)
 
-def check_term(term, prev_term, context, current=None, current_mocs=None):
-  # Check type.
-  if term.get("type") not in ("rep", "sen"):
-    error(context, "Term has invalid 'type'.")
+def term_context(context, start, end):
+  return lambda : "{}({} to {})".format(schema.context_text(context), start, end)
 
-  # Check date range.
-  start = check_date(term.get('start'), context)
-  end = check_date(term.get('end'), context)
-  if start and end:
-    context += "({} to {})".format(start, end)
+def term_dates_rule(current):
+  def check_term_dates(term, context, report, env):
+    # Check date range.
+    start = check_date(term.get('start'), context)
+    end = check_date(term.get('end'), context)
+    env["start"], env["end"] = start, end
+    if not (start and end):
+      return None
+    context = term_context(context, start, end)
 
     if end < start:
-      error(context, "Term has end before start.")
+      report(True, context, "Term has end before start.")
 
-    if prev_term:
-      prev_end = check_date(prev_term.get("end"), context)
+    if env["prev_term"]:
+      prev_end = check_date(env["prev_term"].get("end"), context)
       if prev_end:
         if start < prev_end:
-          error(context, "Term has start before previous term's end.")
+          report(True, context, "Term has start before previous term's end.")
 
     if not current and (end > now):
-      error(context, "Term has an end date in the future but is a past term.")
+      report(True, context, "Term has an end date in the future but is a past term.")
     if current and (end < now):
-      error(context, "Term has an end date in the past but is a most recent term in the current file.")
+      report(True, context, "Term has an end date in the past but is a most recent term in the current file.")
 
     # Get the congress number of the start and end dates of the term.
-    congress_start = utils.get_congress_from_date(utils.parse_date(term["start"]), "start")
-    congress_end = utils.get_congress_from_date(utils.parse_date(term["end"]), "end")
+    congress_start = get_congress_from_date(start, "start")
+    congress_end = get_congress_from_date(end, "end")
     if congress_start is None:
       raise ValueError("Invalid date:" + term["start"])
     if congress_end is None:
@@ -267,7 +442,7 @@ def check_term(term, prev_term, context, current=None, current_mocs=None):
     if term["type"] == "sen":
       # Senate terms can't span more than 3 congresses.
       if congress_end - congress_start > 2:
-        error(context, "Term date range is too long: {} to {}".format(term["start"], term["end"]))
+        report(True, context, "Term date range is too long: {} to {}".format(term["start"], term["end"]))
       elif term.get("class") in (1, 2, 3): # don't crash if missing, is checked below
         # Sanity-check that the term doesn't cross a year where the senators from that class
         # would face election. Class 1 senators face election after Congress numbers 1, 4, ...
@@ -277,97 +452,115 @@ def check_term(term, prev_term, context, current=None, current_mocs=None):
           # Congresses 'c' and 'c+1' are in the range. If 'c' is an ending Congress for this
           # term's class, it's an error.
           if ((c - 1789) % 3) == (term["class"] - 1):
-            error(context, "Term date range doesn't match senate class: {} to {}".format(term["start"], term["end"]))
+            report(True, context, "Term date range doesn't match senate class: {} to {}".format(term["start"], term["end"]))
 
     elif term["type"] == "rep" and term["state"] == "PR":
       # Puerto Rico's resident commissioners' terms can't span more than 2 congresses.
       if congress_end - congress_start > 1:
-        error(context, "Term date range is too long for: {} to {}".format(term["start"], term["end"]))
+        report(True, context, "Term date range is too long for: {} to {}".format(term["start"], term["end"]))
 
     elif term["type"] == "rep":
       # House terms can't span more than 1 congress.
       if congress_end - congress_start > 0:
-        error(context, "Term date range is too long: {} to {}".format(term["start"], term["end"]))
+        report(True, context, "Term date range is too long: {} to {}".format(term["start"], term["end"]))
 
-  # Check how.
-  if term.get("how") not in (None, "appointment", "special-election"):
-    error(context, "Term has invalid 'how'.")
+    # The rules after this one say which term this is by its dates.
+    return context
+  return check_term_dates
 
-  # Check end-type.
-  if term.get("end-type") not in (None, "special-election",):
-    error(context, "Term has invalid 'end-type'.")
-  if term.get("end-type") == "special-election" and term.get("how") != "appointment":
-    error(context, "Term can't have an 'end-type' without being an appointed senator.")
-
-  # Check state, district, class, state_rank.
-  if term.get("state") not in utils.states:
-    error(context, "Term has invalid state.")
-  if term.get("type") == "rep":
-    if not isinstance(term.get("district"), int):
-      error(context, "Term has invalid district.")
-  if term.get("type") == "sen":
-    if term.get("class") not in (1, 2, 3):
-      error(context, "Term has invalid class.")
-    if term.get("state_rank") not in ("junior", "senior", None):
-      error(context, "Term has invalid senator state_rank.")
-    elif current and term.get("state_rank") is None:
-      error(context, "Term is missing senator state_rank.")
-
-  # Party & party affiliatons.
+parties = ("Republican", "Democrat", "Independent", "Libertarian")
+
+def check_term_party(term, context, report, env):
+  start = env["start"]
+  if not start:
+    return
   if start.year > 1950:
     if not isinstance(term.get("party"), str):
-        error(context, "Term is missing party.")
+      report(True, context, "Term is missing party.")
   if start.year > 2006:
     # Check party (missing or odd values in some of the historical data).
-    if term.get("party") not in ("Republican", "Democrat", "Independent", "Libertarian"):
-      error(context, rtyaml.dump({ "party": term.get("party") }).strip() + " is invalid.")
+    if term.get("party") not in parties:
+      report(True, context, rtyaml.dump({ "party": term.get("party") }).strip() + " is invalid.")
 
     # Check caucus of Independent members -- it's optional, so warn.
     if term.get("party") == "Independent" and "caucus" in term and term.get("caucus") not in ("Republican", "Democrat"):
-      print(context, "[warning] " + repr(rtyaml.dump({ "caucus": term.get("caucus") }).strip()) + " when party is Independent.")
-  if term.get("party_affiliations"):
-    if not isinstance(term["party_affiliations"], list):
-        error(context, "party_affiliations has incorrect type.")
+      report(False, context, "[warning] " + repr(rtyaml.dump({ "caucus": term.get("caucus") }).strip()) + " when party is Independent.")
+
+def check_party_affiliations(term, context, report, env):
+  if not term.get("party_affiliations"):
+    return
+  if not isinstance(term["party_affiliations"], list):
+    report(True, context, "party_affiliations has incorrect type.")
+    return
+  start, end = env["start"], env["end"]
+  if len(term["party_affiliations"]) < 2:
+    report(True, context, "party_affiliations has fewer than two entries.")
+  for i, pa in enumerate(term["party_affiliations"]):
+    if not pa.get('start') or not pa.get('end'):
+      report(True, context, "party_affiliation is missing start/end date.")
     else:
-      if len(term["party_affiliations"]) < 2:
-        error(context, "party_affiliations has fewer than two entries.")
-      for i, pa in enumerate(term["party_affiliations"]):
-        if not pa.get('start') or not pa.get('end'):
-          error(context, "party_affiliation is missing start/end date.")
-        else:
-          pa_start = check_date(pa.get('start'), context)
-          pa_end = check_date(pa.get('end'), context)
-          if pa_start < start or pa_end > end:
-            error(context, "party_affiliation start/end date is out of the range of the term's dates.")
-          if not isinstance(pa.get("party"), str):
-              error(context, "party_affiliation is missing party.")
-          else:
-            if i == 0 and pa_start != start:
-              error(context, "first party_affiliation's start date must match term start date.")
-            if i == len(term["party_affiliations"]) - 1 and pa_end != end:
-              error(context, "last party_affiliation's end date must match term end date.")
-            if i == len(term["party_affiliations"]) - 1 and pa["party"] != term.get("party"):
-              error(context, "last party_affiliation's party must match term party.")
-
-  if current:
-    # Check uniqueness of office for current members.
-
-    # Check office.
-    office = (term.get("type"), term.get("state"), term.get("district") if term.get("type") == "rep" else term.get("class"))
+      pa_start = check_date(pa.get('start'), context)
+      pa_end = check_date(pa.get('end'), context)
+      if not (start and end and pa_start and pa_end):
+        continue
+      if pa_start < start or pa_end > end:
+        report(True, context, "party_affiliation start/end date is out of the range of the term's dates.")
+      if not isinstance(pa.get("party"), str):
+        report(True, context, "party_affiliation is missing party.")
+      else:
+        if i == 0 and pa_start != start:
+          report(True, context, "first party_affiliation's start date must match term start date.")
+        if i == len(term["party_affiliations"]) - 1 and pa_end != end:
+          report(True, context, "last party_affiliation's end date must match term end date.")
+        if i == len(term["party_affiliations"]) - 1 and pa["party"] != term.get("party"):
+          report(True, context, "last party_affiliation's party must match term party.")
+
+def check_office_uniqueness(term, context, report, env):
+  # Check uniqueness of office for current members.
+  current_mocs = env["current_mocs"]
+
+  # Check office.
+  office = (term.get("type"), term.get("state"), term.get("district") if term.get("type") == "rep" else term.get("class"))
+  if office in current_mocs:
+    report(True, context, "Term duplicates an office.")
+  current_mocs.add(office)
+
+  # Check senator rank isn't duplicated.
+  if term.get("type") == "sen":
+    office = (term.get("state"), term.get("state_rank"))
     if office in current_mocs:
-      error(context, "Term duplicates an office.")
+      report(True, context, "Term duplicates state_rank in a state.")
     current_mocs.add(office)
 
-    # Check senator rank isn't duplicated.
-    if term.get("type") == "sen":
-      office = (term.get("state"), term.get("state_rank"))
-      if office in current_mocs:
-        error(context, "Term duplicates state_rank in a state.")
-      current_mocs.add(office)
-
+def make_term_schema(current):
+  return schema.compile_schema([
+    { "key": "type", "choices": ("rep", "sen"), "message": "Term has invalid 'type'." },
+    term_dates_rule(current),
+    { "key": "how", "choices": (None, "appointment", "special-election"), "message": "Term has invalid 'how'." },
+    { "key": "end-type", "choices": (None, "special-election"), "message": "Term has invalid 'end-type'." },
+    { "key": "how", "choices": ("appointment",), "when": { "end-type": "special-election" },
+      "message": "Term can't have an 'end-type' without being an appointed senator." },
+    { "key": "state", "choices": utils.states, "message": "Term has invalid state." },
+    { "key": "district", "type": int, "when": { "type": "rep" }, "message": "Term has invalid district." },
+    { "key": "class", "choices": (1, 2, 3), "when": { "type": "sen" }, "message": "Term has invalid class." },
+    { "key": "state_rank", "choices": ("junior", "senior", None), "when": { "type": "sen" },
+      "message": "Term has invalid senator state_rank." },
+  ] + ([
+    { "key": "state_rank", "nonempty": "Term is missing senator state_rank.", "when": { "type": "sen", "state_rank": None } },
+  ] if current else []) + [
+    check_term_party,
+    check_party_affiliations,
+  ] + ([
+    check_office_uniqueness,
     # Check website -- it's optional, so warn.
-    if not term.get("url"):
-      print(context, "Term is missing a website url.")
+    { "key": "url", "nonempty": "Term is missing a website url.", "warning": True },
+  ] if current else []))
+term_schema = make_term_schema(False)
+current_term_schema = make_term_schema(True)
+
+def check_term(term, prev_term, context, current=None, current_mocs=None):
+  (current_term_schema if current else term_schema)(term, context, report,
+    { "prev_term": prev_term, "current_mocs": current_mocs })
 
 def report_vacancies(current_mocs):
   for state, apportionment in state_apportionment.items():
@@ -376,7 +569,7 @@ def report_vacancies(current_mocs):
     if apportionment != "T":
       senators = [m for m in current_mocs if m in [("sen", state, 1), ("sen", state, 2), ("sen", state, 3)]]
       if len(senators) != 2:
-        print("Vacancy in", state, "senators.")
+        warning("Vacancy in", state, "senators.")
 
     # Check that we have someone in each district.
     if apportionment in ("T", 1):
@@ -385,15 +578,13 @@ def report_vacancies(current_mocs):
       districts = range(1, apportionment+1)
     for district in districts:
       if ("rep", state, district) not in current_mocs:
-        print("Vacancy in", state, "district", district, ".")
+        warning("Vacancy in", state, "district", district, ".")
 
 def check_executive_file(fn):
-  # Open and iterate over the entries.
-  with open(fn) as f:
-    people = rtyaml.load(f)
-  for person in people:
+  # Iterate over the entries.
+  for person in load(fn):
     # Create a string for error messages to tell us where problems are ocurring.
-    context = "{} in {}".format(fn, repr(person))
+    context = lambda : "{} in {}".format(fn, repr(person))
 
     # Check the IDs.
     if "id" not in person:
@@ -412,7 +603,7 @@ def check_executive_file(fn):
     if "bio" not in person:
       error(context, "Missing 'bio' mapping.")
     else:
-      check_bio(person["bio"], False, repr(person))
+      check_bio(person["bio"], False, lambda : repr(person))
 
     # Check the terms.
     if "terms" not in person:
@@ -423,7 +614,7 @@ def check_executive_file(fn):
       error(context, "'terms' is empty.")
     else:
       for i, term in enumerate(person["terms"]):
-        check_executive_term(term, context+":term[{}]".format(i))
+        check_executive_term(term, lambda i=i : "{}:term[{}]".format(context(), i))
 
 def check_executive_term(term, context):
   # Check type.
@@ -452,7 +643,7 @@ def check_date(d, context):
     error(context, str(d) + ": invalid data type")
     return None
   try:
-    return utils.parse_date(d)
+    return parse_date(d)
   except Exception as e:
     error(context, d + ": " + str(e))
     return None
@@ -461,61 +652,95 @@ def check_id_uniqueness(seen_ids):
   for (id_type, id_value), occurrences in seen_ids.items():
     if len(occurrences) > 1:
       error("", "%s %s is duplicated: %s" % (id_type, id_value,
-        " ".join(legislator['id'].get('bioguide', str(legislator['id']['govtrack'])) for legislator in occurrences)))
+        " ".join(ids.get('bioguide', str(ids['govtrack'])) for ids in occurrences)))
+
+def check_seat_overlaps():
+  # Checks that no two legislators held the same seat at the same time,
+  # across both legislators files. The terms are sorted by seat and start
+  # date, and each term is compared with every earlier term for the same
+  # seat that hasn't ended by the time it starts.
+  terms = []
+  for fn in ("legislators-historical.yaml", "legislators-current.yaml"):
+    for legislator in load(fn):
+      legislator_id = legislator["id"].get("bioguide", legislator["id"].get("govtrack"))
+      for i, term in enumerate(legislator.get("terms", [])):
+        start, end, state = term.get("start"), term.get("end"), term.get("state")
+        if not (isinstance(start, str) and isinstance(end, str) and isinstance(state, str)):
+          continue # checked in check_term
+        if term.get("type") == "rep":
+          seat = term.get("district")
+          if not isinstance(seat, int) or seat == -1:
+            continue # unknown districts
+          if seat == 0 and start < multi_member_at_large_until:
+            continue
+        elif term.get("type") == "sen":
+          seat = term.get("class")
+          if seat not in (1, 2, 3):
+            continue
+        else:
+          continue
+        # Dates are YYYY-MM-DD strings, which sort like dates.
+        terms.append(((term["type"], state, seat), start, end, legislator_id, fn, i))
+  terms.sort(key=lambda t : t[:2])
+
+  prev_seat = None
+  warnings = 0
+  for seat, start, end, legislator_id, fn, i in terms:
+    if seat != prev_seat:
+      prev_seat, open_terms = seat, []
+    # The earlier terms for the seat that are still open (start, end, legislator).
+    open_terms = [t for t in open_terms if t[1] > start]
+    for other_start, other_end, other_id in open_terms:
+      if other_id == legislator_id or (other_id, legislator_id, start) in seat_overlap_exceptions:
+        continue
+      context = "{}:{}:terms[{}]({} to {})".format(fn, legislator_id, i, start, end)
+      message = "Term overlaps the term of {} for the same seat ({} {} {}) from {} to {}.".format(
+        other_id, seat[0], seat[1], seat[2], other_start, other_end)
+      if seat_overlaps_are_errors:
+        error(context, message)
+      else:
+        warnings += 1
+        if warnings <= max_seat_overlap_warnings:
+          warning(context, "[warning] " + message)
+    open_terms.append((start, end, legislator_id))
+  if warnings > max_seat_overlap_warnings:
+    warning("[warning] {} more overlaps between different legislators' terms for the same seat.".format(
+      warnings - max_seat_overlap_warnings))
 
 def check_district_offices():
-    has_errors = validate_offices(skip_warnings=True)
+    # The office validator prints its own output, so capture it.
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      has_errors = validate_offices(skip_warnings=True,
+        legislators=load("legislators-current.yaml"),
+        legislators_offices=load("legislators-district-offices.yaml"))
+    if output.getvalue():
+      messages.append((False, output.getvalue()))
     if has_errors:
         pass # error("", "District offices have errors")
 
-def check_committee_assignments():
-    # Check that committee IDs in the committee membership file
-    # correspond to committees in committees-current.yaml and
-    # warn about committees missing membership info.
-
-    with open("committees-current.yaml") as f:
-        committees = rtyaml.load(f)
-    with open("committee-membership-current.yaml") as f:
-        membership = rtyaml.load(f)
-
-    committee_ids = [c["thomas_id"] for c in committees]
-    committee_ids += sum(
-        [
-            [c["thomas_id"] + s["thomas_id"] for s in c.get("subcommittees", [])]
-            for c in committees],
-        [])
-
-    for c in membership.keys():
-        if c not in committee_ids:
-            error("committee-membership-current.yaml", "Invalid committee ID: " + c)
-
-    for c in committee_ids:
-        if c not in membership:
-            print("committees-current.yaml", "No membership information for: " + c)
+def check_references():
+  # Check the references between the files, e.g. that committee members
+  # are current legislators (see scripts/references.py).
+  files = { fn: load(fn) for fn in references.FILES }
+  for is_error, context, message in references.check_references(files):
+    if is_error:
+      error(context, message)
+    else:
+      warning(context, message)
 
 def check_social_media():
     # Check the social media file.
 
-    with open("legislators-social-media.yaml") as f:
-        social_media = rtyaml.load(f)
-
-    # Get currently serving legislators.
-    with open("legislators-current.yaml") as f:
-        legislators_current = rtyaml.load(f)
-        legislators_current = { p["id"]["bioguide"]: p for p in legislators_current
-                                if "bioguide" in p["id"] }
+    # (That the entries are for currently serving legislators is checked
+    # in check_references.)
+    social_media = load("legislators-social-media.yaml")
 
-    for entry in social_media:
-        # Check that the entry is for a currently serving legislator.
-        p = legislators_current.get(entry["id"]["bioguide"])
-        if not p:
-            error("legislators-social-media.yaml", "Entry for non-current legislator: " + entry["id"]["bioguide"])
-            continue
-
-        # # Check that if the 'twitter' field is given that 'twitter_id' is also given,
-        # # and vice versa.
-        # if ("twitter" in entry["social"]) != ("twitter_id" in entry["social"]):
-        #     error("legislators-social-media.yaml", "Entry has 'twitter' but not 'twitter_id' or vice versa: " + entry["id"]["bioguide"])
+    # # Check that if the 'twitter' field is given that 'twitter_id' is also given,
+    # # and vice versa.
+    # for entry in social_media:
+    #     if ("twitter" in entry["social"]) != ("twitter_id" in entry["social"]):
+    #         error("legislators-social-media.yaml", "Entry has 'twitter' but not 'twitter_id' or vice versa: " + entry["id"]["bioguide"])
 
     if "TWITTER_API_BEARER_TOKEN" in os.environ:
         import tweepy
@@ -540,18 +765,224 @@ def check_social_media():
                     # Don't push to use the canonical case if the canonical case is all lowercase.
                     error("legislators-social-media.yaml", "Non-canonical case for Twitter username {} (should be {}).".format(username, users_by_id[uid]))
 
+def record_hashes(text):
+  # Returns a hash of the text of each entry in a YAML file whose top
+  # level is a list, as formatted by rtyaml (each entry begins with "- "
+  # at the start of a line), in order.
+  entries = []
+  for line in text.splitlines(keepends=True):
+    if line.startswith("- "):
+      entries.append(hashlib.sha1())
+    if entries:
+      entries[-1].update(line.encode("utf8"))
+  return [entry.hexdigest() for entry in entries]
+
+# The files whose code decides whether an entry passes. When any of them
+# has changed, every entry is checked again (see changed_records).
+validator_sources = ["test/validate.py", "scripts/schema.py", "scripts/references.py",
+                     "scripts/office_validator.py", "scripts/utils.py"]
+
+def validator_hash(read):
+  # Returns a hash of the validator sources, given a function that
+  # returns the bytes of a source file or None if it doesn't exist, or
+  # None if any of them doesn't exist.
+  h = hashlib.sha1()
+  for path in validator_sources:
+    source = read(path)
+    if source is None:
+      return None
+    h.update(hashlib.sha1(source).digest())
+  return h.hexdigest()
+
+def read_file(path):
+  try:
+    with open(path, "rb") as f:
+      return f.read()
+  except OSError:
+    return None
+
+def git_show(base, path):
+  # Returns the bytes of a file at a git revision, or None.
+  result = subprocess.run(["git", "show", "%s:%s" % (base, path)],
+    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+  return result.stdout if result.returncode == 0 else None
+
+def changed_records(fn, base=None, manifest=None):
+  # Returns the indexes of the entries in fn that are new or changed
+  # since the base git revision or since they were recorded in the
+  # manifest file, or None if every entry must be checked, which is
+  # also the case if the validator itself has changed since then. Also
+  # returns the hashes of the entries.
+  with open(fn) as f:
+    hashes = record_hashes(f.read())
+  if len(hashes) != len(load(fn)):
+    # The file isn't formatted as expected.
+    return None, hashes
+
+  current_validator = validator_hash(read_file)
+  if base:
+    if current_validator is None or validator_hash(lambda path : git_show(base, path)) != current_validator:
+      print("The validator has changed since {}, so every entry is checked.".format(base))
+      return None, hashes
+    text = git_show(base, fn)
+    if text is None:
+      return None, hashes
+    known = set(record_hashes(text.decode("utf8")))
+  elif manifest and os.path.exists(manifest):
+    with open(manifest) as f:
+      manifest_data = json.load(f)
+    if current_validator is None or manifest_data.get("validator") != current_validator:
+      print("The validator has changed since {} was written, so every entry is checked.".format(manifest))
+      return None, hashes
+    known = set(manifest_data.get(fn, []))
+  else:
+    return None, hashes
+
+  return set(i for i, h in enumerate(hashes) if h not in known), hashes
+
+def validate(jobs=None, base=None, manifest=None, timings_format=None):
+  # Runs all of the checks and prints their output. Returns whether
+  # there were no errors.
+  #
+  # With timings_format ("table", "json" or a path ending in .json), the
+  # time spent in each check is printed at the end (see timed_checks and
+  # print_timings).
+  #
+  # With base (a git revision) or manifest (a file of the hashes of the
+  # entries that passed the last time validate was run with the same
+  # manifest), only the entries in the historical file that are new or
+  # changed are checked, unless the validator has changed. The current
+  # file is always checked in full because checks of current terms
+  # depend on today's date. The IDs of the unchanged entries are still
+  # collected for the uniqueness check. Only the checks are skipped: the
+  # whole historical file is still loaded, since the uniqueness, seat
+  # overlap and reference checks need every entry, and that takes a few
+  # seconds when its pickle cache is missing or out of date (as in CI).
+
+  # Load the files before starting the worker processes so that, where
+  # they are forked, they share the loaded data.
+  historical = load("legislators-historical.yaml")
+  for fn in ("legislators-current.yaml", "executive.yaml", "legislators-district-offices.yaml",
+             "committees-current.yaml", "committee-membership-current.yaml", "legislators-social-media.yaml"):
+    load(fn)
+
+  changed, hashes = None, None
+  if base or manifest:
+    changed, hashes = changed_records("legislators-historical.yaml", base, manifest)
+    if changed is not None:
+      print("Checking {} new or changed of {} entries in legislators-historical.yaml.".format(
+        len(changed), len(historical)))
+
+  if timings_format:
+    # Before the worker processes are started so that they have the
+    # timed checks too.
+    enable_timings()
+  all_timings = { }
+
+  if jobs == 1:
+    pool = None
+  else:
+    if "fork" in multiprocessing.get_all_start_methods():
+      mp_context = multiprocessing.get_context("fork")
+    else:
+      mp_context = None
+    pool = ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context)
+
+  def submit(func, *args):
+    # Start a check, and return a function that waits for its result.
+    if pool is None:
+      result = run_check(func, *args)
+      return lambda : result
+    return pool.submit(run_check, func, *args).result
+
+  ok = True
+  def output(result):
+    # Print a check's messages and return its return value.
+    nonlocal ok
+    check_messages, ret, check_timings = result
+    for is_error, text in check_messages:
+      sys.stdout.write(text)
+      if is_error:
+        ok = False
+    for key, (seconds, calls, errors) in (check_timings or {}).items():
+      entry = all_timings.setdefault(key, [0.0, 0, 0])
+      entry[0] += seconds
+      entry[1] += calls
+      entry[2] += errors
+    return ret
+
+  try:
+    # Start all of the checks. The current legislators file isn't split
+    # into chunks because duplicate offices are checked as it goes.
+    current_check = submit(check_legislators_file, "legislators-current.yaml", True)
+    if changed is not None and len(changed) < CHUNK_SIZE:
+      # Collecting the IDs of the unchanged entries is quick.
+      historical_checks = [submit(check_legislators_file, "legislators-historical.yaml", False, 0, None, changed)]
+    else:
+      historical_checks = [
+        submit(check_legislators_file, "legislators-historical.yaml", False, start, start + CHUNK_SIZE, changed)
+        for start in range(0, len(historical), CHUNK_SIZE)]
+    other_checks = [
+      submit(check_executive_file, "executive.yaml"),
+      None, # ID uniqueness is checked here, in this process.
+      submit(check_seat_overlaps),
+      submit(check_district_offices),
+      submit(check_references),
+      submit(check_social_media),
+    ]
+
+    # Print the results in order and combine the IDs seen.
+    seen_ids = { }
+    def merge_seen_ids(chunk_seen_ids):
+      for key, occurrences in chunk_seen_ids.items():
+        seen_ids.setdefault(key, []).extend(occurrences)
+
+    chunk_seen_ids, current_mocs, _ = output(current_check())
+    merge_seen_ids(chunk_seen_ids)
+    output(run_check(report_vacancies, current_mocs))
+    failed = set()
+    for check in historical_checks:
+      chunk_seen_ids, _, chunk_failed = output(check())
+      merge_seen_ids(chunk_seen_ids)
+      failed |= chunk_failed
+    for check in other_checks:
+      if check is None:
+        output(run_check(check_id_uniqueness, seen_ids))
+      else:
+        output(check())
+  finally:
+    if pool is not None:
+      pool.shutdown()
+
+  if manifest and hashes is not None:
+    # Record the entries that passed so that they aren't checked again.
+    # (Errors in the other files or in ID uniqueness are reported each
+    # time anyway.)
+    with open(manifest, "w") as f:
+      json.dump({
+        "validator": validator_hash(read_file),
+        "legislators-historical.yaml": sorted(set(h for i, h in enumerate(hashes) if i not in failed)),
+      }, f)
+
+  if timings_format:
+    print_timings(all_timings, timings_format)
+
+  return ok
+
 if __name__ == "__main__":
-  # Check the legislators files.
-  seen_ids = { }
-  current_mocs = set()
-  check_legislators_file("legislators-current.yaml", seen_ids, current=True, current_mocs=current_mocs)
-  report_vacancies(current_mocs)
-  check_legislators_file("legislators-historical.yaml", seen_ids, current=False)
-  check_executive_file("executive.yaml")
-  check_id_uniqueness(seen_ids)
-  check_district_offices()
-  check_committee_assignments()
-  check_social_media()
+  # Optionally pass --jobs=N to set the number of worker processes
+  # (--jobs=1 runs every check in this process), and --base=REVISION
+  # (e.g. --base=origin/main) or --manifest=FILE to only check entries
+  # in the historical file that are new or changed (see validate), and
+  # --timings to print how long each check took (--timings=json writes
+  # them as JSON to stderr, and --timings=FILE.json to the file).
+  flags = utils.flags()
+  timings_format = flags.get("timings")
+  if timings_format is True:
+    timings_format = "table"
+  ok = validate(jobs=int(flags["jobs"]) if "jobs" in flags else None,
+    base=flags.get("base"), manifest=flags.get("manifest"),
+    timings_format=timings_format)
 
   # Exit with exit status.
   sys.exit(0 if ok else 1)